@@ -1,7 +1,7 @@
 import argparse
 
 
-def get_args():
+def get_parser():
     arg = argparse.ArgumentParser()
     arg.add_argument("-dataset", type=str, default="DB15K")
     arg.add_argument("-batch_size", type=int, default=1024)
@@ -26,7 +26,25 @@ def get_args():
     arg.add_argument("-disen_weight", type=float, default=0.01)
     arg.add_argument("-miss_type", type=str, default=None)
     arg.add_argument("-miss_prop", type=float, default=None)
-    return arg.parse_args()
+    arg.add_argument("-feature_dtype", type=str, default="fp32")
+    arg.add_argument("-feature_mmap", type=int, default=1)
+    arg.add_argument("-feature_cache_mb", type=int, default=0)
+    arg.add_argument("-feature_reduce", type=str, default=None)
+    arg.add_argument("-feature_reduce_dim", type=int, default=256)
+    arg.add_argument("-sparse_optim", type=str, default=None)
+    arg.add_argument("-state_path", type=str, default=None)
+    arg.add_argument("-state_steps", type=int, default=1)
+    arg.add_argument("-valid_steps", type=int, default=0)
+    arg.add_argument("-valid_subset", type=int, default=0)
+    arg.add_argument("-patience", type=int, default=None)
+    arg.add_argument("-best_save", type=str, default=None)
+    arg.add_argument("-valid_negatives", type=int, default=None)
+    arg.add_argument("-valid_async", type=int, default=0)
+    return arg
+
+
+def get_args():
+    return get_parser().parse_args()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,162 @@
+import os
+import time
+import argparse
+import numpy as np
+import torch
+import torch.optim as optim
+from mmkgc.data import TrainDataLoader
+from mmkgc.data.PartitionedGraph import read_count, read_triples
+from mmkgc.index import EntityIndex, export_embeddings, query_vectors
+from mmkgc.module.model import AdvRelRotatE, RotatE, TransE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-datasets", type=str, default="MKG-Y,MKG-W,DB15K,TIVA")
+    arg.add_argument("-model", type=str, default="rotate")
+    arg.add_argument("-checkpoint", type=str, default=None)
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-epoch", type=int, default=5)
+    arg.add_argument("-batch_size", type=int, default=1024)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-learning_rate", type=float, default=1e-3)
+    arg.add_argument("-k", type=int, default=10)
+    arg.add_argument("-queries", type=int, default=1000)
+    arg.add_argument("-nprobe", type=str, default="4,16,64")
+    arg.add_argument("-pq_m", type=int, default=16)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def build_model(args, ent_tot, rel_tot):
+    if args.model == "adv_rotate":
+        # random modality features stand in for ./embeddings, the fusion
+        # per relation is what the index has to reproduce
+        return AdvRelRotatE(
+            ent_tot,
+            rel_tot,
+            dim=args.dim,
+            margin=6.0,
+            epsilon=2.0,
+            img_emb=torch.randn(ent_tot, 32),
+            text_emb=torch.randn(ent_tot, 32),
+        )
+    if args.model == "rotate":
+        return RotatE(ent_tot, rel_tot, dim=args.dim, margin=6.0)
+    return TransE(ent_tot, rel_tot, dim=args.dim, p_norm=1, norm_flag=True)
+
+
+def train(args, kge_score, in_path):
+    # a few epochs give the embeddings the structure of a trained model
+    data_loader = TrainDataLoader(
+        in_path=in_path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=args.batch_size,
+    )
+    optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
+    for _ in range(args.epoch):
+        for data in data_loader:
+            optimizer.zero_grad()
+            loss, _ = model(
+                {
+                    "batch_h": torch.from_numpy(data["batch_h"]),
+                    "batch_t": torch.from_numpy(data["batch_t"]),
+                    "batch_r": torch.from_numpy(data["batch_r"]),
+                    "batch_y": torch.from_numpy(data["batch_y"]),
+                    "mode": data["mode"],
+                }
+            )
+            loss.backward()
+            optimizer.step()
+
+
+def recall(found, exact):
+    return np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, exact)])
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def bench(args, dataset):
+    in_path = os.path.join("benchmarks", dataset, "")
+    ent_tot = read_count(in_path + "entity2id.txt")
+    rel_tot = read_count(in_path + "relation2id.txt")
+    torch.manual_seed(args.seed)
+    kge_score = build_model(args, ent_tot, rel_tot)
+    if args.checkpoint:
+        kge_score.load_checkpoint(args.checkpoint.format(dataset=dataset))
+    else:
+        train(args, kge_score, in_path)
+    embeddings = export_embeddings(kge_score)
+
+    test = next(read_triples(in_path + "test2id.txt"))[: args.queries]
+    half = len(test) // 2
+    rels = test[:, 2]
+    queries = np.concatenate(
+        (
+            query_vectors(embeddings, test[:half, 0], test[:half, 2], "tail_batch"),
+            query_vectors(embeddings, test[half:, 1], test[half:, 2], "head_batch"),
+        )
+    )
+    # the index ranks exactly like the model
+    kge_score.eval()
+    with torch.no_grad():
+        h, t, r = (torch.from_numpy(test[:1, i]) for i in range(3))
+        score = kge_score.predict(
+            {
+                "batch_h": h,
+                "batch_t": torch.arange(ent_tot),
+                "batch_r": r,
+                "mode": "tail_batch",
+            }
+        )
+    exact_index = EntityIndex(embeddings, nlist=1)
+    (exact, _), exact_time = timed(exact_index.search_exact, queries, args.k, rels=rels)
+    assert np.array_equal(np.sort(np.argsort(score)[: args.k]), np.sort(exact[0]))
+
+    print(
+        "{}: {} entities, {} queries, exact scan {:.0f} QPS".format(
+            dataset, ent_tot, len(queries), len(queries) / exact_time
+        )
+    )
+    print("index\t\tnprobe\trecall@{}\tQPS\tbuild s".format(args.k))
+    for pq_m in (None, args.pq_m):
+        index, build_time = timed(
+            EntityIndex(embeddings, pq_m=pq_m, seed=args.seed).build
+        )
+        name = "IVF{}".format(index.nlist) + (",PQ{}".format(pq_m) if pq_m else "")
+        for nprobe in map(int, args.nprobe.split(",")):
+            (found, _), elapsed = timed(
+                index.search, queries, args.k, nprobe, rels=rels
+            )
+            print(
+                "{}\t{}\t{:.4f}\t\t{:.0f}\t{:.1f}".format(
+                    name,
+                    nprobe,
+                    recall(found, exact),
+                    len(queries) / elapsed,
+                    build_time,
+                )
+            )
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    for dataset in args.datasets.split(","):
+        bench(args, dataset)
@@ -0,0 +1,101 @@
+import os
+import time
+import argparse
+import tempfile
+import torch
+from mmkgc.config import Trainer, CheckpointWriter
+from mmkgc.data import TrainDataLoader
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-dim", type=int, default=500)
+    arg.add_argument("-epoch", type=int, default=4)
+    arg.add_argument("-batch_size", type=int, default=4096)
+    arg.add_argument("-neg_num", type=int, default=4)
+    arg.add_argument("-learning_rate", type=float, default=1e-3)
+    arg.add_argument("-keep_last", type=int, default=2)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+class TimedTrainer(Trainer):
+    # time the training loop spends in save_epoch
+    def save_epoch(self, epoch):
+        start = time.perf_counter()
+        if self.checkpoint_writer is None:
+            # the same files, written in the training loop
+            path = self.checkpoint_dir + "-" + str(epoch) + ".ckpt"
+            CheckpointWriter.save(self.model.state_dict(), path)
+            CheckpointWriter.save(self.train_state(epoch), path + ".train")
+        else:
+            super(TimedTrainer, self).save_epoch(epoch)
+        self.save_time += time.perf_counter() - start
+
+
+def train(args, checkpoint_dir, writer):
+    torch.manual_seed(args.seed)
+    data_loader = TrainDataLoader(
+        in_path="./benchmarks/" + args.dataset + "/",
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    kge_score = RotatE(
+        ent_tot=data_loader.get_ent_tot(),
+        rel_tot=data_loader.get_rel_tot(),
+        dim=args.dim,
+        margin=6.0,
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=data_loader.get_batch_size(),
+    )
+    trainer = TimedTrainer(
+        model=model,
+        data_loader=data_loader,
+        train_times=args.epoch,
+        alpha=args.learning_rate,
+        use_gpu=False,
+        opt_method="adam",
+        save_steps=1,
+        checkpoint_dir=checkpoint_dir,
+        checkpoint_writer=writer,
+    )
+    trainer.save_time = 0.0
+    start = time.perf_counter()
+    trainer.run()
+    return trainer, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    # on the checkpoint disk rather than a tmpfs
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        trainer, sync_total = train(args, os.path.join(tmp, "sync"), None)
+        sync = trainer.save_time
+        writer = CheckpointWriter(max_in_flight=2, keep_last=args.keep_last)
+        trainer, async_total = train(args, os.path.join(tmp, "async"), writer)
+        writer.close()
+        files = sorted(f for f in os.listdir(tmp) if f.startswith("async"))
+        print("saving\t\tblocked s\ttotal s")
+        print("synchronous\t{:.2f}\t\t{:.1f}".format(sync, sync_total))
+        print("background\t{:.2f}\t\t{:.1f}".format(trainer.save_time, async_total))
+        print("kept:", files)
+        last = os.path.join(tmp, "async-{}.ckpt".format(args.epoch - 1))
+        # the last snapshot is the final model, loadable as before
+        state = torch.load(last)
+        for name, tensor in trainer.model.state_dict().items():
+            assert torch.equal(state[name], tensor), name
+        assert torch.load(last + ".train")["epoch"] == args.epoch - 1
+        assert len(files) == 2 * args.keep_last
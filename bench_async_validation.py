@@ -0,0 +1,108 @@
+import os
+import time
+import argparse
+import tempfile
+import torch
+from mmkgc.config import Trainer, Validator, AsyncValidator
+from mmkgc.data import TrainDataLoader
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-epoch", type=int, default=12)
+    arg.add_argument("-batch_size", type=int, default=2048)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-valid_steps", type=int, default=2)
+    arg.add_argument("-valid_subset", type=int, default=200)
+    arg.add_argument("-negatives", type=int, default=2000)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def run(args, kind, tmp):
+    torch.manual_seed(args.seed)
+    in_path = "./benchmarks/" + args.dataset + "/"
+    data_loader = TrainDataLoader(
+        in_path=in_path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    data_loader.set_seed(args.seed)
+    kge_score = RotatE(
+        ent_tot=data_loader.get_ent_tot(),
+        rel_tot=data_loader.get_rel_tot(),
+        dim=args.dim,
+        margin=6.0,
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=data_loader.get_batch_size(),
+    )
+    validator = kind(
+        kge_score,
+        in_path,
+        steps=args.valid_steps,
+        subset=args.valid_subset,
+        negatives=args.negatives,
+        best_path=os.path.join(tmp, kind.__name__ + ".ckpt"),
+    )
+    # the time the training loop spends inside the validator
+    blocked = [0.0]
+    step = validator.step
+
+    def timed(epoch):
+        start = time.perf_counter()
+        stop = step(epoch)
+        blocked[0] += time.perf_counter() - start
+        return stop
+
+    validator.step = timed
+    trainer = Trainer(
+        model=model,
+        data_loader=data_loader,
+        train_times=args.epoch,
+        alpha=0.01,
+        use_gpu=False,
+        opt_method="adam",
+        validator=validator,
+    )
+    start = time.perf_counter()
+    trainer.run()
+    elapsed = time.perf_counter() - start
+    if kind is AsyncValidator:
+        start = time.perf_counter()
+        validator.close()
+        drained = time.perf_counter() - start
+    else:
+        drained = 0.0
+    print(
+        "{:<15} training {:6.1f} s, blocked in validation {:6.1f} s, "
+        "draining the worker {:5.1f} s".format(
+            kind.__name__, elapsed, blocked[0], drained
+        )
+    )
+    return validator.history
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        inline = run(args, Validator, tmp)
+        background = run(args, AsyncValidator, tmp)
+    for (epoch, metrics), (async_epoch, async_metrics) in zip(inline, background):
+        print(epoch, metrics["mrr"], async_epoch, async_metrics["mrr"])
+    # the same snapshots, so the same metrics at the same epochs
+    assert inline == background
+    print("the metric timelines match")
@@ -0,0 +1,145 @@
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import torch
+from mmkgc.data.PartitionedGraph import read_count, read_triples
+from mmkgc.module.model import RotatE
+from mmkgc.serve import BulkPredictor, EntityScorer, KnownAnswers
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-queries", type=int, default=1000)
+    arg.add_argument("-k", type=int, default=10)
+    arg.add_argument("-batch_size", type=int, default=128)
+    # does not divide the entity count
+    arg.add_argument("-chunk_size", type=int, default=4096)
+    arg.add_argument("-shard_size", type=int, default=300)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def expected_topk(model, known, queries, mode, k):
+    # every entity scored by model.predict, known answers removed
+    ent = 1 if mode == "head_batch" else 0
+    candidates = torch.arange(model.ent_tot)
+    scores = np.empty((len(queries), model.ent_tot), dtype=np.float32)
+    with torch.no_grad():
+        for i, row in enumerate(queries):
+            one = torch.tensor([row[ent]])
+            scores[i] = model.predict(
+                {
+                    "batch_h": candidates if mode == "head_batch" else one,
+                    "batch_t": one if mode == "head_batch" else candidates,
+                    "batch_r": torch.tensor([row[2]]),
+                    "mode": mode,
+                }
+            )
+    rows, answers = known.lookup(queries[:, ent], queries[:, 2], mode)
+    scores[rows, answers] = np.inf
+    return scores, np.argsort(scores, axis=1, kind="stable")[:, :k]
+
+
+def shard_files(out_dir):
+    # a rewritten file is a new inode, os.replace swaps it in
+    return {
+        name: os.stat(os.path.join(out_dir, name)).st_ino
+        for name in os.listdir(out_dir)
+        if name.startswith("shard-")
+    }
+
+
+def main(args, path):
+    in_path = "./benchmarks/" + args.dataset + "/"
+    ent_tot = read_count(in_path + "entity2id.txt")
+    rel_tot = read_count(in_path + "relation2id.txt")
+    torch.manual_seed(args.seed)
+    model = RotatE(ent_tot, rel_tot, dim=args.dim, margin=6.0)
+    model.eval()
+    queries = next(read_triples(in_path + "test2id.txt"))[: args.queries]
+    queries_path = os.path.join(path, "queries.txt")
+    with open(queries_path, "w") as f:
+        f.write("{}\n".format(len(queries)))
+        np.savetxt(f, queries, fmt="%d")
+    known = KnownAnswers.from_path(in_path)
+    predictor = BulkPredictor(
+        EntityScorer(model),
+        k=args.k,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        known=known,
+    )
+    shards = (len(queries) + args.shard_size - 1) // args.shard_size
+
+    for mode in ("tail_batch", "head_batch"):
+        out_dir = os.path.join(path, mode)
+        start = time.perf_counter()
+        written = predictor.run(queries_path, out_dir, mode, args.shard_size)
+        print(
+            "{}: {} shards in {:.1f} s".format(
+                mode, written, time.perf_counter() - start
+            )
+        )
+        assert written == shards
+        ids = np.concatenate(
+            [
+                np.load(os.path.join(out_dir, "shard-{:05d}.ids.npy".format(s)))
+                for s in range(shards)
+            ]
+        )
+        scores, top = expected_topk(model, known, queries, mode, args.k)
+        # ties may swap ids, the scores of the ids found must match
+        found = np.take_along_axis(scores, ids, axis=1)
+        assert np.allclose(found, np.take_along_axis(scores, top, axis=1), atol=1e-4)
+        assert np.isfinite(found).all()
+        print(
+            "{}: {} of {} ids equal model.predict".format(
+                mode, (ids == top).sum(), ids.size
+            )
+        )
+    print("filtered top-k matches model.predict without the known triples")
+
+    # a resumed job rewrites only the shard without a .done marker
+    out_dir = os.path.join(path, "tail_batch")
+    before = shard_files(out_dir)
+    ids = np.load(os.path.join(out_dir, "shard-00001.ids.npy"))
+    os.remove(os.path.join(out_dir, "shard-00001.done"))
+    assert predictor.run(queries_path, out_dir, "tail_batch", args.shard_size) == 1
+    after = shard_files(out_dir)
+    assert before.keys() == after.keys()
+    changed = sorted(name for name in before if before[name] != after[name])
+    assert all(name.startswith("shard-00001.") for name in changed)
+    assert {"shard-00001.ids.npy", "shard-00001.distances.npy"} <= set(changed)
+    assert np.array_equal(np.load(os.path.join(out_dir, "shard-00001.ids.npy")), ids)
+    print("resume rewrote {}".format(changed))
+
+    # meta.json belongs to one job
+    others = (
+        (predictor, "head_batch", args.shard_size),
+        (predictor, "tail_batch", args.shard_size + 1),
+        (
+            BulkPredictor(EntityScorer(model), k=args.k + 1, known=known),
+            "tail_batch",
+            args.shard_size,
+        ),
+        (BulkPredictor(EntityScorer(model), k=args.k), "tail_batch", args.shard_size),
+    )
+    for other, mode, shard_size in others:
+        try:
+            other.run(queries_path, out_dir, mode, shard_size)
+            raise AssertionError("meta.json accepted a different job")
+        except ValueError:
+            pass
+    assert shard_files(out_dir) == after
+    print("meta.json rejects {} different jobs".format(len(others)))
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    with tempfile.TemporaryDirectory() as path:
+        main(args, path)
@@ -0,0 +1,141 @@
+import os
+import glob
+import time
+import shutil
+import argparse
+import tempfile
+import torch
+from bench_sharded_eval import subset
+from mmkgc.config import Trainer, Tester, CheckpointEvaluator
+from mmkgc.data import TrainDataLoader, TestDataLoader
+from mmkgc.data.PartitionedGraph import read_count
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-epoch", type=int, default=3)
+    arg.add_argument("-batch_size", type=int, default=2048)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-queries", type=int, default=100)
+    arg.add_argument("-workers", type=int, default=2)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def series(args, tmp, config):
+    in_path = os.path.join(tmp, "data") + "/"
+    evaluator = CheckpointEvaluator(
+        RotatE(
+            read_count(in_path + "entity2id.txt"),
+            read_count(in_path + "relation2id.txt"),
+            dim=args.dim,
+            margin=config["margin"],
+        ),
+        TestDataLoader(in_path, "link"),
+        workers=args.workers,
+        cache_path=os.path.join(tmp, "eval-cache.json"),
+        config=config,
+    )
+    start = time.perf_counter()
+    results = evaluator.evaluate(glob.glob(os.path.join(tmp, "run-*.ckpt")))
+    elapsed = time.perf_counter() - start
+    print(
+        "series: {} of {} checkpoints evaluated in {:.1f} s".format(
+            len(evaluator.evaluated), len(results), elapsed
+        )
+    )
+    return evaluator, results
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    torch.manual_seed(args.seed)
+    in_path = "./benchmarks/" + args.dataset + "/"
+    tmp = tempfile.mkdtemp()
+    subset(in_path, os.path.join(tmp, "data"), args.queries)
+    data_loader = TrainDataLoader(
+        in_path=in_path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    kge_score = RotatE(
+        ent_tot=data_loader.get_ent_tot(),
+        rel_tot=data_loader.get_rel_tot(),
+        dim=args.dim,
+        margin=6.0,
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=data_loader.get_batch_size(),
+    )
+    # checkpoint run-<epoch>.ckpt after every epoch
+    Trainer(
+        model=model,
+        data_loader=data_loader,
+        train_times=args.epoch,
+        alpha=0.01,
+        use_gpu=False,
+        opt_method="adam",
+        save_steps=1,
+        checkpoint_dir=os.path.join(tmp, "run"),
+    ).run()
+    config = {"dim": args.dim, "margin": 6.0}
+
+    # one fresh TestDataLoader and Tester per checkpoint
+    start = time.perf_counter()
+    expected = {}
+    for path in sorted(glob.glob(os.path.join(tmp, "run-*.ckpt"))):
+        state = torch.load(path)
+        kge_score.load_state_dict(
+            {k[len("model.") :]: v for k, v in state.items() if k.startswith("model.")}
+        )
+        kge_score.eval()
+        tester = Tester(
+            model=kge_score,
+            data_loader=TestDataLoader(os.path.join(tmp, "data") + "/", "link"),
+            use_gpu=False,
+        )
+        expected[path] = tester.run_link_prediction(type_constrain=False)
+    print(
+        "one by one: {} checkpoints in {:.1f} s".format(
+            len(expected), time.perf_counter() - start
+        )
+    )
+
+    evaluator, results = series(args, tmp, config)
+    for path, metrics in results.items():
+        print(os.path.basename(path), metrics)
+        # Base.so sums in float, the series evaluator exactly
+        assert all(
+            abs(a - b) <= 1e-4 * max(1.0, abs(b))
+            for a, b in zip(metrics, expected[path])
+        )
+
+    # nothing new: everything comes from the cache
+    evaluator, again = series(args, tmp, config)
+    assert evaluator.evaluated == [] and again == results
+
+    # one more checkpoint: only it is evaluated
+    with torch.no_grad():
+        kge_score.ent_embeddings.weight.mul_(0.5)
+    torch.save(model.state_dict(), os.path.join(tmp, "run-%d.ckpt" % args.epoch))
+    evaluator, more = series(args, tmp, config)
+    assert evaluator.evaluated == [os.path.join(tmp, "run-%d.ckpt" % args.epoch)]
+    assert all(more[path] == results[path] for path in results)
+
+    # another evaluation config does not reuse the cache
+    evaluator, other = series(args, tmp, dict(config, margin=9.0))
+    assert len(evaluator.evaluated) == len(other)
+    shutil.rmtree(tmp)
@@ -0,0 +1,146 @@
+import os
+import time
+import argparse
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from mmkgc.config import Trainer, Tester
+from mmkgc.config.Distributed import init_distributed
+from mmkgc.module.model import RotatE, AdvRelRotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+from mmkgc.data import TrainDataLoader, TestDataLoader
+from mmkgc.feature import load_features
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-W")
+    # "rotate": RotatE, "adv": AdvRelRotatE with the modality features
+    arg.add_argument("-model", type=str, default="rotate")
+    # with -model adv: 0 loads ./embeddings, otherwise random features of
+    # this width stand in for them
+    arg.add_argument("-synthetic_dim", type=int, default=0)
+    # process counts to launch; ignored when started by torchrun
+    arg.add_argument("-nprocs", type=str, default="1,2,4")
+    # strong: the global batch is split across ranks, weak: every rank
+    # trains a batch of batch_size
+    arg.add_argument("-scaling", type=str, default="strong")
+    arg.add_argument("-dim", type=int, default=250)
+    arg.add_argument("-batch_size", type=int, default=1024)
+    arg.add_argument("-neg_num", type=int, default=32)
+    arg.add_argument("-margin", type=float, default=12.0)
+    arg.add_argument("-learning_rate", type=float, default=1e-4)
+    arg.add_argument("-bucket_cap_mb", type=int, default=25)
+    arg.add_argument("-epoch", type=int, default=5)
+    arg.add_argument("-test", type=int, default=0)
+    arg.add_argument("-seed", type=int, default=42)
+    arg.add_argument("-port", type=int, default=29512)
+    return arg.parse_args()
+
+
+def train(args, world_size):
+    rank, _ = init_distributed()
+    torch.manual_seed(args.seed)
+    torch.set_num_threads(max(1, os.cpu_count() // world_size))
+    in_path = "./benchmarks/" + args.dataset + "/"
+    batch_size = args.batch_size
+    if args.scaling == "strong":
+        batch_size = max(1, args.batch_size // world_size)
+    train_dataloader = TrainDataLoader(
+        in_path=in_path,
+        batch_size=batch_size,
+        threads=8,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    ent_tot = train_dataloader.get_ent_tot()
+    rel_tot = train_dataloader.get_rel_tot()
+    if args.model == "rotate":
+        kge_score = RotatE(ent_tot, rel_tot, dim=args.dim, margin=args.margin)
+    else:
+        if args.synthetic_dim:
+            img_emb = torch.randn(ent_tot, args.synthetic_dim)
+            text_emb = torch.randn(ent_tot, args.synthetic_dim)
+        else:
+            img_emb = load_features("./embeddings/" + args.dataset + "-visual.pth")
+            text_emb = load_features("./embeddings/" + args.dataset + "-textual.pth")
+        kge_score = AdvRelRotatE(
+            ent_tot=ent_tot,
+            rel_tot=rel_tot,
+            dim=args.dim,
+            margin=args.margin,
+            epsilon=2.0,
+            img_emb=img_emb,
+            text_emb=text_emb,
+        )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=train_dataloader.get_batch_size(),
+    )
+    trainer = Trainer(
+        model=model,
+        data_loader=train_dataloader,
+        train_times=args.epoch,
+        alpha=args.learning_rate,
+        use_gpu=False,
+        opt_method="Adam",
+        seed=args.seed,
+        distributed=True,
+        bucket_cap_mb=args.bucket_cap_mb,
+    )
+    triples = train_dataloader.get_triple_tot() * args.epoch
+    dist.barrier()
+    start = time.perf_counter()
+    trainer.run()
+    dist.barrier()
+    elapsed = time.perf_counter() - start
+    mrr = float("nan")
+    if rank == 0 and args.test:
+        tester = Tester(
+            model=kge_score,
+            data_loader=TestDataLoader(in_path, "link"),
+            use_gpu=False,
+        )
+        mrr = tester.run_link_prediction(type_constrain=False)[0]
+    dist.destroy_process_group()
+    return rank, triples / elapsed, mrr
+
+
+def spawned(local_rank, world_size, args, results):
+    os.environ["RANK"] = str(local_rank)
+    os.environ["WORLD_SIZE"] = str(world_size)
+    os.environ.setdefault("MASTER_ADDR", "127.0.0.1")
+    os.environ["MASTER_PORT"] = str(args.port + world_size)
+    rank, speed, mrr = train(args, world_size)
+    if rank == 0:
+        results.put((world_size, speed, mrr))
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    if "RANK" in os.environ:
+        # started by torchrun, possibly across several nodes
+        world_size = int(os.environ["WORLD_SIZE"])
+        rank, speed, mrr = train(args, world_size)
+        results = [(world_size, speed, mrr)] if rank == 0 else []
+    else:
+        queue = mp.get_context("spawn").SimpleQueue()
+        results = []
+        for world_size in [int(n) for n in args.nprocs.split(",")]:
+            mp.spawn(spawned, args=(world_size, args, queue), nprocs=world_size)
+            results.append(queue.get())
+    if results:
+        print("{} scaling".format(args.scaling))
+        print("processes\ttriples/s\tspeedup\tMRR")
+        for world_size, speed, mrr in results:
+            print(
+                "{}\t{:.0f}\t{:.2f}\t{:.4f}".format(
+                    world_size, speed, speed / results[0][1], mrr
+                )
+            )
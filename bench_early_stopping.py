@@ -0,0 +1,86 @@
+import os
+import time
+import argparse
+import tempfile
+import torch
+from mmkgc.config import Trainer, Validator
+from mmkgc.data import TrainDataLoader
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-epoch", type=int, default=200)
+    arg.add_argument("-batch_size", type=int, default=2048)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-learning_rate", type=float, default=0.05)
+    arg.add_argument("-valid_steps", type=int, default=5)
+    arg.add_argument("-valid_subset", type=int, default=100)
+    arg.add_argument("-patience", type=int, default=3)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    torch.manual_seed(args.seed)
+    in_path = "./benchmarks/" + args.dataset + "/"
+    data_loader = TrainDataLoader(
+        in_path=in_path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    kge_score = RotatE(
+        ent_tot=data_loader.get_ent_tot(),
+        rel_tot=data_loader.get_rel_tot(),
+        dim=args.dim,
+        margin=6.0,
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=data_loader.get_batch_size(),
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        best = os.path.join(tmp, "best.ckpt")
+        validator = Validator(
+            kge_score,
+            in_path,
+            steps=args.valid_steps,
+            subset=args.valid_subset,
+            patience=args.patience,
+            best_path=best,
+        )
+        trainer = Trainer(
+            model=model,
+            data_loader=data_loader,
+            train_times=args.epoch,
+            alpha=args.learning_rate,
+            use_gpu=False,
+            opt_method="adam",
+            validator=validator,
+        )
+        start = time.perf_counter()
+        trainer.run()
+        elapsed = time.perf_counter() - start
+        last = validator.history[-1][0] + 1
+        print(
+            "stopped after {} of {} epochs in {:.0f} s, best valid mrr {:.4f} "
+            "at epoch {}".format(
+                last, args.epoch, elapsed, validator.best, validator.best_epoch
+            )
+        )
+        # the best checkpoint scores what the validator recorded
+        kge_score.load_checkpoint(best)
+        mrr = validator.tester.evaluate(validator.valid, False)[0]
+        assert abs(mrr - validator.best) < 1e-9, (mrr, validator.best)
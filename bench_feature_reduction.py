@@ -0,0 +1,117 @@
+import time
+import argparse
+import torch
+import torch.optim as optim
+from mmkgc.config import Trainer, Tester
+from mmkgc.module.model import AdvRelRotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+from mmkgc.data import TrainDataLoader, TestDataLoader
+from mmkgc.feature import load_features
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-W")
+    arg.add_argument("-method", type=str, default="pca")
+    # 0 stands for the raw features
+    arg.add_argument("-dims", type=str, default="0,1024,512,256,128")
+    arg.add_argument("-dim", type=int, default=250)
+    arg.add_argument("-batch_size", type=int, default=1024)
+    arg.add_argument("-neg_num", type=int, default=32)
+    arg.add_argument("-margin", type=float, default=12.0)
+    arg.add_argument("-learning_rate", type=float, default=1e-4)
+    arg.add_argument("-steps", type=int, default=50)
+    arg.add_argument("-epoch", type=int, default=0)
+    arg.add_argument("-use_gpu", type=int, default=1)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    use_gpu = bool(args.use_gpu) and torch.cuda.is_available()
+    in_path = "./benchmarks/" + args.dataset + "/"
+    train_dataloader = TrainDataLoader(
+        in_path=in_path,
+        batch_size=args.batch_size,
+        threads=8,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    test_dataloader = TestDataLoader(in_path, "link")
+    results = []
+    for reduce_dim in [int(d) for d in args.dims.split(",")]:
+        torch.manual_seed(args.seed)
+        reduce = args.method if reduce_dim > 0 else None
+        img_emb = load_features(
+            "./embeddings/" + args.dataset + "-visual.pth",
+            reduce=reduce,
+            reduce_dim=reduce_dim,
+        )
+        text_emb = load_features(
+            "./embeddings/" + args.dataset + "-textual.pth",
+            reduce=reduce,
+            reduce_dim=reduce_dim,
+        )
+        kge_score = AdvRelRotatE(
+            ent_tot=train_dataloader.get_ent_tot(),
+            rel_tot=train_dataloader.get_rel_tot(),
+            dim=args.dim,
+            margin=args.margin,
+            epsilon=2.0,
+            img_emb=img_emb,
+            text_emb=text_emb,
+        )
+        model = NegativeSampling(
+            model=kge_score,
+            loss=SigmoidLoss(adv_temperature=2.0),
+            batch_size=train_dataloader.get_batch_size(),
+        )
+        trainer = Trainer(
+            model=model,
+            data_loader=train_dataloader,
+            train_times=args.epoch,
+            alpha=args.learning_rate,
+            use_gpu=use_gpu,
+            opt_method="Adam",
+        )
+        if use_gpu:
+            model.cuda()
+        trainer.optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
+        batches = [
+            {k: v.copy() if hasattr(v, "copy") else v for k, v in data.items()}
+            for _, data in zip(range(args.steps + 5), train_dataloader)
+        ]
+        for data in batches[:5]:
+            trainer.train_one_step(data)
+        if use_gpu:
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for data in batches[5:]:
+            trainer.train_one_step(data)
+        if use_gpu:
+            torch.cuda.synchronize()
+        step_time = (time.perf_counter() - start) / args.steps
+        mrr = hit10 = float("nan")
+        if args.epoch > 0:
+            trainer.run()
+            tester = Tester(
+                model=kge_score, data_loader=test_dataloader, use_gpu=use_gpu
+            )
+            mrr, mr, hit10, hit3, hit1 = tester.run_link_prediction(
+                type_constrain=False
+            )
+        results.append((reduce_dim or img_emb.shape[1], step_time, mrr, hit10))
+
+    print("dim\tstep time (ms)\tMRR\tHit@10")
+    for reduce_dim, step_time, mrr, hit10 in results:
+        print(
+            "{}\t{:.2f}\t{:.4f}\t{:.4f}".format(
+                reduce_dim, 1000 * step_time, mrr, hit10
+            )
+        )
@@ -0,0 +1,152 @@
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import torch
+from mmkgc.feature import FrozenEmbedding, ShardedFeatureStore, StoreEmbedding
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-rows", type=int, default=50000)
+    arg.add_argument("-dim", type=int, default=1024)
+    arg.add_argument("-rows_per_shard", type=int, default=8192)
+    arg.add_argument("-cache_mb", type=int, default=32)
+    arg.add_argument("-batch", type=int, default=2048)
+    arg.add_argument("-steps", type=int, default=200)
+    arg.add_argument("-zipf", type=float, default=1.2)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def sample_batches(args):
+    # skewed entity frequencies, like the degree distribution of a KG
+    rng = np.random.RandomState(args.seed)
+    perm = rng.permutation(args.rows)
+    batches = []
+    for _ in range(args.steps):
+        ids = rng.zipf(args.zipf, size=args.batch) % args.rows
+        batches.append(perm[ids])
+    return batches
+
+
+def run(store, table, batches, prefetch):
+    store.reset_stats()
+    start = time.perf_counter()
+    if prefetch:
+        store.prefetch(batches[0]).result()
+    for step, ids in enumerate(batches):
+        if prefetch and step + 1 < len(batches):
+            future = store.prefetch(batches[step + 1])
+        rows = store.gather(ids)
+        assert np.array_equal(rows, table[ids]), "wrong rows returned"
+        # stand-in for the forward/backward pass of the batch
+        time.sleep(0.002)
+        if prefetch and step + 1 < len(batches):
+            future.result()
+    elapsed = time.perf_counter() - start
+    return elapsed, store.stats()
+
+
+def run_pinned(store, table, batches, pin):
+    # worst case: the next batch is prefetched before this one is gathered;
+    # counts the cached rows of the current batch that the prefetch evicts
+    store.reset_stats()
+    store.prefetch(batches[0]).result()
+    evicted = 0
+    for step, ids in enumerate(batches):
+        if pin:
+            store.pin(ids)
+        with store.lock:
+            cached = np.array([i for i in np.unique(ids) if i in store.cache])
+        if step + 1 < len(batches):
+            store.prefetch(batches[step + 1]).result()
+        evicted += len(store._missing(cached))
+        assert np.array_equal(store.gather(ids), table[ids]), "wrong rows returned"
+    store.pin(())
+    return evicted, store.stats()
+
+
+def check_build(path, table, rows_per_shard):
+    # a store remembers its source and is replaced whole when rebuilt
+    source = os.path.join(path, "features.npy")
+    store_path = os.path.join(path, "features-shards")
+    np.save(source, table)
+    assert ShardedFeatureStore.is_stale(store_path, source)
+    ShardedFeatureStore.build(table, store_path, rows_per_shard, source=source)
+    assert not ShardedFeatureStore.is_stale(store_path, source)
+    np.save(source, table[: rows_per_shard // 2])
+    os.utime(source, ns=(0, 0))
+    assert ShardedFeatureStore.is_stale(store_path, source)
+    ShardedFeatureStore.build(
+        table[: rows_per_shard // 2], store_path, rows_per_shard, source=source
+    )
+    assert not ShardedFeatureStore.is_stale(store_path, source)
+    assert sorted(os.listdir(path)) == ["features-shards", "features.npy"]
+    assert sorted(os.listdir(store_path)) == ["meta.json", "shard-00000.npy"]
+
+    # checkpoints with the in-memory table load into the store-backed layer
+    small = table[: rows_per_shard // 2]
+    layer = StoreEmbedding(ShardedFeatureStore(store_path))
+    layer.load_state_dict(FrozenEmbedding(torch.from_numpy(small)).state_dict())
+    for state in (
+        FrozenEmbedding(torch.from_numpy(small[:-1])).state_dict(),
+        {"weight": torch.from_numpy(small), "other": torch.zeros(1)},
+    ):
+        try:
+            layer.load_state_dict(state)
+            raise AssertionError("a mismatching state dict was accepted")
+        except RuntimeError:
+            pass
+    layer.store.close()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    rng = np.random.RandomState(args.seed)
+    table = rng.randn(args.rows, args.dim).astype(np.float32)
+    batches = sample_batches(args)
+    with tempfile.TemporaryDirectory() as path:
+        ShardedFeatureStore.build(table, path, rows_per_shard=args.rows_per_shard)
+        cache_bytes = args.cache_mb << 20
+        print(
+            "table {:.1f} MB, cache {:.1f} MB".format(
+                table.nbytes / 2**20, args.cache_mb
+            )
+        )
+        assert table.nbytes > cache_bytes, "the table should not fit in the cache"
+        for prefetch in [False, True]:
+            store = ShardedFeatureStore(path, cache_bytes=cache_bytes)
+            elapsed, stats = run(store, table, batches, prefetch)
+            store.close()
+            assert stats["cache_bytes"] <= cache_bytes
+            print(
+                "prefetch={}\t{:.3f}s\thit rate {:.3f}\tfetches {}\t"
+                "fetch latency {:.2f} ms\tprefetched rows {}".format(
+                    prefetch,
+                    elapsed,
+                    stats["hit_rate"],
+                    stats["fetches"],
+                    1000 * stats["fetch_latency"],
+                    stats["prefetched_rows"],
+                )
+            )
+        # a cache smaller than two batches, the next batch's prefetch evicts
+        # rows of the current one unless they are pinned
+        for pin in [False, True]:
+            store = ShardedFeatureStore(
+                path, cache_bytes=args.batch // 2 * table[0].nbytes
+            )
+            evicted, stats = run_pinned(store, table, batches, pin)
+            store.close()
+            print(
+                "pinned={}\tcurrent rows evicted {}\tmisses {}".format(
+                    pin, evicted, stats["misses"]
+                )
+            )
+        assert evicted == 0, "rows of the current batch were evicted"
+    with tempfile.TemporaryDirectory() as path:
+        check_build(path, table, args.rows_per_shard)
+    print("rebuilt stores replace the old one, stale stores are detected")
@@ -0,0 +1,130 @@
+import time
+import argparse
+import torch
+from mmkgc.config import Trainer, WCGTrainerGP, Tester
+from mmkgc.module.model import RotatE, AdvRelRotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling, NegativeSamplingGP
+from mmkgc.data import TrainDataLoader, TestDataLoader
+from mmkgc.feature import load_features
+from mmkgc.adv.modules import CombinedGenerator
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-W")
+    # "rotate": Trainer + RotatE, "gp": WCGTrainerGP + AdvRelRotatE
+    arg.add_argument("-model", type=str, default="rotate")
+    arg.add_argument("-workers", type=str, default="1,2,4,8")
+    arg.add_argument("-dim", type=int, default=250)
+    arg.add_argument("-batch_size", type=int, default=1024)
+    arg.add_argument("-neg_num", type=int, default=32)
+    arg.add_argument("-margin", type=float, default=12.0)
+    arg.add_argument("-learning_rate", type=float, default=1e-4)
+    arg.add_argument("-lrg", type=float, default=1e-4)
+    arg.add_argument("-mu", type=float, default=0.0001)
+    arg.add_argument("-epoch", type=int, default=5)
+    arg.add_argument("-test", type=int, default=1)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def build_trainer(args, train_dataloader, workers):
+    ent_tot = train_dataloader.get_ent_tot()
+    rel_tot = train_dataloader.get_rel_tot()
+    if args.model == "rotate":
+        kge_score = RotatE(ent_tot, rel_tot, dim=args.dim, margin=args.margin)
+        model = NegativeSampling(
+            model=kge_score,
+            loss=SigmoidLoss(adv_temperature=2.0),
+            batch_size=train_dataloader.get_batch_size(),
+        )
+        trainer = Trainer(
+            model=model,
+            data_loader=train_dataloader,
+            train_times=args.epoch,
+            alpha=args.learning_rate,
+            use_gpu=False,
+            opt_method="Adam",
+            workers=workers,
+            seed=args.seed,
+        )
+        return kge_score, trainer
+    kge_score = AdvRelRotatE(
+        ent_tot=ent_tot,
+        rel_tot=rel_tot,
+        dim=args.dim,
+        margin=args.margin,
+        epsilon=2.0,
+        img_emb=load_features("./embeddings/" + args.dataset + "-visual.pth"),
+        text_emb=load_features("./embeddings/" + args.dataset + "-textual.pth"),
+    )
+    model = NegativeSamplingGP(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=train_dataloader.get_batch_size(),
+        regul_rate=0.00001,
+    )
+    trainer = WCGTrainerGP(
+        model=model,
+        data_loader=train_dataloader,
+        train_times=args.epoch,
+        alpha=args.learning_rate,
+        use_gpu=False,
+        opt_method="Adam",
+        generator=CombinedGenerator(
+            noise_dim=64, structure_dim=2 * args.dim, img_dim=2 * args.dim
+        ),
+        lrg=args.lrg,
+        mu=args.mu,
+        workers=workers,
+        seed=args.seed,
+    )
+    return kge_score, trainer
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    print("{} cores".format(torch.get_num_threads()))
+    in_path = "./benchmarks/" + args.dataset + "/"
+    test_dataloader = TestDataLoader(in_path, "link") if args.test else None
+    results = []
+    for workers in [int(n) for n in args.workers.split(",")]:
+        torch.manual_seed(args.seed)
+        train_dataloader = TrainDataLoader(
+            in_path=in_path,
+            batch_size=args.batch_size,
+            threads=8,
+            sampling_mode="normal",
+            bern_flag=1,
+            filter_flag=1,
+            neg_ent=args.neg_num,
+            neg_rel=0,
+        )
+        triples = args.epoch * len(train_dataloader) * args.batch_size
+        kge_score, trainer = build_trainer(args, train_dataloader, workers)
+        start = time.perf_counter()
+        trainer.run()
+        elapsed = time.perf_counter() - start
+        mrr = hit10 = float("nan")
+        if args.test:
+            tester = Tester(model=kge_score, data_loader=test_dataloader, use_gpu=False)
+            mrr, mr, hit10, hit3, hit1 = tester.run_link_prediction(
+                type_constrain=False
+            )
+        results.append((workers, triples / elapsed, mrr, hit10))
+
+    print("workers\ttriples/s\tMRR\tHit@10")
+    for workers, speed, mrr, hit10 in results:
+        print("{}\t{:.0f}\t{:.4f}\t{:.4f}".format(workers, speed, mrr, hit10))
+
+    # validation and state snapshots need a single process
+    for option in ("validator", "state_path"):
+        kge_score, trainer = build_trainer(args, train_dataloader, 2)
+        setattr(trainer, option, object() if option == "validator" else "state")
+        try:
+            trainer.run()
+            raise AssertionError("Hogwild accepted a {}".format(option))
+        except ValueError as e:
+            print(e)
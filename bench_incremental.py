@@ -0,0 +1,149 @@
+import os
+import time
+import ctypes
+import argparse
+import tempfile
+import numpy as np
+import torch
+from mmkgc.data import TrainDataLoader
+from mmkgc.data.PartitionedGraph import read_count, read_triples
+from mmkgc.module.model import RotatE
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-delta", type=float, default=0.1)
+    arg.add_argument("-new_entities", type=int, default=100)
+    arg.add_argument("-batch_size", type=int, default=1024)
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def write_dataset(path, triples, ent_tot, rel_tot):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "entity2id.txt"), "w") as f:
+        f.write("{}\n".format(ent_tot))
+    with open(os.path.join(path, "relation2id.txt"), "w") as f:
+        f.write("{}\n".format(rel_tot))
+    with open(os.path.join(path, "train2id.txt"), "w") as f:
+        f.write("{}\n".format(len(triples)))
+        np.savetxt(f, triples, fmt="%d")
+    return os.path.join(path, "")
+
+
+def sampler_state(loader):
+    # the tables Base.so samples and filters with
+    lib = loader.lib
+    state = {}
+    for name in ("trainHead", "trainTail", "trainRel", "trainList"):
+        addr = ctypes.c_void_p.in_dll(lib, name).value
+        state[name] = np.ctypeslib.as_array(
+            (ctypes.c_int64 * (3 * loader.tripleTotal)).from_address(addr)
+        ).copy()
+    for name in ("freqEnt", "lefHead", "rigHead", "lefTail", "rigTail"):
+        addr = ctypes.c_void_p.in_dll(lib, name).value
+        state[name] = np.ctypeslib.as_array(
+            (ctypes.c_int64 * loader.entTotal).from_address(addr)
+        ).copy()
+    for name in ("left_mean", "right_mean"):
+        addr = ctypes.c_void_p.in_dll(lib, name).value
+        state[name] = np.ctypeslib.as_array(
+            (ctypes.c_float * loader.relTotal).from_address(addr)
+        ).copy()
+    return state
+
+
+def loader(path, args):
+    return TrainDataLoader(
+        in_path=path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=1,
+        neg_rel=0,
+    )
+
+
+def main(args, path):
+    in_path = os.path.join("benchmarks", args.dataset)
+    ent_tot = read_count(os.path.join(in_path, "entity2id.txt"))
+    rel_tot = read_count(os.path.join(in_path, "relation2id.txt"))
+    triples = next(read_triples(os.path.join(in_path, "train2id.txt")))
+    rng = np.random.RandomState(args.seed)
+    # new triples that link existing entities to new ones, plus a resend of
+    # already known triples that must be skipped
+    new = np.stack(
+        (
+            rng.randint(0, ent_tot, args.new_entities),
+            ent_tot + np.arange(args.new_entities),
+            rng.randint(0, rel_tot, args.new_entities),
+        ),
+        axis=1,
+    )
+    order = rng.permutation(len(triples))
+    n = int(len(triples) * args.delta)
+    base, delta = triples[order[n:]], triples[order[:n]]
+    delta = np.concatenate((delta, new, delta[:10]))
+
+    start = time.perf_counter()
+    full = loader(
+        write_dataset(
+            os.path.join(path, "full"),
+            np.concatenate((base, delta)),
+            ent_tot + args.new_entities,
+            rel_tot,
+        ),
+        args,
+    )
+    reimport = time.perf_counter() - start
+    expected = sampler_state(full)
+
+    incremental = loader(
+        write_dataset(os.path.join(path, "base"), base, ent_tot, rel_tot), args
+    )
+    start = time.perf_counter()
+    added = incremental.add_triples(delta)
+    elapsed = time.perf_counter() - start
+    print(
+        "added {} of {} triples in {:.1f} ms, full reimport {:.1f} ms".format(
+            added, len(delta), 1000 * elapsed, 1000 * reimport
+        )
+    )
+    assert incremental.get_ent_tot() == full.get_ent_tot()
+    assert incremental.get_triple_tot() == full.get_triple_tot()
+    assert len(incremental) == len(full)
+    for name, value in sampler_state(incremental).items():
+        assert np.allclose(value, expected[name], equal_nan=True), name
+    print("sampler tables match the full reimport")
+
+    # the model grows with the new entities, the known rows are kept
+    torch.manual_seed(args.seed)
+    model = RotatE(ent_tot, rel_tot, dim=args.dim, margin=6.0)
+    before = model.ent_embeddings.weight.detach().clone()
+    model.grow(ent_tot=incremental.get_ent_tot())
+    assert model.ent_embeddings.weight.shape[0] == incremental.get_ent_tot()
+    assert torch.equal(model.ent_embeddings.weight[:ent_tot], before)
+    bound = model.ent_embedding_range.item()
+    assert model.ent_embeddings.weight[ent_tot:].abs().max() <= bound
+    for data in incremental:
+        model(
+            {
+                "batch_h": torch.from_numpy(data["batch_h"]),
+                "batch_t": torch.from_numpy(data["batch_t"]),
+                "batch_r": torch.from_numpy(data["batch_r"]),
+                "mode": data["mode"],
+            }
+        )
+        break
+    print("model grown to {} entities".format(model.ent_tot))
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    with tempfile.TemporaryDirectory() as path:
+        main(args, path)
@@ -0,0 +1,221 @@
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import torch
+import torch.optim as optim
+from mmkgc.data import TrainDataLoader
+from mmkgc.module.model import AdvRelRotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-entities", type=int, default=3000)
+    arg.add_argument("-relations", type=int, default=10)
+    arg.add_argument("-triples", type=int, default=30000)
+    arg.add_argument("-clusters", type=int, default=30)
+    arg.add_argument("-new", type=float, default=0.1)
+    arg.add_argument("-neighbours", type=int, default=3)
+    arg.add_argument("-dim", type=int, default=32)
+    arg.add_argument("-batch_size", type=int, default=1024)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-learning_rate", type=float, default=2e-3)
+    arg.add_argument("-epoch", type=int, default=30)
+    arg.add_argument("-bulk", type=int, default=10000)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def synthetic_graph(args, rng):
+    # relation r links cluster c to cluster (c + r) % clusters and the
+    # features of an entity are a noisy signature of its cluster
+    cluster = rng.randint(0, args.clusters, size=args.entities)
+    members = [np.flatnonzero(cluster == c) for c in range(args.clusters)]
+    h = rng.randint(0, args.entities, size=args.triples)
+    r = rng.randint(0, args.relations, size=args.triples)
+    t = np.array(
+        [rng.choice(members[(cluster[e] + k) % args.clusters]) for e, k in zip(h, r)]
+    )
+    triples = np.unique(np.stack((h, t, r), axis=1), axis=0)
+    img = rng.randn(args.clusters, 64)[cluster] + 0.5 * rng.randn(args.entities, 64)
+    text = rng.randn(args.clusters, 48)[cluster] + 0.5 * rng.randn(args.entities, 48)
+    return triples, cluster, torch.FloatTensor(img), torch.FloatTensor(text)
+
+
+def write_dataset(path, triples, ent_tot, rel_tot):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "entity2id.txt"), "w") as f:
+        f.write("{}\n".format(ent_tot))
+    with open(os.path.join(path, "relation2id.txt"), "w") as f:
+        f.write("{}\n".format(rel_tot))
+    with open(os.path.join(path, "train2id.txt"), "w") as f:
+        f.write("{}\n".format(len(triples)))
+        np.savetxt(f, triples, fmt="%d")
+    return os.path.join(path, "")
+
+
+def train(args, model, path):
+    data_loader = TrainDataLoader(
+        in_path=path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    data_loader.set_seed(args.seed)
+    optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
+    for _ in range(args.epoch):
+        res = 0.0
+        for data in data_loader:
+            optimizer.zero_grad()
+            loss, _ = model(
+                {
+                    "batch_h": torch.from_numpy(data["batch_h"]),
+                    "batch_t": torch.from_numpy(data["batch_t"]),
+                    "batch_r": torch.from_numpy(data["batch_r"]),
+                    "batch_y": torch.from_numpy(data["batch_y"]),
+                    "mode": data["mode"],
+                }
+            )
+            loss.backward()
+            optimizer.step()
+            res += loss.item()
+    return res / len(data_loader)
+
+
+def mrr(model, test, new, ent_tot):
+    # rank the known end of every test triple against all known entities
+    candidates = torch.arange(ent_tot)
+    ranks = []
+    with torch.no_grad():
+        for h, t, r in test.tolist():
+            tail = h >= ent_tot
+            score = model.predict_inductive(
+                {
+                    "batch_h": torch.LongTensor([h]) if tail else candidates,
+                    "batch_t": candidates if tail else torch.LongTensor([t]),
+                    "batch_r": torch.LongTensor([r]),
+                    "mode": "tail_batch" if tail else "head_batch",
+                },
+                new,
+            )
+            target = t if tail else h
+            ranks.append(1 + (score < score[target]).sum())
+    return np.mean(1.0 / np.array(ranks))
+
+
+def main(args, path):
+    rng = np.random.RandomState(args.seed)
+    triples, cluster, img, text = synthetic_graph(args, rng)
+    # the last entities of a random order are held out, known ids come first
+    order = rng.permutation(args.entities)
+    ent_tot = args.entities - int(args.entities * args.new)
+    ids = np.empty(args.entities, dtype=np.int64)
+    ids[order] = np.arange(args.entities)
+    triples = np.stack((ids[triples[:, 0]], ids[triples[:, 1]], triples[:, 2]), 1)
+    img, text, cluster = img[order], text[order], cluster[order]
+    is_new = (triples[:, 0] >= ent_tot) | (triples[:, 1] >= ent_tot)
+    both_new = (triples[:, 0] >= ent_tot) & (triples[:, 1] >= ent_tot)
+    known, linked = triples[~is_new], triples[is_new & ~both_new]
+    # a few triples of every new entity are its neighbours, the rest is test
+    linked = linked[rng.permutation(len(linked))]
+    new_end = np.maximum(linked[:, 0], linked[:, 1])
+    seen = {}
+    neighbour = np.zeros(len(linked), dtype=bool)
+    for i, e in enumerate(new_end):
+        if seen.get(e, 0) < args.neighbours:
+            seen[e] = seen.get(e, 0) + 1
+            neighbour[i] = True
+    neighbours, test = linked[neighbour], linked[~neighbour]
+
+    torch.manual_seed(args.seed)
+    kge_score = AdvRelRotatE(
+        ent_tot,
+        args.relations,
+        dim=args.dim,
+        margin=6.0,
+        epsilon=2.0,
+        img_emb=img[:ent_tot],
+        text_emb=text[:ent_tot],
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=args.batch_size,
+    )
+    start = time.perf_counter()
+    loss = train(args, model, write_dataset(path, known, ent_tot, args.relations))
+    print(
+        "trained on {} triples of {} known entities in {:.1f}s, loss {:.4f}".format(
+            len(known), ent_tot, time.perf_counter() - start, loss
+        )
+    )
+    kge_score.eval()
+
+    start = time.perf_counter()
+    features_only = kge_score.inductive_entities(img[ent_tot:], text[ent_tot:])
+    features_time = time.perf_counter() - start
+    start = time.perf_counter()
+    solved = kge_score.inductive_entities(
+        img[ent_tot:], text[ent_tot:], neighbours=neighbours
+    )
+    solve_time = time.perf_counter() - start
+    bound = kge_score.ent_embedding_range.item()
+    random_structure = dict(
+        features_only,
+        ent=torch.empty_like(features_only["ent"]).uniform_(-bound, bound),
+    )
+    n_new = args.entities - ent_tot
+    print(
+        "{} new entities, {} neighbour triples, {} test triples".format(
+            n_new, len(neighbours), len(test)
+        )
+    )
+    print("embedding\t\t\tMRR")
+    print(
+        "random structure + features\t{:.4f}".format(
+            mrr(kge_score, test, random_structure, ent_tot)
+        )
+    )
+    print(
+        "features only\t\t\t{:.4f}\t{:.1f} ms".format(
+            mrr(kge_score, test, features_only, ent_tot), 1000 * features_time
+        )
+    )
+    print(
+        "features + local solve\t\t{:.4f}\t{:.1f} ms".format(
+            mrr(kge_score, test, solved, ent_tot), 1000 * solve_time
+        )
+    )
+    print("random ranking\t\t\t{:.4f}".format(np.mean(1.0 / np.arange(1, ent_tot + 1))))
+    # the tails of a relation are drawn uniformly from one cluster, so at best
+    # the true end is ranked uniformly among the known members of its cluster
+    size = np.bincount(cluster[:ent_tot], minlength=args.clusters)
+    target = np.where(test[:, 0] >= ent_tot, test[:, 1], test[:, 0])
+    n = size[cluster[target]]
+    harmonic = np.cumsum(1.0 / np.arange(1, size.max() + 1))
+    print("cluster-level ceiling\t\t{:.4f}".format(np.mean(harmonic[n - 1] / n)))
+
+    # batched inference for many new entities at once
+    pick = rng.randint(0, n_new, size=args.bulk)
+    start = time.perf_counter()
+    with torch.no_grad():
+        kge_score.inductive_entities(img[ent_tot:][pick], text[ent_tot:][pick])
+    print(
+        "{} new entities embedded in {:.1f} ms".format(
+            args.bulk, 1000 * (time.perf_counter() - start)
+        )
+    )
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    with tempfile.TemporaryDirectory() as path:
+        main(args, path)
@@ -0,0 +1,180 @@
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import torch
+from mmkgc.config import PartitionedTrainer
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+from mmkgc.data import PartitionedGraph
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-entities", type=int, default=1000000)
+    arg.add_argument("-relations", type=int, default=50)
+    arg.add_argument("-triples", type=int, default=5000000)
+    arg.add_argument("-clusters", type=int, default=100)
+    arg.add_argument("-partitions", type=int, default=8)
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-batch_size", type=int, default=4096)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-margin", type=float, default=6.0)
+    arg.add_argument("-learning_rate", type=float, default=0.1)
+    arg.add_argument("-epoch", type=int, default=3)
+    arg.add_argument("-test", type=int, default=1000)
+    arg.add_argument("-seed", type=int, default=42)
+    arg.add_argument("-path", type=str, default=None)
+    return arg.parse_args()
+
+
+def synthetic_triples(args, rng, n):
+    # relation r links cluster c to cluster (c + r) % clusters, so tails are
+    # predictable from the head and the relation
+    h = rng.randint(0, args.entities, size=n)
+    r = rng.randint(0, args.relations, size=n)
+    cluster = (h % args.clusters + r) % args.clusters
+    size = args.entities // args.clusters
+    t = rng.randint(0, size, size=n) * args.clusters + cluster
+    return np.stack((h, t, r), axis=1)
+
+
+def write_dataset(args, path):
+    rng = np.random.RandomState(args.seed)
+    with open(os.path.join(path, "entity2id.txt"), "w") as f:
+        f.write("{}\n".format(args.entities))
+    with open(os.path.join(path, "relation2id.txt"), "w") as f:
+        f.write("{}\n".format(args.relations))
+    with open(os.path.join(path, "train2id.txt"), "w") as f:
+        f.write("{}\n".format(args.triples))
+        for lef in range(0, args.triples, 1 << 20):
+            n = min(1 << 20, args.triples - lef)
+            np.savetxt(f, synthetic_triples(args, rng, n), fmt="%d")
+    return synthetic_triples(args, rng, args.test)
+
+
+def sampled_mrr(args, model, test, candidates=100):
+    # rank the true tail against random tails with the unpartitioned model
+    rng = np.random.RandomState(args.seed + 1)
+    ranks = []
+    with torch.no_grad():
+        for h, t, r in test:
+            tails = np.concatenate(([t], rng.randint(0, args.entities, candidates)))
+            score = model(
+                {
+                    "batch_h": torch.full((len(tails),), h, dtype=torch.long),
+                    "batch_t": torch.from_numpy(tails),
+                    "batch_r": torch.full((len(tails),), r, dtype=torch.long),
+                    "mode": "normal",
+                }
+            )
+            ranks.append(1 + (score[1:] > score[0]).sum().item())
+    return np.mean(1.0 / np.array(ranks))
+
+
+def main(args, path):
+    data_path = os.path.join(path, "data")
+    os.makedirs(data_path, exist_ok=True)
+    start = time.perf_counter()
+    test = write_dataset(args, data_path)
+    print(
+        "wrote {} triples in {:.1f}s".format(args.triples, time.perf_counter() - start)
+    )
+    start = time.perf_counter()
+    graph = PartitionedGraph.build(
+        data_path, os.path.join(path, "parts"), args.partitions
+    )
+    print(
+        "{} partitions, {} buckets in {:.1f}s".format(
+            graph.partitions, len(graph.buckets), time.perf_counter() - start
+        )
+    )
+    # an interrupted build leaves bucket bodies behind, a rebuild ignores them
+    i, j = graph.buckets[0]
+    with open(os.path.join(graph.bucket_path(i, j), "train2id.body"), "w") as f:
+        f.write("0 0 0\n")
+    sizes = graph.bucket_sizes
+    graph = PartitionedGraph.build(
+        data_path, os.path.join(path, "parts"), args.partitions
+    )
+    assert graph.bucket_sizes == sizes
+    assert sum(sizes.values()) == args.triples
+    with open(os.path.join(graph.bucket_path(i, j), "train2id.txt")) as f:
+        assert sum(1 for _ in f) == sizes[(i, j)] + 1
+
+    torch.manual_seed(args.seed)
+    kge_score = RotatE(
+        ent_tot=graph.max_bucket_entities(),
+        rel_tot=graph.rel_tot,
+        dim=args.dim,
+        margin=args.margin,
+        sparse=True,
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=1.0),
+        batch_size=args.batch_size,
+    )
+    trainer = PartitionedTrainer(
+        model=model,
+        graph=graph,
+        alpha=args.learning_rate,
+        neg_ent=args.neg_num,
+    )
+    bound = kge_score.ent_embedding_range.item()
+    trainer.init_embeddings(-bound, bound, seed=args.seed)
+    trainer.init_optimizer()
+    losses = []
+    for epoch in range(args.epoch):
+        start = time.perf_counter()
+        losses.append(sum(trainer.train_bucket(i, j) for i, j in graph.buckets))
+        print(
+            "epoch {}\tloss {:.2f}\t{:.1f}s".format(
+                epoch, losses[-1], time.perf_counter() - start
+            )
+        )
+    ckpt = os.path.join(path, "partitioned.ckpt")
+    trainer.save_checkpoint(ckpt)
+
+    stats = trainer.stats()
+    max_part = max(graph.sizes)
+    print(
+        "resident entity rows {} of {} ({:.1%}), {} swaps, {:.1f} MB swapped "
+        "in {:.1f}s".format(
+            stats["max_resident_rows"],
+            graph.ent_tot,
+            stats["max_resident_rows"] / graph.ent_tot,
+            stats["swaps"],
+            stats["swap_bytes"] / 2**20,
+            stats["swap_time"],
+        )
+    )
+    assert stats["max_resident_rows"] <= 2 * max_part
+    assert losses[-1] < losses[0], "the loss did not decrease"
+
+    # the checkpoint loads into the unpartitioned model
+    full = RotatE(graph.ent_tot, graph.rel_tot, dim=args.dim, margin=args.margin)
+    full.load_state_dict(torch.load(ckpt))
+    for p in range(graph.partitions):
+        assert np.array_equal(
+            full.ent_embeddings.weight[graph.entities(p)].detach().numpy(),
+            graph.open_table("ent_embeddings", p),
+        )
+    if args.test:
+        print(
+            "sampled MRR (1 true + 100 random tails): {:.4f}, random {:.4f}".format(
+                sampled_mrr(args, full, test), np.mean(1.0 / np.arange(1, 102))
+            )
+        )
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    if args.path is None:
+        with tempfile.TemporaryDirectory() as path:
+            main(args, path)
+    else:
+        main(args, args.path)
@@ -0,0 +1,120 @@
+import os
+import argparse
+import tempfile
+import torch
+from mmkgc.config import Trainer, WCGTrainerGP
+from mmkgc.data import TrainDataLoader
+from mmkgc.module.model import AdvRelRotatE, RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling, NegativeSamplingGP
+from mmkgc.adv.modules import CombinedGenerator
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-dim", type=int, default=32)
+    arg.add_argument("-epoch", type=int, default=4)
+    arg.add_argument("-preempt", type=int, default=2)
+    arg.add_argument("-batch_size", type=int, default=4096)
+    arg.add_argument("-neg_num", type=int, default=4)
+    arg.add_argument("-threads", type=int, default=2)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def build(args, kind, epochs, state_path, seed):
+    # everything is built anew, as in a restarted process
+    torch.manual_seed(seed)
+    data_loader = TrainDataLoader(
+        in_path="./benchmarks/" + args.dataset + "/",
+        batch_size=args.batch_size,
+        threads=args.threads,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    data_loader.set_seed(seed)
+    ent_tot, rel_tot = data_loader.get_ent_tot(), data_loader.get_rel_tot()
+    if kind == "Trainer":
+        model = NegativeSampling(
+            model=RotatE(ent_tot, rel_tot, dim=args.dim, margin=6.0),
+            loss=SigmoidLoss(adv_temperature=2.0),
+            batch_size=data_loader.get_batch_size(),
+        )
+        return Trainer(
+            model=model,
+            data_loader=data_loader,
+            train_times=epochs,
+            alpha=1e-3,
+            use_gpu=False,
+            opt_method="adam",
+            state_path=state_path,
+        )
+    # fixed synthetic features, the same in every process
+    features = torch.Generator().manual_seed(0)
+    kge_score = AdvRelRotatE(
+        ent_tot,
+        rel_tot,
+        dim=args.dim,
+        margin=6.0,
+        epsilon=2.0,
+        img_emb=torch.randn(ent_tot, 64, generator=features),
+        text_emb=torch.randn(ent_tot, 48, generator=features),
+    )
+    model = NegativeSamplingGP(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=data_loader.get_batch_size(),
+        regul_rate=0.00001,
+    )
+    return WCGTrainerGP(
+        model=model,
+        data_loader=data_loader,
+        train_times=epochs,
+        alpha=1e-3,
+        use_gpu=False,
+        opt_method="Adam",
+        generator=CombinedGenerator(
+            noise_dim=64, structure_dim=2 * args.dim, img_dim=2 * args.dim
+        ),
+        lrg=1e-3,
+        mu=0.0001,
+        state_path=state_path,
+    )
+
+
+def run(trainer):
+    # the per-epoch losses are the trajectory
+    losses = []
+    describe = trainer.epoch_description
+
+    def record(epoch, res):
+        losses.append(res)
+        return describe(epoch, res)
+
+    trainer.epoch_description = record
+    trainer.run()
+    return losses
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    for kind in ("Trainer", "WCGTrainerGP"):
+        with tempfile.TemporaryDirectory() as tmp:
+            state = os.path.join(tmp, "state.pt")
+            straight = build(args, kind, args.epoch, None, args.seed)
+            expected = run(straight)
+            # preempted after args.preempt epochs, then restarted
+            first = run(build(args, kind, args.preempt, state, args.seed))
+            resumed = build(args, kind, args.epoch, state, args.seed + 1)
+            rest = run(resumed)
+        print(kind, "straight:", expected)
+        print(kind, "resumed: ", first + rest)
+        assert first + rest == expected
+        for name, tensor in straight.model.state_dict().items():
+            assert torch.equal(tensor, resumed.model.state_dict()[name]), name
+        print(kind, "continues on the same trajectory")
@@ -0,0 +1,122 @@
+import time
+import argparse
+import numpy as np
+import torch
+from mmkgc.config import Trainer, StreamingTester, SampledTester
+from mmkgc.data import TrainDataLoader
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-epoch", type=int, default=20)
+    arg.add_argument("-batch_size", type=int, default=2048)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-queries", type=int, default=300)
+    arg.add_argument("-negatives", type=str, default="100,500,2000")
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def report(name, results, elapsed, intervals=None):
+    line = "{:<24} {:7.1f} s".format(name, elapsed)
+    for metric, value in zip(SampledTester.metrics, results):
+        line += "  {} {:.4f}".format(metric, value)
+        if intervals is not None:
+            lo, hi = intervals[metric]
+            line += " [{:.4f}, {:.4f}]".format(lo, hi)
+    print(line)
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    torch.manual_seed(args.seed)
+    in_path = "./benchmarks/" + args.dataset + "/"
+    data_loader = TrainDataLoader(
+        in_path=in_path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    kge_score = RotatE(
+        ent_tot=data_loader.get_ent_tot(),
+        rel_tot=data_loader.get_rel_tot(),
+        dim=args.dim,
+        margin=6.0,
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=data_loader.get_batch_size(),
+    )
+    Trainer(
+        model=model,
+        data_loader=data_loader,
+        train_times=args.epoch,
+        alpha=0.01,
+        use_gpu=False,
+        opt_method="adam",
+    ).run()
+    kge_score.eval()
+
+    exact = StreamingTester(model=kge_score, in_path=in_path, use_gpu=False)
+    test = exact.read("test2id.txt")
+    rows = np.random.RandomState(args.seed).choice(len(test), args.queries, False)
+    test = test[np.sort(rows)]
+    start = time.perf_counter()
+    report("exact", exact.evaluate(test, False), time.perf_counter() - start)
+    ranks = exact.ranks["filtered"]
+
+    # every entity sampled: the estimate is the exact rank
+    full = SampledTester(kge_score, in_path, negatives=exact.ent_tot, use_gpu=False)
+    full.evaluate(test, False)
+    assert np.array_equal(full.ranks["filtered"], ranks)
+
+    for negatives in map(int, args.negatives.split(",")):
+        sampled = SampledTester(kge_score, in_path, negatives=negatives, use_gpu=False)
+        start = time.perf_counter()
+        results = sampled.evaluate(test, False)
+        elapsed = time.perf_counter() - start
+        report("sampled %d" % negatives, results, elapsed, sampled.intervals)
+
+    # type constrained: the exact numbers sample the whole candidate sets
+    constrained = SampledTester(
+        kge_score, in_path, negatives=exact.ent_tot, type_constrain=True, use_gpu=False
+    )
+    start = time.perf_counter()
+    results = constrained.evaluate(test, False)
+    report("constrained exact", results, time.perf_counter() - start)
+    for negatives in map(int, args.negatives.split(",")):
+        sampled = SampledTester(
+            kge_score, in_path, negatives=negatives, type_constrain=True, use_gpu=False
+        )
+        start = time.perf_counter()
+        results = sampled.evaluate(test, False)
+        elapsed = time.perf_counter() - start
+        report("constrained %d" % negatives, results, elapsed, sampled.intervals)
+
+    # the exact constrained ranks of StreamingTester, and the call-time
+    # type_constrain over the whole test set
+    exact.evaluate(test, False, type_constrain=True)
+    assert np.array_equal(constrained.ranks["filtered"], exact.ranks["filtered"])
+    sampled = SampledTester(kge_score, in_path, negatives=100, use_gpu=False)
+    start = time.perf_counter()
+    unconstrained = sampled.run_link_prediction()
+    report("test set, sampled 100", unconstrained, time.perf_counter() - start)
+    start = time.perf_counter()
+    results = sampled.run_link_prediction(type_constrain=True)
+    report("test set, constrained 100", results, time.perf_counter() - start)
+    assert results != unconstrained
+    assert sampled.run_link_prediction(type_constrain=False) == unconstrained
+    assert constrained.run_link_prediction(type_constrain=True) == (
+        constrained.run_link_prediction()
+    )
@@ -0,0 +1,169 @@
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import numpy as np
+import torch
+from mmkgc.data.PartitionedGraph import read_count, read_triples
+from mmkgc.module.model import RotatE, TransE
+from mmkgc.serve import EntityScorer, InferenceServer, serve_http, http_request
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-model", type=str, default="rotate")
+    arg.add_argument("-checkpoint", type=str, default=None)
+    arg.add_argument("-dim", type=int, default=128)
+    arg.add_argument("-k", type=int, default=10)
+    arg.add_argument("-clients", type=int, default=64)
+    arg.add_argument("-requests", type=int, default=2000)
+    arg.add_argument("-max_batch", type=str, default="1,32,256")
+    arg.add_argument("-max_latency", type=float, default=0.005)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def build_model(args, ent_tot, rel_tot):
+    # latency does not depend on the weights, a fresh model is enough
+    torch.manual_seed(args.seed)
+    if args.model == "rotate":
+        model = RotatE(ent_tot, rel_tot, dim=args.dim, margin=6.0)
+    else:
+        model = TransE(ent_tot, rel_tot, dim=args.dim, p_norm=1, norm_flag=True)
+    if args.checkpoint:
+        model.load_checkpoint(args.checkpoint)
+    return model
+
+
+def make_requests(args, test):
+    rows = test[np.arange(args.requests) % len(test)]
+    return [
+        (
+            {"h": int(h), "r": int(r), "k": args.k}
+            if i % 2 == 0
+            else {"r": int(r), "t": int(t), "k": args.k}
+        )
+        for i, (h, t, r) in enumerate(rows)
+    ]
+
+
+async def load(requests, clients, send):
+    # closed loop: every client sends its next request when the last returns
+    latencies = []
+
+    async def client(part):
+        state = {}
+        for request in part:
+            start = time.perf_counter()
+            await send(request, state)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(requests[i::clients]) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    return np.array(latencies) * 1000, len(requests) / elapsed
+
+
+async def status(path, request_line):
+    # the status code of a bodiless request to serve_http
+    reader, writer = await asyncio.open_unix_connection(path)
+    writer.write(request_line + b" HTTP/1.1\r\nConnection: close\r\n\r\n")
+    await writer.drain()
+    line = await reader.readline()
+    writer.close()
+    return line.split()[1]
+
+
+async def bench(args, scorer, requests, front, path):
+    print("front\tmax_batch\tp50 ms\tp99 ms\tQPS\tmean batch")
+    for max_batch in map(int, args.max_batch.split(",")):
+        server = InferenceServer(scorer, max_batch, args.max_latency)
+        if front == "inproc":
+            await server.start()
+
+            async def send(request, state):
+                return await server.submit(request)
+
+        else:
+            listener = await serve_http(server, path=path)
+
+            async def send(request, state):
+                answer, state["connection"] = await http_request(
+                    request, path=path, connection=state.get("connection")
+                )
+                return answer
+
+        latencies, qps = await load(requests, args.clients, send)
+        await server.stop()
+        if front != "inproc":
+            listener.close()
+            await listener.wait_closed()
+        print(
+            "{}\t{}\t\t{:.2f}\t{:.2f}\t{:.0f}\t{:.1f}".format(
+                front,
+                max_batch,
+                np.percentile(latencies, 50),
+                np.percentile(latencies, 99),
+                qps,
+                server.requests / server.batches,
+            )
+        )
+
+
+async def main(args):
+    in_path = os.path.join("benchmarks", args.dataset, "")
+    ent_tot = read_count(in_path + "entity2id.txt")
+    rel_tot = read_count(in_path + "relation2id.txt")
+    scorer = EntityScorer(build_model(args, ent_tot, rel_tot))
+    test = next(read_triples(in_path + "test2id.txt"))
+    requests = make_requests(args, test)
+
+    # the server answers like the model ranks
+    server = InferenceServer(scorer, max_batch=8)
+    await server.start()
+    h, t, r = (int(x) for x in test[0])
+    # malformed requests fail alone, the one batched with them is answered
+    answer, *errors = await asyncio.gather(
+        server.submit({"h": h, "r": r, "k": args.k}),
+        server.submit({"h": h}),
+        server.submit({"h": -1, "r": r}),
+        server.submit({"r": r, "t": ent_tot}),
+        return_exceptions=True,
+    )
+    assert all(isinstance(e, ValueError) for e in errors)
+    await server.stop()
+    with torch.no_grad():
+        score = scorer.model.predict(
+            {
+                "batch_h": torch.tensor([h]),
+                "batch_t": torch.arange(ent_tot),
+                "batch_r": torch.tensor([r]),
+                "mode": "tail_batch",
+            }
+        )
+    assert answer["ids"] == np.argsort(score, kind="stable")[: args.k].tolist()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "serve.sock")
+        listener = await serve_http(server, path=path)
+        assert await status(path, b"GET /predict") == b"405"
+        assert await status(path, b"POST /other") == b"404"
+        listener.close()
+        await listener.wait_closed()
+    await server.stop()
+
+    print(
+        "{}: {} entities, {} requests from {} clients".format(
+            args.dataset, ent_tot, len(requests), args.clients
+        )
+    )
+    await bench(args, scorer, requests, "inproc", None)
+    with tempfile.TemporaryDirectory() as tmp:
+        await bench(args, scorer, requests, "uds", os.path.join(tmp, "serve.sock"))
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    asyncio.run(main(args))
@@ -0,0 +1,163 @@
+import os
+import time
+import argparse
+import types
+import numpy as np
+import torch
+import torch.optim as optim
+import torch.distributed as dist
+import torch.multiprocessing as mp
+from mmkgc.config import SplitOptimizer
+from mmkgc.config.Distributed import init_distributed, distribute, sync_gradients
+from mmkgc.module.model import RotatE, TransE, full_state_dict
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-nprocs", type=int, default=4)
+    arg.add_argument("-model", type=str, default="rotate")
+    arg.add_argument("-entities", type=int, default=1000000)
+    arg.add_argument("-relations", type=int, default=200)
+    arg.add_argument("-dim", type=int, default=100)
+    arg.add_argument("-batch_size", type=int, default=1024)
+    arg.add_argument("-neg_num", type=int, default=32)
+    arg.add_argument("-steps", type=int, default=20)
+    # 1: sparse row gradients for the sharded tables, trained by SplitOptimizer
+    arg.add_argument("-sparse", type=int, default=0)
+    arg.add_argument("-seed", type=int, default=42)
+    arg.add_argument("-port", type=int, default=29533)
+    return arg.parse_args()
+
+
+class Seeded(object):
+    # stand-in for the data loader that distribute() reseeds
+    def __init__(self, args):
+        self.args = args
+        self.rng = np.random.RandomState(args.seed)
+
+    def set_seed(self, seed):
+        self.rng = np.random.RandomState(seed)
+
+    def set_nbatches(self, nbatches):
+        pass
+
+    def __len__(self):
+        return self.args.steps
+
+    def sample(self):
+        args = self.args
+        h = self.rng.randint(0, args.entities, size=args.batch_size)
+        t = self.rng.randint(0, args.entities, size=args.batch_size)
+        r = self.rng.randint(0, args.relations, size=args.batch_size)
+        neg_t = self.rng.randint(0, args.entities, size=args.batch_size * args.neg_num)
+        return {
+            "batch_h": torch.from_numpy(np.tile(h, args.neg_num + 1)),
+            "batch_t": torch.from_numpy(np.concatenate((t, neg_t))),
+            "batch_r": torch.from_numpy(np.tile(r, args.neg_num + 1)),
+            "mode": "tail_batch",
+        }
+
+
+def build(args, sharded, sparse=False):
+    if args.model == "rotate":
+        kge_score = RotatE(
+            args.entities,
+            args.relations,
+            dim=args.dim,
+            margin=6.0,
+            sparse=sparse,
+            sharded=sharded,
+        )
+    else:
+        kge_score = TransE(
+            args.entities,
+            args.relations,
+            dim=args.dim,
+            p_norm=1,
+            sparse=sparse,
+            sharded=sharded,
+        )
+    return NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=args.batch_size,
+    )
+
+
+def dense_grad(p):
+    return p.grad.to_dense() if p.grad.is_sparse else p.grad
+
+
+def check(args, rank, world_size, model, data):
+    # the sharded lookups and gradients must match the unsharded model
+    reference = build(args, sharded=False)
+    reference.load_state_dict(full_state_dict(model))
+    loss, _ = model(data)
+    ref_loss, _ = reference(data)
+    assert torch.allclose(loss, ref_loss, atol=1e-5), "wrong rows gathered"
+    loss.backward()
+    sync_gradients(model)
+    ref_loss.backward()
+    grad = reference.model.ent_embeddings.weight.grad
+    dist.all_reduce(grad)
+    grad /= world_size
+    shard_grad = dense_grad(model.model.ent_embeddings.weight)
+    assert torch.allclose(shard_grad, grad[rank::world_size], atol=1e-6)
+    for p, q in zip(model.parameters(), reference.parameters()):
+        if p.grad is not None and p.shape == q.shape:
+            q_grad = q.grad.clone()
+            dist.all_reduce(q_grad)
+            assert torch.allclose(dense_grad(p), q_grad / world_size, atol=1e-6)
+    model.zero_grad()
+
+
+def run(local_rank, args, results):
+    os.environ["RANK"] = str(local_rank)
+    os.environ["WORLD_SIZE"] = str(args.nprocs)
+    os.environ.setdefault("MASTER_ADDR", "127.0.0.1")
+    os.environ["MASTER_PORT"] = str(args.port)
+    rank, world_size = init_distributed()
+    torch.set_num_threads(max(1, os.cpu_count() // world_size))
+    torch.manual_seed(args.seed + rank)
+    model = build(args, sharded=True, sparse=bool(args.sparse))
+    trainer = types.SimpleNamespace(
+        model=model, seed=args.seed, data_loader=Seeded(args)
+    )
+    model = distribute(trainer)
+    check(args, rank, world_size, model, trainer.data_loader.sample())
+
+    if args.sparse:
+        optimizer = SplitOptimizer(model, "adam", lr=1e-3)
+    else:
+        optimizer = optim.Adam(model.parameters(), lr=1e-3)
+    batches = [trainer.data_loader.sample() for _ in range(args.steps)]
+    dist.barrier()
+    start = time.perf_counter()
+    for data in batches:
+        optimizer.zero_grad()
+        loss, _ = model(data)
+        loss.backward()
+        sync_gradients(model)
+        optimizer.step()
+    dist.barrier()
+    elapsed = (time.perf_counter() - start) / args.steps
+    # parameters plus the two Adam moments
+    nbytes = 3 * sum(p.numel() * p.element_size() for p in model.parameters())
+    results.put((rank, elapsed, nbytes))
+    dist.destroy_process_group()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    queue = mp.get_context("spawn").SimpleQueue()
+    mp.spawn(run, args=(args, queue), nprocs=args.nprocs)
+    results = sorted(queue.get() for _ in range(args.nprocs))
+    dense = 3 * 4 * (args.entities * args.dim * (2 if args.model == "rotate" else 1))
+    print("lookups and gradients match the unsharded model")
+    print("unsharded entity table + Adam state: {:.1f} MB".format(dense / 2**20))
+    print("rank\tstep ms\tparams + Adam state MB")
+    for rank, elapsed, nbytes in results:
+        print("{}\t{:.2f}\t{:.1f}".format(rank, 1000 * elapsed, nbytes / 2**20))
@@ -0,0 +1,119 @@
+import os
+import shutil
+import time
+import argparse
+import tempfile
+import torch
+from mmkgc.config import Trainer, Tester, ShardedTester, RankAccumulator
+from mmkgc.data import TrainDataLoader, TestDataLoader
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def subset(in_path, out_path, queries):
+    # the dataset with only the first test triples, to keep the runs short
+    os.makedirs(out_path)
+    for name in os.listdir(in_path):
+        if name.endswith(".txt") and name != "test2id.txt":
+            shutil.copy(os.path.join(in_path, name), out_path)
+    with open(os.path.join(in_path, "test2id.txt")) as f:
+        f.readline()
+        rows = [f.readline() for _ in range(queries)]
+    with open(os.path.join(out_path, "test2id.txt"), "w") as f:
+        f.write("%d\n" % queries + "".join(rows))
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-epoch", type=int, default=5)
+    arg.add_argument("-batch_size", type=int, default=2048)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-queries", type=int, default=200)
+    arg.add_argument("-workers", type=str, default="1,2,3")
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    torch.manual_seed(args.seed)
+    in_path = "./benchmarks/" + args.dataset + "/"
+    data_loader = TrainDataLoader(
+        in_path=in_path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    kge_score = RotatE(
+        ent_tot=data_loader.get_ent_tot(),
+        rel_tot=data_loader.get_rel_tot(),
+        dim=args.dim,
+        margin=6.0,
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=data_loader.get_batch_size(),
+    )
+    Trainer(
+        model=model,
+        data_loader=data_loader,
+        train_times=args.epoch,
+        alpha=0.01,
+        use_gpu=False,
+        opt_method="adam",
+    ).run()
+    kge_score.eval()
+    tmp = tempfile.mkdtemp()
+    subset(in_path, os.path.join(tmp, "data"), args.queries)
+    test_dataloader = TestDataLoader(os.path.join(tmp, "data") + "/", "link")
+
+    results = {}
+    for workers in map(int, args.workers.split(",")):
+        tester = ShardedTester(
+            model=kge_score,
+            data_loader=test_dataloader,
+            use_gpu=False,
+            workers=workers,
+        )
+        start = time.perf_counter()
+        results[workers] = tester.run_link_prediction(type_constrain=True)
+        elapsed = time.perf_counter() - start
+        print("{} workers: {:6.1f} s  {}".format(workers, elapsed, results[workers]))
+        state = tester.accumulator.state_dict()
+        unconstrained = tester.accumulator.metrics("filter")
+    # every split gives the same totals, bit for bit
+    assert len(set(results.values())) == 1
+
+    # shards run as separate jobs, saved and merged in reverse order
+    tester = ShardedTester(model=kge_score, data_loader=test_dataloader, use_gpu=False)
+    total = test_dataloader.get_triple_tot()
+    paths = []
+    for i, (lef, rig) in enumerate(
+        ((0, total // 2), (total // 2, total // 2 + 1), (total // 2 + 1, total))
+    ):
+        paths.append(os.path.join(tmp, "shard-%d.json" % i))
+        tester.run_shard(lef, rig, type_constrain=True).save(paths[-1])
+    merged = RankAccumulator(type_constrain=True)
+    for path in reversed(paths):
+        merged.merge(RankAccumulator.load(path))
+    assert merged.state_dict() == state
+    assert merged.metrics("filter_constrain") == results[1]
+    print("saved shards merge to the same totals")
+
+    # Base.so's float accumulators, for reference
+    tester = Tester(model=kge_score, data_loader=test_dataloader, use_gpu=False)
+    base = tester.run_link_prediction(type_constrain=False)
+    print("Base.so:", base)
+    print("merged: ", unconstrained)
+    assert all(
+        abs(a - b) <= 1e-4 * max(1.0, abs(b)) for a, b in zip(base, unconstrained)
+    )
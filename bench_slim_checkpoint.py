@@ -0,0 +1,104 @@
+import os
+import time
+import argparse
+import tempfile
+import torch
+from mmkgc.module.model import AdvRelRotatE
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-ent_tot", type=int, default=15000)
+    arg.add_argument("-rel_tot", type=int, default=28)
+    arg.add_argument("-dim", type=int, default=250)
+    arg.add_argument("-img_dim", type=int, default=4096)
+    arg.add_argument("-text_dim", type=int, default=768)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def build_model(args, img, text):
+    return AdvRelRotatE(
+        args.ent_tot,
+        args.rel_tot,
+        dim=args.dim,
+        margin=6.0,
+        epsilon=2.0,
+        img_emb=img,
+        text_emb=text,
+    )
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return out, time.perf_counter() - start
+
+
+def predict(model):
+    batch = {
+        "batch_h": torch.tensor([5]),
+        "batch_t": torch.arange(args.ent_tot),
+        "batch_r": torch.tensor([3]),
+        "mode": "tail_batch",
+    }
+    return model.predict(batch)
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    torch.manual_seed(args.seed)
+    # synthetic features of the size of the VGG/BERT ones
+    img = torch.randn(args.ent_tot, args.img_dim)
+    text = torch.randn(args.ent_tot, args.text_dim)
+    model = build_model(args, img, text)
+    with tempfile.TemporaryDirectory() as tmp:
+        full, slim = os.path.join(tmp, "full.ckpt"), os.path.join(tmp, "slim.ckpt")
+        frozen_dir = os.path.join(tmp, "frozen")
+        _, full_save = timed(model.save_checkpoint, full)
+        _, slim_first = timed(model.save_slim_checkpoint, slim, frozen_dir)
+        # the frozen tables are hashed once, later saves only write the rest
+        _, slim_save = timed(model.save_slim_checkpoint, slim, frozen_dir)
+        print("format\tMB\tsave s\tload s")
+        print(
+            "torch\t{:.1f}\t{:.3f}".format(os.path.getsize(full) / 2**20, full_save),
+            end="",
+        )
+        fresh = build_model(args, img, text)
+        _, full_load = timed(fresh.load_checkpoint, full)
+        print("\t{:.3f}".format(full_load))
+        expected = predict(fresh)
+
+        fresh = build_model(args, img, text)
+        _, slim_load = timed(fresh.load_slim_checkpoint, slim)
+        print(
+            "slim\t{:.1f}\t{:.3f}\t{:.3f}\t(first save {:.3f} s, shapes checked)".format(
+                os.path.getsize(slim) / 2**20, slim_save, slim_load, slim_first
+            )
+        )
+        assert (predict(fresh) == expected).all()
+        fresh = build_model(args, img, text)
+        _, hashed_load = timed(fresh.load_slim_checkpoint, slim, verify_hash=True)
+        print("slim\t\t\t{:.3f}\t(contents hashed)".format(hashed_load))
+        assert (predict(fresh) == expected).all()
+        fresh = build_model(args, img, text)
+        _, fast_load = timed(fresh.load_slim_checkpoint, slim, verify=False)
+        print("slim\t\t\t{:.3f}\t(unverified)".format(fast_load))
+        assert (predict(fresh) == expected).all()
+
+        # a process built with other features gets the right ones by hash
+        fresh = build_model(args, torch.zeros_like(img), torch.zeros_like(text))
+        fresh.load_slim_checkpoint(slim, frozen_dir=frozen_dir, verify_hash=True)
+        assert (predict(fresh) == expected).all()
+        # features of another shape are caught from the header alone, other
+        # contents of the same shape only by the hash
+        other = torch.zeros(args.ent_tot, args.img_dim // 2)
+        for features, verify_hash in ((other, False), (torch.zeros_like(img), True)):
+            try:
+                build_model(args, features, text).load_slim_checkpoint(
+                    slim, verify_hash=verify_hash
+                )
+                raise AssertionError("mismatching features were accepted")
+            except ValueError as e:
+                print("mismatch:", e)
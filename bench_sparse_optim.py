@@ -0,0 +1,90 @@
+import time
+import argparse
+import numpy as np
+import torch
+import torch.optim as optim
+from mmkgc.config import SplitOptimizer
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-entities", type=str, default="10000,100000,1000000")
+    arg.add_argument("-relations", type=int, default=200)
+    arg.add_argument("-dim", type=int, default=100)
+    arg.add_argument("-batch_size", type=int, default=1024)
+    arg.add_argument("-neg_num", type=int, default=32)
+    arg.add_argument("-learning_rate", type=float, default=1e-3)
+    arg.add_argument("-steps", type=int, default=20)
+    arg.add_argument("-methods", type=str, default="Adam,SparseAdam,RowAdagrad")
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def sample_batch(rng, args, ent_tot):
+    # positives first, then neg_num corrupted tails per positive, like Base.so
+    h = rng.randint(0, ent_tot, size=args.batch_size)
+    t = rng.randint(0, ent_tot, size=args.batch_size)
+    r = rng.randint(0, args.relations, size=args.batch_size)
+    neg_t = rng.randint(0, ent_tot, size=args.batch_size * args.neg_num)
+    return {
+        "batch_h": torch.from_numpy(np.tile(h, args.neg_num + 1)),
+        "batch_t": torch.from_numpy(np.concatenate((t, neg_t))),
+        "batch_r": torch.from_numpy(np.tile(r, args.neg_num + 1)),
+        "mode": "tail_batch",
+    }
+
+
+def state_bytes(optimizer):
+    optimizers = getattr(optimizer, "optimizers", [optimizer])
+    total = 0
+    for opt in optimizers:
+        for state in opt.state.values():
+            for v in state.values():
+                if isinstance(v, torch.Tensor):
+                    total += v.numel() * v.element_size()
+    return total
+
+
+def run(args, ent_tot, method):
+    torch.manual_seed(args.seed)
+    rng = np.random.RandomState(args.seed)
+    sparse = method != "Adam"
+    model = NegativeSampling(
+        model=RotatE(ent_tot, args.relations, dim=args.dim, sparse=sparse),
+        loss=SigmoidLoss(adv_temperature=2),
+        batch_size=args.batch_size,
+    )
+    if sparse:
+        optimizer = SplitOptimizer(
+            model, SplitOptimizer.methods[method], lr=args.learning_rate
+        )
+    else:
+        optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
+    batches = [sample_batch(rng, args, ent_tot) for _ in range(args.steps + 1)]
+    times = []
+    for data in batches:
+        start = time.perf_counter()
+        optimizer.zero_grad()
+        loss, _ = model(data)
+        loss.backward()
+        optimizer.step()
+        times.append(time.perf_counter() - start)
+    # the first step allocates the optimizer state
+    return np.mean(times[1:]), state_bytes(optimizer), loss.item()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    print("entities\tmethod\tstep ms\tstate MB\tloss")
+    for ent_tot in [int(n) for n in args.entities.split(",")]:
+        for method in args.methods.split(","):
+            step, nbytes, loss = run(args, ent_tot, method)
+            print(
+                "{}\t{}\t{:.2f}\t{:.1f}\t{:.4f}".format(
+                    ent_tot, method, 1000 * step, nbytes / 2**20, loss
+                )
+            )
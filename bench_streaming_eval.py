@@ -0,0 +1,143 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import torch
+from bench_sharded_eval import subset
+from mmkgc.config import Trainer, Tester, ShardedTester, StreamingTester
+from mmkgc.data import TrainDataLoader, TestDataLoader
+from mmkgc.data.PartitionedGraph import read_triples
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+from mmkgc.serve import KnownAnswers
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-epoch", type=int, default=2)
+    arg.add_argument("-batch_size", type=int, default=2048)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-queries", type=int, default=100)
+    # 4096 and 997 do not divide the entity count, 65536 exceeds it
+    arg.add_argument("-chunk_sizes", type=str, default="997,4096,5000,65536")
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def close(a, b):
+    return all(abs(x - y) <= 1e-6 * max(1.0, abs(y)) for x, y in zip(a, b))
+
+
+def brute_force_ranks(model, in_path, test):
+    # every entity scored at once, Base.so's rules: strict <, answer excluded
+    known = KnownAnswers.from_path(in_path)
+    raw = np.zeros((len(test), 2), dtype=np.int64)
+    filtered = np.zeros((len(test), 2), dtype=np.int64)
+    candidates = torch.arange(model.ent_tot)
+    with torch.no_grad():
+        for i, (h, t, r) in enumerate(test):
+            for j, mode in enumerate(("head_batch", "tail_batch")):
+                ent, answer = (h, t) if mode == "tail_batch" else (t, h)
+                one = torch.tensor([ent])
+                score = model.predict(
+                    {
+                        "batch_h": candidates if mode == "head_batch" else one,
+                        "batch_t": one if mode == "head_batch" else candidates,
+                        "batch_r": torch.tensor([r]),
+                        "mode": mode,
+                    }
+                )
+                better = score < score[answer]
+                better[answer] = False
+                raw[i, j] = better.sum() + 1
+                better[known.lookup([ent], [r], mode)[1]] = False
+                filtered[i, j] = better.sum() + 1
+    return raw, filtered
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    torch.manual_seed(args.seed)
+    in_path = "./benchmarks/" + args.dataset + "/"
+    data_loader = TrainDataLoader(
+        in_path=in_path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    kge_score = RotatE(
+        ent_tot=data_loader.get_ent_tot(),
+        rel_tot=data_loader.get_rel_tot(),
+        dim=args.dim,
+        margin=6.0,
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=data_loader.get_batch_size(),
+    )
+    Trainer(
+        model=model,
+        data_loader=data_loader,
+        train_times=args.epoch,
+        alpha=0.01,
+        use_gpu=False,
+        opt_method="adam",
+    ).run()
+    kge_score.eval()
+    tmp = tempfile.mkdtemp()
+    sub_path = os.path.join(tmp, "data") + "/"
+    subset(in_path, sub_path, args.queries)
+    test = np.concatenate(list(read_triples(sub_path + "test2id.txt", 1 << 16)))
+
+    start = time.perf_counter()
+    expected = Tester(
+        model=kge_score, data_loader=TestDataLoader(sub_path, "link"), use_gpu=False
+    ).run_link_prediction(type_constrain=False)
+    print(
+        "Tester (Base.so):   {:.1f} s  {}".format(time.perf_counter() - start, expected)
+    )
+    sharded = ShardedTester(
+        model=kge_score, data_loader=TestDataLoader(sub_path, "link")
+    )
+    sharded.run_link_prediction(type_constrain=False)
+    assert close(sharded.accumulator.metrics("filter"), expected)
+    raw, filtered = brute_force_ranks(kge_score, sub_path, test)
+
+    for chunk_size in [int(n) for n in args.chunk_sizes.split(",")]:
+        streaming = StreamingTester(
+            model=kge_score, in_path=sub_path, chunk_size=chunk_size, use_gpu=False
+        )
+        start = time.perf_counter()
+        metrics = streaming.run_link_prediction()
+        print(
+            "chunk_size {:6d}:  {:.1f} s  {}".format(
+                chunk_size, time.perf_counter() - start, metrics
+            )
+        )
+        assert close(metrics, expected)
+        assert np.array_equal(streaming.ranks["raw"], raw)
+        assert np.array_equal(streaming.ranks["filtered"], filtered)
+        ranks = streaming.ranks["raw"]
+        assert close(
+            (
+                np.mean(1.0 / ranks),
+                np.mean(ranks),
+                np.mean(ranks <= 10),
+                np.mean(ranks <= 3),
+                np.mean(ranks <= 1),
+            ),
+            sharded.accumulator.metrics("raw"),
+        )
+    print("raw and filtered ranks match Tester and a brute-force ranking")
+    shutil.rmtree(tmp)
@@ -0,0 +1,157 @@
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+import torch
+from bench_sharded_eval import subset
+from mmkgc.config import Trainer, ShardedTester, StreamingTester
+from mmkgc.data import TrainDataLoader, TestDataLoader, read_type_constrain
+from mmkgc.data.PartitionedGraph import read_triples
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+from mmkgc.serve import EntityScorer
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-epoch", type=int, default=3)
+    arg.add_argument("-batch_size", type=int, default=2048)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-queries", type=int, default=200)
+    arg.add_argument("-k", type=int, default=10)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def close(a, b):
+    return all(abs(x - y) <= 1e-6 * max(1.0, abs(y)) for x, y in zip(a, b))
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    torch.manual_seed(args.seed)
+    in_path = "./benchmarks/" + args.dataset + "/"
+    data_loader = TrainDataLoader(
+        in_path=in_path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    kge_score = RotatE(
+        ent_tot=data_loader.get_ent_tot(),
+        rel_tot=data_loader.get_rel_tot(),
+        dim=args.dim,
+        margin=6.0,
+    )
+    model = NegativeSampling(
+        model=kge_score,
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=data_loader.get_batch_size(),
+    )
+    Trainer(
+        model=model,
+        data_loader=data_loader,
+        train_times=args.epoch,
+        alpha=0.01,
+        use_gpu=False,
+        opt_method="adam",
+    ).run()
+    kge_score.eval()
+    tmp = tempfile.mkdtemp()
+    sub_path = os.path.join(tmp, "data") + "/"
+    subset(in_path, sub_path, args.queries)
+
+    # Base.so scores every entity and counts the allowed ones
+    tester = ShardedTester(
+        model=kge_score, data_loader=TestDataLoader(sub_path, "link")
+    )
+    start = time.perf_counter()
+    tester.run_link_prediction(type_constrain=True)
+    print("Base.so, all entities:   {:.1f} s".format(time.perf_counter() - start))
+    expected = tester.accumulator
+
+    streaming = StreamingTester(model=kge_score, in_path=sub_path, use_gpu=False)
+    start = time.perf_counter()
+    metrics = streaming.run_link_prediction(type_constrain=True)
+    print(
+        "allowed candidates only: {:.1f} s, {} of {} rows scored".format(
+            time.perf_counter() - start,
+            streaming.scored,
+            2 * args.queries * kge_score.ent_tot,
+        )
+    )
+    print(metrics)
+    print(expected.metrics("filter_constrain"))
+    assert close(metrics, expected.metrics("filter_constrain"))
+    raw = streaming.ranks["raw"]
+    assert close(
+        (
+            np.mean(1.0 / raw),
+            np.mean(raw),
+            np.mean(raw <= 10),
+            np.mean(raw <= 3),
+            np.mean(raw <= 1),
+        ),
+        expected.metrics("raw_constrain"),
+    )
+
+    # served top-k: only allowed candidates, the same order as masking
+    types = read_type_constrain(in_path)
+    test = np.concatenate(list(read_triples(sub_path + "test2id.txt", 1 << 16)))
+    heads, rels = test[:, 0], test[:, 2]
+    scorer = EntityScorer(kge_score)
+    start = time.perf_counter()
+    full = scorer.distances(heads, rels, "tail_batch")
+    print("topk, all entities:      {:.3f} s".format(time.perf_counter() - start))
+    scorer.types = types
+    start = time.perf_counter()
+    ids, dist = scorer.topk(heads, rels, "tail_batch", args.k)
+    print("topk, allowed only:      {:.3f} s".format(time.perf_counter() - start))
+    for row, rel in enumerate(rels):
+        allowed = types["tail_batch"][rel]
+        found = ids[row][ids[row] >= 0].numpy()
+        assert np.isin(found, allowed).all()
+        masked = torch.full_like(full[row], float("inf"))
+        allowed = torch.from_numpy(allowed)
+        masked[allowed] = full[row][allowed]
+        top = torch.topk(masked, min(args.k, len(allowed)), largest=False)
+        assert torch.allclose(dist[row][: len(found)], top.values, atol=1e-4)
+    print("served top-k stays inside the allowed sets")
+
+    # the streaming top-k of relations with fewer than k allowed candidates
+    small = [
+        r
+        for r in range(kge_score.rel_tot)
+        if min(len(types[mode][r]) for mode in types) < args.k
+    ]
+    train = np.concatenate(list(read_triples(in_path + "train2id.txt", 1 << 16)))
+    queries = train[np.isin(train[:, 2], small)][: args.queries]
+    streaming = StreamingTester(
+        model=kge_score, in_path=sub_path, k=args.k, use_gpu=False
+    )
+    streaming.evaluate(queries, False, type_constrain=True)
+    top_ids, top_scores = streaming.topk
+    padded = 0
+    for (h, t, r), ids, scores in zip(queries, top_ids, top_scores):
+        for j, (mode, answer) in enumerate((("head_batch", h), ("tail_batch", t))):
+            found = ids[j][ids[j] >= 0]
+            assert np.isin(found, np.append(types[mode][r], answer)).all()
+            assert np.isinf(scores[j][len(found) :]).all()
+            padded += len(found) < args.k
+    assert padded > 0
+    print(
+        "{} of {} top-k rows of relations {} padded with -1".format(
+            padded, 2 * len(queries), small
+        )
+    )
+    shutil.rmtree(tmp)
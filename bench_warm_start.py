@@ -0,0 +1,202 @@
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import torch
+import torch.optim as optim
+from mmkgc.data import TrainDataLoader, read_ids
+from mmkgc.data.PartitionedGraph import read_triples
+from mmkgc.module.model import RotatE
+from mmkgc.module.loss import SigmoidLoss
+from mmkgc.module.strategy import NegativeSampling
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-Y")
+    arg.add_argument("-drop", type=float, default=0.05)
+    arg.add_argument("-dim", type=int, default=64)
+    arg.add_argument("-batch_size", type=int, default=1024)
+    arg.add_argument("-neg_num", type=int, default=16)
+    arg.add_argument("-margin", type=float, default=6.0)
+    arg.add_argument("-learning_rate", type=float, default=1e-3)
+    arg.add_argument("-epoch", type=int, default=20)
+    arg.add_argument("-test", type=int, default=1000)
+    arg.add_argument("-seed", type=int, default=42)
+    return arg.parse_args()
+
+
+def write_version(path, names, rel_names, triples, ent_perm, rel_perm):
+    """Write the dataset with entity e renamed to id ent_perm[e]."""
+    os.makedirs(path, exist_ok=True)
+    keep = np.flatnonzero(ent_perm >= 0)
+    with open(os.path.join(path, "entity2id.txt"), "w") as f:
+        f.write("{}\n".format(len(keep)))
+        for e in keep:
+            f.write("{}\t{}\n".format(names[e], ent_perm[e]))
+    with open(os.path.join(path, "relation2id.txt"), "w") as f:
+        f.write("{}\n".format(len(rel_names)))
+        for r, name in enumerate(rel_names):
+            f.write("{}\t{}\n".format(name, rel_perm[r]))
+    h, t, r = triples[:, 0], triples[:, 1], triples[:, 2]
+    rows = (ent_perm[h] >= 0) & (ent_perm[t] >= 0)
+    local = np.stack((ent_perm[h[rows]], ent_perm[t[rows]], rel_perm[r[rows]]), 1)
+    with open(os.path.join(path, "train2id.txt"), "w") as f:
+        f.write("{}\n".format(len(local)))
+        np.savetxt(f, local, fmt="%d")
+    return os.path.join(path, ""), local
+
+
+def build(args, ent_tot, rel_tot):
+    return NegativeSampling(
+        model=RotatE(ent_tot, rel_tot, dim=args.dim, margin=args.margin),
+        loss=SigmoidLoss(adv_temperature=2.0),
+        batch_size=args.batch_size,
+    )
+
+
+def train(args, model, path, epochs):
+    data_loader = TrainDataLoader(
+        in_path=path,
+        batch_size=args.batch_size,
+        threads=1,
+        sampling_mode="normal",
+        bern_flag=1,
+        filter_flag=1,
+        neg_ent=args.neg_num,
+        neg_rel=0,
+    )
+    data_loader.set_seed(args.seed)
+    optimizer = optim.Adam(model.parameters(), lr=args.learning_rate)
+    losses = []
+    for _ in range(epochs):
+        res = 0.0
+        for data in data_loader:
+            optimizer.zero_grad()
+            loss, _ = model(
+                {
+                    "batch_h": torch.from_numpy(data["batch_h"]),
+                    "batch_t": torch.from_numpy(data["batch_t"]),
+                    "batch_r": torch.from_numpy(data["batch_r"]),
+                    "batch_y": torch.from_numpy(data["batch_y"]),
+                    "mode": data["mode"],
+                }
+            )
+            loss.backward()
+            optimizer.step()
+            res += loss.item()
+        losses.append(res / len(data_loader))
+    return losses
+
+
+def sampled_mrr(args, model, test, ent_tot, candidates=100):
+    # rank the true tail against random tails
+    rng = np.random.RandomState(args.seed + 1)
+    ranks = []
+    with torch.no_grad():
+        for h, t, r in test:
+            tails = np.concatenate(([t], rng.randint(0, ent_tot, candidates)))
+            score = model(
+                {
+                    "batch_h": torch.full((len(tails),), h, dtype=torch.long),
+                    "batch_t": torch.from_numpy(tails),
+                    "batch_r": torch.full((len(tails),), r, dtype=torch.long),
+                    "mode": "normal",
+                }
+            )
+            ranks.append(1 + (score[1:] > score[0]).sum().item())
+    return np.mean(1.0 / np.array(ranks))
+
+
+def main(args, path):
+    in_path = os.path.join("benchmarks", args.dataset)
+    names = read_ids(os.path.join(in_path, "entity2id.txt"))
+    rel_names = read_ids(os.path.join(in_path, "relation2id.txt"))
+    triples = next(read_triples(os.path.join(in_path, "train2id.txt")))
+    rng = np.random.RandomState(args.seed)
+    # version 1 lacks a share of the entities, version 2 renumbers everything
+    kept = rng.rand(len(names)) >= args.drop
+    v1_ent = np.full(len(names), -1)
+    v1_ent[kept] = np.arange(kept.sum())
+    v1_path, _ = write_version(
+        os.path.join(path, "v1"),
+        names,
+        rel_names,
+        triples,
+        v1_ent,
+        np.arange(len(rel_names)),
+    )
+    v2_ent = rng.permutation(len(names))
+    v2_rel = rng.permutation(len(rel_names))
+    v2_path, v2_triples = write_version(
+        os.path.join(path, "v2"), names, rel_names, triples, v2_ent, v2_rel
+    )
+    test = next(read_triples(os.path.join(in_path, "test2id.txt")))[: args.test]
+    test = np.stack((v2_ent[test[:, 0]], v2_ent[test[:, 1]], v2_rel[test[:, 2]]), 1)
+
+    torch.manual_seed(args.seed)
+    old = build(args, int(kept.sum()), len(rel_names))
+    start = time.perf_counter()
+    losses = train(args, old, v1_path, args.epoch)
+    print(
+        "v1: {} entities, {} epochs in {:.1f}s, loss {:.4f}".format(
+            kept.sum(), args.epoch, time.perf_counter() - start, losses[-1]
+        )
+    )
+    ckpt = os.path.join(path, "v1.ckpt")
+    old.model.save_checkpoint(ckpt)
+
+    torch.manual_seed(args.seed)
+    cold = build(args, len(names), len(rel_names))
+    cold_losses = train(args, cold, v2_path, args.epoch)
+    torch.manual_seed(args.seed)
+    warm = build(args, len(names), len(rel_names))
+    report = warm.model.warm_start(ckpt, v1_path, v2_path, triples=v2_triples)
+    print(
+        "warm start: {} entities and {} relations copied, skipped {}".format(
+            report["entities"], report["relations"], report["skipped"]
+        )
+    )
+    # save_steps checkpoints hold the strategy, every model key is prefixed
+    strategy_ckpt = os.path.join(path, "v1-strategy.ckpt")
+    torch.save(old.state_dict(), strategy_ckpt)
+    torch.manual_seed(args.seed)
+    prefixed = build(args, len(names), len(rel_names))
+    assert report == prefixed.model.warm_start(
+        strategy_ckpt, v1_path, v2_path, triples=v2_triples
+    )
+    for key, value in warm.model.state_dict().items():
+        assert torch.equal(value, prefixed.model.state_dict()[key])
+    torch.save({"other": torch.zeros(1)}, strategy_ckpt)
+    try:
+        prefixed.model.warm_start(strategy_ckpt, v1_path, v2_path)
+        raise AssertionError("a checkpoint of another model was accepted")
+    except ValueError:
+        pass
+    warm_mrr = [sampled_mrr(args, warm.model, test, len(names))]
+    warm_losses = train(args, warm, v2_path, args.epoch)
+    warm_mrr.append(sampled_mrr(args, warm.model, test, len(names)))
+    print("epoch\tcold loss\twarm loss")
+    for epoch, (c, w) in enumerate(zip(cold_losses, warm_losses)):
+        print("{}\t{:.4f}\t\t{:.4f}".format(epoch, c, w))
+    target = cold_losses[-1]
+    reached = next(i for i, w in enumerate(warm_losses + [0.0]) if w <= target)
+    print(
+        "warm start reaches the cold loss after {} epochs of {}".format(
+            reached + 1, args.epoch
+        )
+    )
+    print(
+        "sampled MRR: cold {:.4f}, warm before training {:.4f}, after {:.4f}".format(
+            sampled_mrr(args, cold.model, test, len(names)), *warm_mrr
+        )
+    )
+    assert warm_losses[0] < cold_losses[0]
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    with tempfile.TemporaryDirectory() as path:
+        main(args, path)
@@ -0,0 +1,56 @@
+import argparse
+from mmkgc.data.PartitionedGraph import read_count
+from mmkgc.feature import load_features
+from mmkgc.index import EntityIndex, export_embeddings
+from mmkgc.module.model import AdvRelRotatE, RotatE, TransE
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-W")
+    arg.add_argument("-model", type=str, default="adv_rotate")
+    arg.add_argument("-checkpoint", type=str, required=True)
+    arg.add_argument("-dim", type=int, default=128)
+    arg.add_argument("-margin", type=float, default=6.0)
+    arg.add_argument("-nlist", type=int, default=None)
+    arg.add_argument("-pq_m", type=int, default=None)
+    arg.add_argument("-out", type=str, default=None)
+    arg.add_argument("-seed", type=int, default=0)
+    return arg.parse_args()
+
+
+def load_model(args):
+    in_path = "./benchmarks/" + args.dataset + "/"
+    ent_tot = read_count(in_path + "entity2id.txt")
+    rel_tot = read_count(in_path + "relation2id.txt")
+    if args.model == "adv_rotate":
+        model = AdvRelRotatE(
+            ent_tot,
+            rel_tot,
+            dim=args.dim,
+            margin=args.margin,
+            epsilon=2.0,
+            img_emb=load_features("./embeddings/" + args.dataset + "-visual.pth"),
+            text_emb=load_features("./embeddings/" + args.dataset + "-textual.pth"),
+        )
+    elif args.model == "rotate":
+        model = RotatE(ent_tot, rel_tot, dim=args.dim, margin=args.margin)
+    else:
+        model = TransE(ent_tot, rel_tot, dim=args.dim, p_norm=1, norm_flag=True)
+    if args.checkpoint:
+        model.load_checkpoint(args.checkpoint)
+    return model
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    index = EntityIndex(
+        export_embeddings(load_model(args)),
+        nlist=args.nlist,
+        pq_m=args.pq_m,
+        seed=args.seed,
+    ).build()
+    out = args.out or args.checkpoint.rsplit(".", 1)[0] + "-index.npz"
+    index.save(out)
+    print("{} entities in {} lists -> {}".format(len(index.vectors), index.nlist, out))
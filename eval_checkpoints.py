@@ -0,0 +1,43 @@
+import glob
+import argparse
+from build_index import load_model
+from mmkgc.config import CheckpointEvaluator
+from mmkgc.config.CheckpointEvaluator import epoch_order
+from mmkgc.data import TestDataLoader
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-W")
+    arg.add_argument("-model", type=str, default="adv_rotate")
+    arg.add_argument("-checkpoints", type=str, required=True)
+    arg.add_argument("-dim", type=int, default=128)
+    arg.add_argument("-margin", type=float, default=6.0)
+    arg.add_argument("-type_constrain", type=int, default=0)
+    arg.add_argument("-workers", type=int, default=1)
+    arg.add_argument("-cache", type=str, default=None)
+    return arg.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    # -checkpoints is a glob, e.g. "checkpoint/run-*.ckpt"
+    paths = sorted(glob.glob(args.checkpoints), key=epoch_order)
+    if not paths:
+        raise SystemExit("No checkpoint matches {}".format(args.checkpoints))
+    # the evaluator loads every checkpoint itself
+    args.checkpoint = None
+    evaluator = CheckpointEvaluator(
+        load_model(args),
+        TestDataLoader("./benchmarks/" + args.dataset + "/", "link"),
+        type_constrain=args.type_constrain,
+        workers=args.workers,
+        cache_path=args.cache or args.checkpoints.split("*")[0] + "eval-cache.json",
+        config={"dim": args.dim, "margin": args.margin},
+    )
+    results = evaluator.evaluate(paths)
+    print("{} of {} checkpoints evaluated".format(len(evaluator.evaluated), len(paths)))
+    print("checkpoint\t\t MRR \t\t MR \t\t hit@10 \t hit@3 \t\t hit@1")
+    for path, (mrr, mr, hit10, hit3, hit1) in results.items():
+        print("%s\t %f \t %f \t %f \t %f \t %f" % (path, mrr, mr, hit10, hit3, hit1))
@@ -40,8 +40,16 @@ extern "C" INT getValidTotal();
 
 extern "C" void randReset();
 
+extern "C" void setRandomSeed(INT seed);
+
+extern "C" void getRandomState(unsigned long long *state);
+
+extern "C" void setRandomState(unsigned long long *state);
+
 extern "C" void importTrainFiles();
 
+extern "C" INT addTrainTriples(INT *heads, INT *tails, INT *rels, INT count, INT newEntityTotal, INT newRelationTotal);
+
 struct Parameter
 {
 	INT id;
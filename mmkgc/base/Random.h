@@ -9,11 +9,33 @@ unsigned long long *next_random;
 // reset the random seeds for all threads
 extern "C" void randReset()
 {
+	free(next_random);
 	next_random = (unsigned long long *)calloc(workThreads, sizeof(unsigned long long));
 	for (INT i = 0; i < workThreads; i++)
 		next_random[i] = rand();
 }
 
+// reseed all threads, e.g. to give each training process its own stream
+extern "C" void setRandomSeed(INT seed)
+{
+	srand(seed);
+	randReset();
+}
+
+// export the seeds of all threads, e.g. to snapshot a training run
+extern "C" void getRandomState(unsigned long long *state)
+{
+	for (INT i = 0; i < workThreads; i++)
+		state[i] = next_random[i];
+}
+
+// import seeds exported by getRandomState to resume a training run
+extern "C" void setRandomState(unsigned long long *state)
+{
+	for (INT i = 0; i < workThreads; i++)
+		next_random[i] = state[i];
+}
+
 // get a random interger for the id-th thread with the corresponding random seed
 unsigned long long randd(INT id)
 {
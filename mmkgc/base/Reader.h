@@ -51,8 +51,79 @@ extern "C" void importProb(REAL temp)
     fclose(fin);
 }
 
+REAL *left_count, *right_count;
+
+// boundaries of the runs of every entity in trainHead, trainTail and trainRel
+void indexTrainRuns()
+{
+    memset(lefHead, 0, sizeof(INT) * entityTotal);
+    memset(lefTail, 0, sizeof(INT) * entityTotal);
+    memset(lefRel, 0, sizeof(INT) * entityTotal);
+    memset(rigHead, -1, sizeof(INT) * entityTotal);
+    memset(rigTail, -1, sizeof(INT) * entityTotal);
+    memset(rigRel, -1, sizeof(INT) * entityTotal);
+    for (INT i = 1; i < trainTotal; i++)
+    {
+        if (trainTail[i].t != trainTail[i - 1].t)
+        {
+            rigTail[trainTail[i - 1].t] = i - 1;
+            lefTail[trainTail[i].t] = i;
+        }
+        if (trainHead[i].h != trainHead[i - 1].h)
+        {
+            rigHead[trainHead[i - 1].h] = i - 1;
+            lefHead[trainHead[i].h] = i;
+        }
+        if (trainRel[i].h != trainRel[i - 1].h)
+        {
+            rigRel[trainRel[i - 1].h] = i - 1;
+            lefRel[trainRel[i].h] = i;
+        }
+    }
+    lefHead[trainHead[0].h] = 0;
+    rigHead[trainHead[trainTotal - 1].h] = trainTotal - 1;
+    lefTail[trainTail[0].t] = 0;
+    rigTail[trainTail[trainTotal - 1].t] = trainTotal - 1;
+    lefRel[trainRel[0].h] = 0;
+    rigRel[trainRel[trainTotal - 1].h] = trainTotal - 1;
+}
+
+// average tails per (h, r) pair and heads per (t, r) pair of every relation
+void updateMeans()
+{
+    for (INT i = 0; i < relationTotal; i++)
+    {
+        left_mean[i] = freqRel[i] / left_count[i];
+        right_mean[i] = freqRel[i] / right_count[i];
+    }
+}
+
+// release the tables of a previous importTrainFiles, so that several
+// training files (e.g. the buckets of a partitioned graph) can be imported
+// one after another
+void freeTrainFiles()
+{
+    free(trainList);
+    free(trainHead);
+    free(trainTail);
+    free(trainRel);
+    free(freqRel);
+    free(freqEnt);
+    free(lefHead);
+    free(rigHead);
+    free(lefTail);
+    free(rigTail);
+    free(lefRel);
+    free(rigRel);
+    free(left_mean);
+    free(right_mean);
+    free(left_count);
+    free(right_count);
+}
+
 extern "C" void importTrainFiles()
 {
+    freeTrainFiles();
 
     printf("The toolkit is importing datasets.\n");
     FILE *fin;
@@ -120,54 +191,137 @@ extern "C" void importTrainFiles()
     rigTail = (INT *)calloc(entityTotal, sizeof(INT));
     lefRel = (INT *)calloc(entityTotal, sizeof(INT));
     rigRel = (INT *)calloc(entityTotal, sizeof(INT));
-    memset(rigHead, -1, sizeof(INT) * entityTotal);
-    memset(rigTail, -1, sizeof(INT) * entityTotal);
-    memset(rigRel, -1, sizeof(INT) * entityTotal);
-    for (INT i = 1; i < trainTotal; i++)
-    {
-        if (trainTail[i].t != trainTail[i - 1].t)
-        {
-            rigTail[trainTail[i - 1].t] = i - 1;
-            lefTail[trainTail[i].t] = i;
-        }
-        if (trainHead[i].h != trainHead[i - 1].h)
-        {
-            rigHead[trainHead[i - 1].h] = i - 1;
-            lefHead[trainHead[i].h] = i;
-        }
-        if (trainRel[i].h != trainRel[i - 1].h)
-        {
-            rigRel[trainRel[i - 1].h] = i - 1;
-            lefRel[trainRel[i].h] = i;
-        }
-    }
-    lefHead[trainHead[0].h] = 0;
-    rigHead[trainHead[trainTotal - 1].h] = trainTotal - 1;
-    lefTail[trainTail[0].t] = 0;
-    rigTail[trainTail[trainTotal - 1].t] = trainTotal - 1;
-    lefRel[trainRel[0].h] = 0;
-    rigRel[trainRel[trainTotal - 1].h] = trainTotal - 1;
+    indexTrainRuns();
 
-    left_mean = (REAL *)calloc(relationTotal, sizeof(REAL));
-    right_mean = (REAL *)calloc(relationTotal, sizeof(REAL));
+    left_count = (REAL *)calloc(relationTotal, sizeof(REAL));
+    right_count = (REAL *)calloc(relationTotal, sizeof(REAL));
     for (INT i = 0; i < entityTotal; i++)
     {
         for (INT j = lefHead[i] + 1; j <= rigHead[i]; j++)
             if (trainHead[j].r != trainHead[j - 1].r)
-                left_mean[trainHead[j].r] += 1.0;
+                left_count[trainHead[j].r] += 1.0;
         if (lefHead[i] <= rigHead[i])
-            left_mean[trainHead[lefHead[i]].r] += 1.0;
+            left_count[trainHead[lefHead[i]].r] += 1.0;
         for (INT j = lefTail[i] + 1; j <= rigTail[i]; j++)
             if (trainTail[j].r != trainTail[j - 1].r)
-                right_mean[trainTail[j].r] += 1.0;
+                right_count[trainTail[j].r] += 1.0;
         if (lefTail[i] <= rigTail[i])
-            right_mean[trainTail[lefTail[i]].r] += 1.0;
+            right_count[trainTail[lefTail[i]].r] += 1.0;
     }
-    for (INT i = 0; i < relationTotal; i++)
+    left_mean = (REAL *)calloc(relationTotal, sizeof(REAL));
+    right_mean = (REAL *)calloc(relationTotal, sizeof(REAL));
+    updateMeans();
+}
+
+// grow the per-entity and per-relation tables for new ids
+void growTrainTables(INT newEntityTotal, INT newRelationTotal)
+{
+    if (newEntityTotal > entityTotal)
     {
-        left_mean[i] = freqRel[i] / left_mean[i];
-        right_mean[i] = freqRel[i] / right_mean[i];
+        INT **tables[] = {&freqEnt, &lefHead, &rigHead, &lefTail, &rigTail, &lefRel, &rigRel};
+        for (INT k = 0; k < 7; k++)
+        {
+            *tables[k] = (INT *)realloc(*tables[k], newEntityTotal * sizeof(INT));
+            memset(*tables[k] + entityTotal, 0, (newEntityTotal - entityTotal) * sizeof(INT));
+        }
+        entityTotal = newEntityTotal;
     }
+    if (newRelationTotal > relationTotal)
+    {
+        freqRel = (INT *)realloc(freqRel, newRelationTotal * sizeof(INT));
+        memset(freqRel + relationTotal, 0, (newRelationTotal - relationTotal) * sizeof(INT));
+        REAL **tables[] = {&left_count, &right_count, &left_mean, &right_mean};
+        for (INT k = 0; k < 4; k++)
+        {
+            *tables[k] = (REAL *)realloc(*tables[k], newRelationTotal * sizeof(REAL));
+            memset(*tables[k] + relationTotal, 0, (newRelationTotal - relationTotal) * sizeof(REAL));
+        }
+        relationTotal = newRelationTotal;
+    }
+}
+
+// true if the sorted run [lef, rig] of trainHead (byHead) or trainTail holds
+// the (h, r) or (t, r) pair of x
+bool hasPair(INT lef, INT rig, Triple x, bool byHead)
+{
+    if (lef > rig)
+        return false;
+    // the first triple of the pair sorts after (h, r, -1) / (-1, r, t)
+    if (byHead)
+    {
+        x.t = -1;
+        Triple *it = std::lower_bound(trainHead + lef, trainHead + rig + 1, x, Triple::cmp_head);
+        return it != trainHead + rig + 1 && it->h == x.h && it->r == x.r;
+    }
+    x.h = -1;
+    Triple *it = std::lower_bound(trainTail + lef, trainTail + rig + 1, x, Triple::cmp_tail);
+    return it != trainTail + rig + 1 && it->t == x.t && it->r == x.r;
+}
+
+Triple *mergeRuns(Triple *list, INT total, Triple *delta, INT count, bool (*cmp)(const Triple &, const Triple &))
+{
+    std::sort(delta, delta + count, cmp);
+    Triple *merged = (Triple *)calloc(total + count, sizeof(Triple));
+    std::merge(list, list + total, delta, delta + count, merged, cmp);
+    free(list);
+    return merged;
+}
+
+// Add training triples without re-reading train2id.txt: the new triples are
+// sorted and merged into the sorted runs, the run boundaries are re-indexed
+// in one linear pass and the bern statistics are updated from the new
+// (h, r) and (t, r) pairs only. Ids may extend the entity and relation
+// totals. Triples that are already known are skipped; returns the number
+// of triples added.
+extern "C" INT addTrainTriples(INT *heads, INT *tails, INT *rels, INT count, INT newEntityTotal, INT newRelationTotal)
+{
+    INT oldEntityTotal = entityTotal;
+    growTrainTables(newEntityTotal, newRelationTotal);
+    Triple *delta = (Triple *)calloc(count > 0 ? count : 1, sizeof(Triple));
+    for (INT i = 0; i < count; i++)
+    {
+        delta[i].h = heads[i];
+        delta[i].t = tails[i];
+        delta[i].r = rels[i];
+    }
+    std::sort(delta, delta + count, Triple::cmp_head);
+    INT added = 0;
+    for (INT i = 0; i < count; i++)
+    {
+        Triple x = delta[i];
+        if (added > 0 && x.h == delta[added - 1].h && x.r == delta[added - 1].r && x.t == delta[added - 1].t)
+            continue;
+        if (x.h < oldEntityTotal && lefHead[x.h] <= rigHead[x.h] &&
+            std::binary_search(trainHead + lefHead[x.h], trainHead + rigHead[x.h] + 1, x, Triple::cmp_head))
+            continue;
+        // a new (h, r) pair, either unseen in the old runs or in the delta
+        if (!(added > 0 && x.h == delta[added - 1].h && x.r == delta[added - 1].r) &&
+            !(x.h < oldEntityTotal && hasPair(lefHead[x.h], rigHead[x.h], x, true)))
+            left_count[x.r] += 1.0;
+        delta[added++] = x;
+        freqEnt[x.h]++;
+        freqEnt[x.t]++;
+        freqRel[x.r]++;
+    }
+    std::sort(delta, delta + added, Triple::cmp_tail);
+    for (INT i = 0; i < added; i++)
+    {
+        Triple x = delta[i];
+        if (!(i > 0 && x.t == delta[i - 1].t && x.r == delta[i - 1].r) &&
+            !(x.t < oldEntityTotal && hasPair(lefTail[x.t], rigTail[x.t], x, false)))
+            right_count[x.r] += 1.0;
+    }
+
+    trainHead = mergeRuns(trainHead, trainTotal, delta, added, Triple::cmp_head);
+    trainTail = mergeRuns(trainTail, trainTotal, delta, added, Triple::cmp_tail);
+    trainRel = mergeRuns(trainRel, trainTotal, delta, added, Triple::cmp_rel);
+    trainList = mergeRuns(trainList, trainTotal, delta, added, Triple::cmp_head);
+    trainTotal += added;
+    free(delta);
+
+    indexTrainRuns();
+    updateMeans();
+    return added;
 }
 
 Triple *testList;
@@ -62,7 +62,9 @@ extern "C" void getRelBatch(INT *ph, INT *pt, INT *pr)
     }
 }
 
-extern "C" void testHead(REAL *con, INT lastHead, bool type_constrain = false)
+// the raw, filtered, constrained raw and constrained filtered counts of
+// the candidates scoring better than the answer of a head / tail query
+void countHead(REAL *con, INT lastHead, bool type_constrain, INT *s)
 {
     INT h = testList[lastHead].h;
     INT t = testList[lastHead].t;
@@ -108,48 +110,13 @@ extern "C" void testHead(REAL *con, INT lastHead, bool type_constrain = false)
             }
         }
     }
-    printf("\nTest Head: %ld %ld %ld %ld\n", h, r, t, l_filter_s);
-    if (l_filter_s < 10)
-        l_filter_tot += 1;
-    if (l_s < 10)
-        l_tot += 1;
-    if (l_filter_s < 3)
-        l3_filter_tot += 1;
-    if (l_s < 3)
-        l3_tot += 1;
-    if (l_filter_s < 1)
-        l1_filter_tot += 1;
-    if (l_s < 1)
-        l1_tot += 1;
-
-    l_filter_rank += (l_filter_s + 1);
-    l_rank += (1 + l_s);
-    l_filter_reci_rank += 1.0 / (l_filter_s + 1);
-    l_reci_rank += 1.0 / (l_s + 1);
-
-    if (type_constrain)
-    {
-        if (l_filter_s_constrain < 10)
-            l_filter_tot_constrain += 1;
-        if (l_s_constrain < 10)
-            l_tot_constrain += 1;
-        if (l_filter_s_constrain < 3)
-            l3_filter_tot_constrain += 1;
-        if (l_s_constrain < 3)
-            l3_tot_constrain += 1;
-        if (l_filter_s_constrain < 1)
-            l1_filter_tot_constrain += 1;
-        if (l_s_constrain < 1)
-            l1_tot_constrain += 1;
-
-        l_filter_rank_constrain += (l_filter_s_constrain + 1);
-        l_rank_constrain += (1 + l_s_constrain);
-        l_filter_reci_rank_constrain += 1.0 / (l_filter_s_constrain + 1);
-        l_reci_rank_constrain += 1.0 / (l_s_constrain + 1);
-    }
+    s[0] = l_s;
+    s[1] = l_filter_s;
+    s[2] = l_s_constrain;
+    s[3] = l_filter_s_constrain;
 }
 
-extern "C" void testTail(REAL *con, INT lastTail, bool type_constrain = false)
+void countTail(REAL *con, INT lastTail, bool type_constrain, INT *s)
 {
     INT h = testList[lastTail].h;
     INT t = testList[lastTail].t;
@@ -194,6 +161,95 @@ extern "C" void testTail(REAL *con, INT lastTail, bool type_constrain = false)
             }
         }
     }
+    s[0] = r_s;
+    s[1] = r_filter_s;
+    s[2] = r_s_constrain;
+    s[3] = r_filter_s_constrain;
+}
+
+// the four counts of one query, without touching the accumulators, so
+// that shards of testList can be ranked in separate processes
+extern "C" void rankHead(REAL *con, INT index, bool type_constrain, INT *s)
+{
+    countHead(con, index, type_constrain, s);
+}
+
+extern "C" void rankTail(REAL *con, INT index, bool type_constrain, INT *s)
+{
+    countTail(con, index, type_constrain, s);
+}
+
+// move the getHeadBatch / getTailBatch cursors to testList[index]
+extern "C" void seekTest(INT index)
+{
+    lastHead = index;
+    lastTail = index;
+    lastRel = index;
+}
+
+extern "C" void testHead(REAL *con, INT lastHead, bool type_constrain = false)
+{
+    INT h = testList[lastHead].h;
+    INT t = testList[lastHead].t;
+    INT r = testList[lastHead].r;
+    INT s[4];
+    countHead(con, lastHead, type_constrain, s);
+    INT l_s = s[0];
+    INT l_filter_s = s[1];
+    INT l_s_constrain = s[2];
+    INT l_filter_s_constrain = s[3];
+    printf("\nTest Head: %ld %ld %ld %ld\n", h, r, t, l_filter_s);
+    if (l_filter_s < 10)
+        l_filter_tot += 1;
+    if (l_s < 10)
+        l_tot += 1;
+    if (l_filter_s < 3)
+        l3_filter_tot += 1;
+    if (l_s < 3)
+        l3_tot += 1;
+    if (l_filter_s < 1)
+        l1_filter_tot += 1;
+    if (l_s < 1)
+        l1_tot += 1;
+
+    l_filter_rank += (l_filter_s + 1);
+    l_rank += (1 + l_s);
+    l_filter_reci_rank += 1.0 / (l_filter_s + 1);
+    l_reci_rank += 1.0 / (l_s + 1);
+
+    if (type_constrain)
+    {
+        if (l_filter_s_constrain < 10)
+            l_filter_tot_constrain += 1;
+        if (l_s_constrain < 10)
+            l_tot_constrain += 1;
+        if (l_filter_s_constrain < 3)
+            l3_filter_tot_constrain += 1;
+        if (l_s_constrain < 3)
+            l3_tot_constrain += 1;
+        if (l_filter_s_constrain < 1)
+            l1_filter_tot_constrain += 1;
+        if (l_s_constrain < 1)
+            l1_tot_constrain += 1;
+
+        l_filter_rank_constrain += (l_filter_s_constrain + 1);
+        l_rank_constrain += (1 + l_s_constrain);
+        l_filter_reci_rank_constrain += 1.0 / (l_filter_s_constrain + 1);
+        l_reci_rank_constrain += 1.0 / (l_s_constrain + 1);
+    }
+}
+
+extern "C" void testTail(REAL *con, INT lastTail, bool type_constrain = false)
+{
+    INT h = testList[lastTail].h;
+    INT t = testList[lastTail].t;
+    INT r = testList[lastTail].r;
+    INT s[4];
+    countTail(con, lastTail, type_constrain, s);
+    INT r_s = s[0];
+    INT r_filter_s = s[1];
+    INT r_s_constrain = s[2];
+    INT r_filter_s_constrain = s[3];
     printf("\nTest Tail: %ld %ld %ld %ld\n", h, r, t, r_filter_s);
     if (r_filter_s < 10)
         r_filter_tot += 1;
@@ -13,6 +13,8 @@ import json
 import numpy as np
 import copy
 from tqdm import tqdm
+from .Validator import validate
+from .TrainingState import resume, save_state, write_checkpoint, wait_checkpoints
 
 
 class AdvMixTrainer(object):
@@ -30,6 +32,10 @@ class AdvMixTrainer(object):
         generator=None,
         lrg=None,
         mu=None,
+        state_path=None,
+        state_steps=1,
+        validator=None,
+        checkpoint_writer=None,
     ):
 
         self.work_threads = 8
@@ -49,6 +55,13 @@ class AdvMixTrainer(object):
         self.use_gpu = use_gpu
         self.save_steps = save_steps
         self.checkpoint_dir = checkpoint_dir
+        # snapshot of the full training state to resume from, see TrainingState
+        self.state_path = state_path
+        self.state_steps = state_steps
+        # Validator for periodic validation and early stopping
+        self.validator = validator
+        # CheckpointWriter saving the checkpoints in the background
+        self.checkpoint_writer = checkpoint_writer
 
         # the generator part
         assert generator is not None
@@ -157,8 +170,9 @@ class AdvMixTrainer(object):
         else:
             raise NotImplementedError
         print("Finish initializing...")
+        start = resume(self)
 
-        training_range = tqdm(range(self.train_times))
+        training_range = tqdm(range(start, self.train_times))
         for epoch in training_range:
             res = 0.0
             res_g = 0.0
@@ -176,9 +190,16 @@ class AdvMixTrainer(object):
                 and (epoch + 1) % self.save_steps == 0
             ):
                 print("Epoch %d has finished, saving..." % (epoch))
-                self.model.save_checkpoint(
-                    os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt")
+                write_checkpoint(
+                    self,
+                    epoch,
+                    os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt"),
                 )
+            stop = validate(self, epoch)
+            save_state(self, epoch)
+            if stop:
+                break
+        wait_checkpoints(self)
 
     def set_model(self, model):
         self.model = model
@@ -0,0 +1,156 @@
+# coding:utf-8
+import json
+import queue
+import torch
+import torch.multiprocessing as mp
+from .Validator import Validator
+from .CheckpointWriter import stage
+
+
+def _worker(model, args, kwargs, threads, snapshots, results, results_path):
+    # the forked copy of the model takes every snapshot in turn; the
+    # validator (data, filter index, best checkpoint) lives only here
+    torch.set_num_threads(threads)
+    validator = Validator(model, *args, **kwargs)
+    while True:
+        item = snapshots.get()
+        if item is None:
+            return
+        kind, epoch, payload = item
+        if kind == "state":
+            validator.load_state_dict(payload)
+            continue
+        if validator.stopped:
+            # queued before the parent saw the stop
+            results.put((epoch, None, True, None))
+            continue
+        model.load_state_dict(payload)
+        try:
+            stopped = validator.step(epoch)
+        except Exception as e:
+            results.put((epoch, None, False, repr(e)))
+            continue
+        metrics = validator.history[-1][1]
+        if results_path is not None:
+            with open(results_path, "a") as f:
+                f.write(json.dumps({"epoch": epoch, **metrics}) + "\n")
+        results.put((epoch, metrics, stopped, None))
+
+
+class AsyncValidator(object):
+    """
+    Validator that evaluates in a separate process.
+
+    Takes the arguments of Validator. When a validation is due ``step``
+    only copies the model parameters into shared CPU memory and queues
+    them; a forked worker, which holds its own copy of the model and a
+    Validator with its own data and filter index, ranks the snapshots in
+    order, saves the best checkpoint and reports the metrics of every
+    epoch back through a queue (and appended to ``results_path`` as JSON
+    lines). Training never waits: the results are collected at the next
+    ``step``, so early stopping takes effect a few epochs after the
+    validation that triggered it. ``close`` waits for the pending
+    validations and ends the worker.
+
+    The worker is forked when the AsyncValidator is built, so build it
+    while the model is still on the CPU (it evaluates on the GPU only with
+    ``use_gpu``, and only if the trainer has not initialized CUDA yet).
+    """
+
+    def __init__(self, model, *args, threads=1, results_path=None, **kwargs):
+        if any(p.is_cuda for p in model.parameters()):
+            raise ValueError(
+                "Build the AsyncValidator before the model is moved to the GPU"
+            )
+        if kwargs.get("use_gpu") and torch.cuda.is_initialized():
+            raise ValueError("A forked validation worker cannot use CUDA")
+        self.model = model
+        self.steps = kwargs.get("steps", 1)
+        self.metric = kwargs.get("metric", "mrr")
+        self.best = None
+        self.best_epoch = None
+        self.bad = 0
+        self.stopped = False
+        self.history = []
+        self.pending = 0
+        ctx = mp.get_context("fork")
+        self.snapshots = ctx.Queue()
+        self.results = ctx.Queue()
+        self.process = ctx.Process(
+            target=_worker,
+            args=(
+                model,
+                args,
+                dict(kwargs, steps=1),
+                threads,
+                self.snapshots,
+                self.results,
+                results_path,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+
+    def collect(self, block=False):
+        """Take in the results the worker has sent so far (or all, with block)."""
+        while self.pending:
+            try:
+                epoch, metrics, stopped, error = self.results.get(
+                    timeout=1 if block else None, block=block
+                )
+            except queue.Empty:
+                if not block:
+                    return
+                if not self.process.is_alive():
+                    raise RuntimeError(
+                        "Validation worker exited with code {}".format(
+                            self.process.exitcode
+                        )
+                    )
+                continue
+            self.pending -= 1
+            if error is not None:
+                raise RuntimeError("Validation of epoch %d failed: %s" % (epoch, error))
+            self.stopped = self.stopped or stopped
+            if metrics is None:
+                continue
+            self.history.append((epoch, metrics))
+            value = metrics[self.metric]
+            if self.best is None or (
+                value < self.best if self.metric == "mr" else value > self.best
+            ):
+                self.best, self.best_epoch, self.bad = value, epoch, 0
+            else:
+                self.bad += 1
+
+    def step(self, epoch):
+        """Queue a validation after ``epoch`` when due; True once stopped."""
+        self.collect()
+        if not self.stopped and (epoch + 1) % self.steps == 0:
+            self.snapshots.put(("model", epoch, stage(self.model.state_dict())))
+            self.pending += 1
+        return self.stopped
+
+    def close(self):
+        self.collect(block=True)
+        self.snapshots.put(None)
+        self.process.join()
+
+    def state_dict(self):
+        """The state of the validations reported so far."""
+        self.collect()
+        return {
+            "best": self.best,
+            "best_epoch": self.best_epoch,
+            "bad": self.bad,
+            "stopped": self.stopped,
+            "history": list(self.history),
+        }
+
+    def load_state_dict(self, state):
+        self.best = state["best"]
+        self.best_epoch = state["best_epoch"]
+        self.bad = state["bad"]
+        self.stopped = state["stopped"]
+        self.history = list(state["history"])
+        self.snapshots.put(("state", None, state))
@@ -0,0 +1,176 @@
+# coding:utf-8
+import os
+import re
+import json
+import queue
+import hashlib
+import torch
+import torch.multiprocessing as mp
+from .ShardedTester import ShardedTester
+from .RankAccumulator import RankAccumulator
+
+
+def file_hash(paths):
+    """sha256 of the concatenated contents of ``paths``."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def epoch_order(path):
+    # checkpoint-<epoch>.ckpt sorts by epoch, anything else by name
+    match = re.search(r"-(\d+)\.ckpt$", path)
+    return (int(match.group(1)) if match else -1, path)
+
+
+def _worker(evaluator, threads, tasks, results):
+    torch.set_num_threads(threads)
+    while True:
+        path = tasks.get()
+        if path is None:
+            return
+        try:
+            results.put((path, evaluator.run_one(path).state_dict(), None))
+        except Exception as e:
+            results.put((path, None, repr(e)))
+
+
+class CheckpointEvaluator(object):
+    """
+    Link prediction of a whole series of checkpoints of one model.
+
+    The TestDataLoader (test triples, filter index and type constraints in
+    Base.so) is loaded once; ``workers`` forked processes share it and each
+    loads checkpoints into its own copy of ``model`` and ranks testList.
+    Results are cached in ``cache_path`` (JSON) under the sha256 of the
+    checkpoint file, of the dataset files and of the evaluation config
+    (``config`` plus the model class and type_constrain), so evaluating the
+    series again only ranks new or changed checkpoints.
+    """
+
+    data_files = (
+        "train2id.txt",
+        "valid2id.txt",
+        "test2id.txt",
+        "type_constrain.txt",
+    )
+
+    def __init__(
+        self,
+        model,
+        data_loader,
+        type_constrain=False,
+        workers=1,
+        cache_path=None,
+        config=None,
+    ):
+        self.model = model
+        self.tester = ShardedTester(model=model, data_loader=data_loader, use_gpu=False)
+        self.type_constrain = bool(type_constrain)
+        self.workers = workers
+        self.cache_path = cache_path
+        self.data_hash = file_hash(
+            os.path.join(data_loader.in_path, name)
+            for name in self.data_files
+            if os.path.exists(os.path.join(data_loader.in_path, name))
+        )
+        self.config = dict(
+            config or {},
+            model=type(model).__name__,
+            type_constrain=self.type_constrain,
+        )
+        self.cache = {}
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, "r") as f:
+                self.cache = json.load(f)
+        self.evaluated = []
+
+    def key(self, path):
+        return hashlib.sha256(
+            json.dumps(
+                [file_hash([path]), self.data_hash, self.config], sort_keys=True
+            ).encode()
+        ).hexdigest()
+
+    def run_one(self, path):
+        """The RankAccumulator of the checkpoint in ``path``."""
+        state = torch.load(path, map_location="cpu")
+        if not all(name in state for name in self.model.state_dict()):
+            # save_steps checkpoints hold the strategy: model.* and loss.*
+            state = {
+                name[len("model.") :]: tensor
+                for name, tensor in state.items()
+                if name.startswith("model.")
+            }
+        self.model.load_state_dict(state)
+        self.model.eval()
+        total = self.tester.data_loader.get_triple_tot()
+        with torch.no_grad():
+            return self.tester.run_shard(0, total, self.type_constrain)
+
+    def evaluate(self, paths):
+        """{path: (mrr, mr, hit10, hit3, hit1)} of the checkpoints, by epoch."""
+        paths = sorted(paths, key=epoch_order)
+        keys = {path: self.key(path) for path in paths}
+        todo = [path for path in paths if keys[path] not in self.cache]
+        self.evaluated = todo
+        if self.workers == 1 or len(todo) < 2:
+            for path in todo:
+                self._store(keys[path], path, self.run_one(path).state_dict())
+        else:
+            self._run_workers(todo, keys)
+        setting = "filter_constrain" if self.type_constrain else "filter"
+        return {
+            path: RankAccumulator.from_state_dict(
+                self.cache[keys[path]]["ranks"]
+            ).metrics(setting)
+            for path in paths
+        }
+
+    def _store(self, key, path, state):
+        self.cache[key] = {"checkpoint": os.path.basename(path), "ranks": state}
+        if self.cache_path is not None:
+            # rewritten after every checkpoint, an interrupted run keeps its work
+            with open(self.cache_path + ".tmp", "w") as f:
+                json.dump(self.cache, f)
+            os.replace(self.cache_path + ".tmp", self.cache_path)
+
+    def _run_workers(self, todo, keys):
+        workers = min(self.workers, len(todo))
+        threads = max(1, torch.get_num_threads() // workers)
+        ctx = mp.get_context("fork")
+        tasks, results = ctx.Queue(), ctx.Queue()
+        for path in todo:
+            tasks.put(path)
+        for _ in range(workers):
+            tasks.put(None)
+        processes = [
+            ctx.Process(target=_worker, args=(self, threads, tasks, results))
+            for _ in range(workers)
+        ]
+        for p in processes:
+            p.start()
+        done = 0
+        try:
+            while done < len(todo):
+                try:
+                    path, state, error = results.get(timeout=1)
+                except queue.Empty:
+                    failed = [p.exitcode for p in processes if p.exitcode]
+                    if failed:
+                        raise RuntimeError(
+                            "Evaluation worker exited with code {}".format(failed[0])
+                        )
+                    continue
+                if error is not None:
+                    raise RuntimeError("Evaluating {} failed: {}".format(path, error))
+                self._store(keys[path], path, state)
+                done += 1
+        finally:
+            for p in processes:
+                if done < len(todo):
+                    p.terminate()
+                p.join()
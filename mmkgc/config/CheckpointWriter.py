@@ -0,0 +1,135 @@
+# coding:utf-8
+import os
+import queue
+import threading
+import torch
+
+
+def stage(state):
+    """CPU copy of a (nested) state dict, safe to write while training goes on."""
+    if isinstance(state, torch.Tensor):
+        return state.detach().to("cpu", copy=True)
+    if isinstance(state, dict):
+        return type(state)((k, stage(v)) for k, v in state.items())
+    if isinstance(state, (list, tuple)):
+        return type(state)(stage(v) for v in state)
+    return state
+
+
+class CheckpointWriter(object):
+    """
+    Writes checkpoints from a background thread.
+
+    ``snapshot`` copies the model state (and optionally the training state:
+    optimizers, generator, epoch) into CPU staging memory and returns; the
+    writer thread saves the model state to ``path`` exactly like
+    save_checkpoint does and the training state next to it, in
+    ``path + ".train"``, each through a temporary file and an atomic
+    rename. At most ``max_in_flight`` snapshots are staged or being
+    written, further ones wait for a slot. After every write the
+    checkpoints kept are the ``keep_last`` most recent and the
+    ``keep_best`` with the best score (higher is better unless
+    ``higher_better`` is False); with neither set all are kept. A score
+    comes with ``snapshot`` or later through ``score`` (the trainers pass
+    on their validator's results); with ``keep_best`` a checkpoint without
+    one is never deleted, since it may still turn out to be the best.
+    """
+
+    def __init__(
+        self, max_in_flight=2, keep_last=None, keep_best=None, higher_better=True
+    ):
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        self.higher_better = higher_better
+        self.slots = threading.Semaphore(max_in_flight)
+        self.queue = queue.Queue()
+        self.written = []
+        self.error = None
+        self.thread = threading.Thread(target=self._work, daemon=True)
+        self.thread.start()
+
+    def snapshot(self, path, state_dict, train_state=None, score=None):
+        """Stage a checkpoint for writing; raises the error of a failed write."""
+        self._raise()
+        self.slots.acquire()
+        try:
+            staged = (stage(state_dict), stage(train_state))
+        except BaseException:
+            self.slots.release()
+            raise
+        self.queue.put((path, staged, score))
+
+    def score(self, path, score):
+        """Set the score of the checkpoint in ``path``, staged or written."""
+        self._raise()
+        self.queue.put((path, None, score))
+
+    def wait(self):
+        """Block until every staged snapshot is written."""
+        self.queue.join()
+        self._raise()
+
+    def close(self):
+        self.wait()
+        self.queue.put(None)
+        self.thread.join()
+
+    def _raise(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _work(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            path, staged, score = item
+            try:
+                if staged is None:
+                    # a late score, for a checkpoint that is still kept
+                    self.written = [
+                        (w, score if w == path else old) for w, old in self.written
+                    ]
+                else:
+                    state_dict, train_state = staged
+                    self.save(state_dict, path)
+                    if train_state is not None:
+                        self.save(train_state, path + ".train")
+                    self.written = [w for w in self.written if w[0] != path]
+                    self.written.append((path, score))
+                self._retain()
+            except Exception as e:
+                self.error = e
+            finally:
+                if staged is not None:
+                    self.slots.release()
+                self.queue.task_done()
+
+    @staticmethod
+    def save(obj, path):
+        """torch.save through a synced temporary file and an atomic rename."""
+        with open(path + ".tmp", "wb") as f:
+            torch.save(obj, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _retain(self):
+        if self.keep_last is None and self.keep_best is None:
+            return
+        keep = set()
+        if self.keep_last:
+            keep.update(path for path, _ in self.written[-self.keep_last :])
+        if self.keep_best:
+            scored = [w for w in self.written if w[1] is not None]
+            scored.sort(key=lambda w: w[1], reverse=self.higher_better)
+            keep.update(path for path, _ in scored[: self.keep_best])
+            keep.update(path for path, score in self.written if score is None)
+        for path, _ in self.written:
+            if path not in keep:
+                for name in (path, path + ".train"):
+                    if os.path.exists(name):
+                        os.remove(name)
+        self.written = [w for w in self.written if w[0] in keep]
@@ -0,0 +1,122 @@
+# coding:utf-8
+import math
+import torch
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel
+from ..module.model import ShardedEmbedding
+
+
+def get_rank():
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_rank()
+    return 0
+
+
+def get_world_size():
+    if dist.is_available() and dist.is_initialized():
+        return dist.get_world_size()
+    return 1
+
+
+def is_main_process():
+    return get_rank() == 0
+
+
+def init_distributed(backend="gloo"):
+    """Join the process group described by the torchrun environment."""
+    if not dist.is_initialized():
+        dist.init_process_group(backend=backend, init_method="env://")
+    return dist.get_rank(), dist.get_world_size()
+
+
+def unwrap_model(model):
+    if isinstance(model, DistributedDataParallel):
+        return model.module
+    return model
+
+
+def distribute(trainer, bucket_cap_mb=25):
+    """
+    Wrap ``trainer.model`` (a strategy such as NegativeSampling) in
+    DistributedDataParallel for data-parallel CPU training.
+
+    Every rank reseeds its Base.so sampler with ``trainer.seed + rank`` and
+    runs 1 / world_size of the epoch's batches, so an epoch still covers
+    the training set once. Frozen modality tables are buffers that never
+    change, so they are not re-broadcast on every forward pass. Models with
+    ShardedEmbedding tables are returned unwrapped, see sync_gradients.
+    Models that declare parameters their forward leaves out
+    (``unused_in_forward``) make DDP search the graph for unused ones.
+    """
+    rank, world_size = init_distributed()
+    torch.manual_seed(trainer.seed + rank)
+    data_loader = trainer.data_loader
+    data_loader.set_seed(trainer.seed + rank)
+    data_loader.set_nbatches(math.ceil(len(data_loader) / world_size))
+    if sharded_parameters(trainer.model):
+        # the entity rows are exchanged by the sharded tables themselves,
+        # the replicated parameters start from rank 0 and are averaged in
+        # sync_gradients
+        for p in replicated_parameters(trainer.model):
+            dist.broadcast(p.data, 0)
+        return trainer.model
+    # the entity tables are far larger than one bucket and get a bucket of
+    # their own, gradient_as_bucket_view saves a copy of them per step
+    return DistributedDataParallel(
+        trainer.model,
+        bucket_cap_mb=bucket_cap_mb,
+        broadcast_buffers=False,
+        gradient_as_bucket_view=True,
+        find_unused_parameters=has_unused_parameters(trainer.model),
+    )
+
+
+def has_unused_parameters(model):
+    # trainable parameters of the submodules the forward pass never calls
+    return any(
+        p.requires_grad
+        for module in model.modules()
+        for name in getattr(module, "unused_in_forward", ())
+        for p in getattr(module, name).parameters()
+    )
+
+
+def all_reduce_sum(value):
+    tensor = torch.tensor(value, dtype=torch.float64)
+    dist.all_reduce(tensor)
+    return tensor.item()
+
+
+def sharded_parameters(model):
+    return set(id(m.weight) for m in model.modules() if isinstance(m, ShardedEmbedding))
+
+
+def replicated_parameters(model):
+    sharded = sharded_parameters(model)
+    return [p for p in model.parameters() if id(p) not in sharded]
+
+
+def sync_gradients(model):
+    """Average the gradients of the replicated parameters of a sharded model."""
+    if isinstance(model, DistributedDataParallel) or get_world_size() == 1:
+        return
+    world_size = get_world_size()
+    dense = []
+    for p in replicated_parameters(model):
+        if p.grad is None:
+            continue
+        if p.grad.is_sparse:
+            grad = p.grad.coalesce()
+            dist.all_reduce(grad)
+            p.grad = grad / world_size
+        else:
+            dense.append(p.grad)
+    if dense:
+        # one bucket for all the small dense gradients
+        flat = torch.cat([g.reshape(-1) for g in dense])
+        dist.all_reduce(flat)
+        flat /= world_size
+        offset = 0
+        for g in dense:
+            g.copy_(flat[offset : offset + g.numel()].view_as(g))
+            offset += g.numel()
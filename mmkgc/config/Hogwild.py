@@ -0,0 +1,85 @@
+# coding:utf-8
+import math
+import queue
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from tqdm import tqdm
+
+
+def _worker(trainer, rank, results):
+    # split the cores between the workers and give each one its own sampler
+    # stream, the batches of one epoch are divided among them
+    torch.set_num_threads(max(1, trainer.threads // trainer.workers))
+    torch.manual_seed(trainer.seed + rank)
+    data_loader = trainer.data_loader
+    data_loader.set_seed(trainer.seed + rank)
+    data_loader.set_nbatches(math.ceil(len(data_loader) / trainer.workers))
+    trainer.init_optimizer()
+    for epoch in range(trainer.train_times):
+        res = 0.0
+        for data in data_loader:
+            res = res + np.array(trainer.train_one_step(data), ndmin=1)
+        results.put((epoch, res))
+
+
+def run_hogwild(trainer):
+    """
+    Hogwild training: ``trainer.workers`` forked processes update the
+    shared-memory parameters of the model (and generator) without locks.
+
+    Every worker keeps its own optimizer state. The parent collects the
+    per-epoch losses and writes the checkpoints; validation and training
+    state snapshots need a single process and are rejected.
+    """
+    if trainer.use_gpu:
+        raise ValueError("Hogwild training only runs on the CPU.")
+    # the workers own the optimizers and run ahead of the parent's epochs
+    if getattr(trainer, "validator", None) is not None:
+        raise ValueError("Hogwild training does not support a validator.")
+    if getattr(trainer, "state_path", None):
+        raise ValueError("Hogwild training does not support state_path.")
+    modules = [trainer.model]
+    if getattr(trainer, "generator", None) is not None:
+        modules.append(trainer.generator)
+    for module in modules:
+        module.share_memory()
+    trainer.threads = torch.get_num_threads()
+
+    ctx = mp.get_context("fork")
+    results = ctx.Queue()
+    processes = [
+        ctx.Process(target=_worker, args=(trainer, rank, results))
+        for rank in range(trainer.workers)
+    ]
+    for p in processes:
+        p.start()
+    print("Finish initializing {} workers...".format(trainer.workers))
+
+    losses = {}
+    done = 0
+    training_range = tqdm(range(trainer.train_times))
+    try:
+        for epoch in training_range:
+            while losses.get(epoch, (0, None))[0] < trainer.workers:
+                try:
+                    e, res = results.get(timeout=1)
+                except queue.Empty:
+                    failed = [p.exitcode for p in processes if p.exitcode]
+                    if failed:
+                        raise RuntimeError(
+                            "Hogwild worker exited with code {}".format(failed[0])
+                        )
+                    continue
+                count, total = losses.get(e, (0, 0.0))
+                losses[e] = (count + 1, total + res)
+            res = losses.pop(epoch)[1]
+            res = res[0] if len(res) == 1 else tuple(res)
+            training_range.set_description(trainer.epoch_description(epoch, res))
+            trainer.save_epoch(epoch)
+            done += 1
+    finally:
+        for p in processes:
+            if done < trainer.train_times:
+                p.terminate()
+            p.join()
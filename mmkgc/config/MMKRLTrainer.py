@@ -14,6 +14,8 @@ import torch.nn as nn
 import torch.optim as optim
 from torch.autograd import Variable
 from tqdm import tqdm
+from .Validator import validate
+from .TrainingState import resume, save_state, write_checkpoint, wait_checkpoints
 
 
 class MMKRLTrainer(object):
@@ -31,6 +33,10 @@ class MMKRLTrainer(object):
         generator=None,
         lrg=None,
         mu=None,
+        state_path=None,
+        state_steps=1,
+        validator=None,
+        checkpoint_writer=None,
     ):
 
         self.work_threads = 8
@@ -50,6 +56,13 @@ class MMKRLTrainer(object):
         self.use_gpu = use_gpu
         self.save_steps = save_steps
         self.checkpoint_dir = checkpoint_dir
+        # snapshot of the full training state to resume from, see TrainingState
+        self.state_path = state_path
+        self.state_steps = state_steps
+        # Validator for periodic validation and early stopping
+        self.validator = validator
+        # CheckpointWriter saving the checkpoints in the background
+        self.checkpoint_writer = checkpoint_writer
 
         # the generator part
         assert generator is not None
@@ -146,8 +159,9 @@ class MMKRLTrainer(object):
         else:
             raise NotImplementedError
         print("Finish initializing...")
+        start = resume(self)
 
-        training_range = tqdm(range(self.train_times))
+        training_range = tqdm(range(start, self.train_times))
         for epoch in training_range:
             res = 0.0
             res_g = 0.0
@@ -165,9 +179,16 @@ class MMKRLTrainer(object):
                 and (epoch + 1) % self.save_steps == 0
             ):
                 print("Epoch %d has finished, saving..." % (epoch))
-                self.model.save_checkpoint(
-                    os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt")
+                write_checkpoint(
+                    self,
+                    epoch,
+                    os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt"),
                 )
+            stop = validate(self, epoch)
+            save_state(self, epoch)
+            if stop:
+                break
+        wait_checkpoints(self)
 
     def set_model(self, model):
         self.model = model
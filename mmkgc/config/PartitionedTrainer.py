@@ -0,0 +1,235 @@
+# coding:utf-8
+import os
+import time
+import torch
+import numpy as np
+from tqdm import tqdm
+from .SplitOptimizer import SplitOptimizer
+from ..data import TrainDataLoader
+
+
+class PartitionedTrainer(object):
+    """
+    Trains on a PartitionedGraph bucket by bucket, PyTorch-BigGraph style.
+
+    ``model`` is a strategy (e.g. NegativeSampling) around a model whose
+    ``ent_embeddings`` is a sparse nn.Embedding with
+    ``graph.max_bucket_entities()`` rows. Only the two parts of the current
+    bucket are resident in that table; the rows of all parts and their
+    RowAdagrad accumulators are kept in the graph's memory-mapped files and
+    swapped when the bucket changes. Relations and the other parameters stay
+    in memory. Buckets use local entity ids, so models with other tables
+    indexed by entity id (the modality features of the AdvRelRotatE
+    family) cannot be trained this way.
+    """
+
+    def __init__(
+        self,
+        model=None,
+        graph=None,
+        train_times=1000,
+        alpha=0.5,
+        use_gpu=False,
+        neg_ent=1,
+        bern_flag=True,
+        filter_flag=True,
+        threads=8,
+        save_steps=None,
+        checkpoint_dir=None,
+    ):
+        self.model = model
+        self.graph = graph
+        self.train_times = train_times
+        self.alpha = alpha
+        self.use_gpu = use_gpu
+        self.neg_ent = neg_ent
+        self.bern = bern_flag
+        self.filter = filter_flag
+        self.work_threads = threads
+        self.save_steps = save_steps
+        self.checkpoint_dir = checkpoint_dir
+        self.weight_decay = 0
+        self.optimizer = None
+        self.batch_size = self.model.batch_size
+        self.ent_embeddings = self.model.model.ent_embeddings
+        assert self.ent_embeddings.sparse, "the entity table must be sparse"
+        assert self.ent_embeddings.num_embeddings >= graph.max_bucket_entities()
+        entity_tables = [
+            name
+            for name, module in self.model.model.named_children()
+            if hasattr(module, "num_embeddings")
+            and name != "ent_embeddings"
+            and name not in self.model.model.relation_tables
+        ]
+        assert not entity_tables, (
+            "{} would be indexed with bucket-local entity ids; partitioned "
+            "training only supports structural models".format(", ".join(entity_tables))
+        )
+        # offset in the resident table -> part stored there
+        self.resident = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.swaps = 0
+        self.swap_bytes = 0
+        self.swap_time = 0.0
+        self.max_resident_rows = 0
+
+    def stats(self):
+        return {
+            "swaps": self.swaps,
+            "swap_bytes": self.swap_bytes,
+            "swap_time": self.swap_time,
+            "max_resident_rows": self.max_resident_rows,
+        }
+
+    def init_embeddings(self, low, high, seed=0):
+        """Initialize the on-disk entity rows and zero their accumulators."""
+        dim = self.ent_embeddings.embedding_dim
+        self.graph.init_table("ent_embeddings", (dim,), low, high, seed)
+        self.graph.init_table("ent_state", ())
+        self.resident = {}
+
+    def _state(self):
+        return self.optimizer.sparse_optimizer.state[self.ent_embeddings.weight]["sum"]
+
+    def _write_back(self, offset, p):
+        n = self.graph.sizes[p]
+        rows = self.graph.open_table("ent_embeddings", p)
+        state = self.graph.open_table("ent_state", p)
+        rows[:] = self.ent_embeddings.weight.data[offset : offset + n].cpu().numpy()
+        state[:] = self._state()[offset : offset + n].cpu().numpy()
+        rows.flush()
+        state.flush()
+        self.swap_bytes += rows.nbytes + state.nbytes
+
+    def _load(self, offset, p):
+        n = self.graph.sizes[p]
+        rows = self.graph.open_table("ent_embeddings", p)
+        state = self.graph.open_table("ent_state", p)
+        self.ent_embeddings.weight.data[offset : offset + n] = torch.from_numpy(
+            np.asarray(rows)
+        )
+        self._state()[offset : offset + n] = torch.from_numpy(np.asarray(state))
+        self.swap_bytes += rows.nbytes + state.nbytes
+        self.swaps += 1
+
+    def swap(self, i, j):
+        """Make parts i and j resident, in the layout of bucket (i, j)."""
+        start = time.perf_counter()
+        layout = {0: i}
+        if i != j:
+            layout[self.graph.sizes[i]] = j
+        for offset, p in list(self.resident.items()):
+            if layout.get(offset) != p:
+                self._write_back(offset, p)
+                del self.resident[offset]
+        for offset, p in layout.items():
+            if self.resident.get(offset) != p:
+                self._load(offset, p)
+                self.resident[offset] = p
+        rows = sum(self.graph.sizes[p] for p in self.resident.values())
+        self.max_resident_rows = max(self.max_resident_rows, rows)
+        self.swap_time += time.perf_counter() - start
+
+    def flush(self):
+        """Write the resident parts back to their files."""
+        for offset, p in self.resident.items():
+            self._write_back(offset, p)
+
+    def init_optimizer(self):
+        if self.optimizer is None:
+            self.optimizer = SplitOptimizer(
+                self.model,
+                "row_adagrad",
+                lr=self.alpha,
+                weight_decay=self.weight_decay,
+            )
+
+    def train_one_step(self, data):
+        self.optimizer.zero_grad()
+        loss, _ = self.model(
+            {
+                "batch_h": self.to_var(data["batch_h"], self.use_gpu),
+                "batch_t": self.to_var(data["batch_t"], self.use_gpu),
+                "batch_r": self.to_var(data["batch_r"], self.use_gpu),
+                "batch_y": self.to_var(data["batch_y"], self.use_gpu),
+                "mode": data["mode"],
+            }
+        )
+        loss.backward()
+        self.optimizer.step()
+        return loss.item()
+
+    def train_bucket(self, i, j):
+        self.swap(i, j)
+        # every bucket is sampled with the fixed batch size of the strategy,
+        # the number of batches follows the bucket size
+        data_loader = TrainDataLoader(
+            in_path=self.graph.bucket_path(i, j),
+            batch_size=self.batch_size,
+            nbatches=max(1, round(self.graph.bucket_sizes[(i, j)] / self.batch_size)),
+            threads=self.work_threads,
+            sampling_mode="normal",
+            bern_flag=self.bern,
+            filter_flag=self.filter,
+            neg_ent=self.neg_ent,
+            neg_rel=0,
+        )
+        res = 0.0
+        for data in data_loader:
+            res += self.train_one_step(data)
+        return res
+
+    def run(self):
+        if not os.path.exists(self.graph.table_path("ent_embeddings", 0)):
+            raise RuntimeError("Call init_embeddings before training.")
+        if self.use_gpu:
+            self.model.cuda()
+        self.init_optimizer()
+        print("Finish initializing...")
+
+        training_range = tqdm(range(self.train_times))
+        for epoch in training_range:
+            res = 0.0
+            for i, j in self.graph.buckets:
+                res += self.train_bucket(i, j)
+            training_range.set_description("Epoch %d | loss: %f" % (epoch, res))
+
+            if (
+                self.save_steps
+                and self.checkpoint_dir
+                and (epoch + 1) % self.save_steps == 0
+            ):
+                print("Epoch %d has finished, saving..." % (epoch))
+                self.save_checkpoint(self.checkpoint_dir + "-" + str(epoch) + ".ckpt")
+        self.flush()
+
+    def save_checkpoint(self, path):
+        """
+        Flush the entity parts and save the model with the full entity table,
+        so that the checkpoint loads into the unpartitioned model.
+        """
+        self.flush()
+        export_path = os.path.join(self.graph.path, "ent_embeddings.npy")
+        self.graph.export("ent_embeddings", export_path)
+        state_dict = self.model.model.state_dict()
+        state_dict["ent_embeddings.weight"] = torch.from_numpy(
+            np.load(export_path, mmap_mode="c")
+        )
+        torch.save(state_dict, path)
+
+    def to_var(self, x, use_gpu):
+        if use_gpu:
+            return torch.from_numpy(x).cuda()
+        else:
+            return torch.from_numpy(x)
+
+    def set_alpha(self, alpha):
+        self.alpha = alpha
+
+    def set_weight_decay(self, weight_decay):
+        self.weight_decay = weight_decay
+
+    def set_train_times(self, train_times):
+        self.train_times = train_times
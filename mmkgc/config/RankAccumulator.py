@@ -0,0 +1,97 @@
+# coding:utf-8
+import json
+import math
+from collections import Counter
+
+
+class RankAccumulator(object):
+    """
+    Mergeable link prediction totals.
+
+    Instead of Base.so's running float sums, every setting ("raw",
+    "filter" and, with ``type_constrain``, "raw_constrain" and
+    "filter_constrain") keeps a histogram of the head ("l") and tail ("r")
+    ranks. Histograms add exactly, and ``metrics`` sums them in rank
+    order, so the totals of any split of the test set, merged in any
+    order, are bit-identical to those of one pass. ``state_dict`` is plain
+    JSON.
+    """
+
+    settings = ("raw", "filter", "raw_constrain", "filter_constrain")
+
+    def __init__(self, type_constrain=False):
+        self.type_constrain = type_constrain
+        self.total = 0
+        self.ranks = {
+            setting: {"l": Counter(), "r": Counter()}
+            for setting in self.settings[: 4 if type_constrain else 2]
+        }
+
+    def add(self, side, counts):
+        """
+        Count one head ("l") or tail ("r") query from the numbers of better
+        candidates (raw, filtered, constrained raw, constrained filtered)
+        that Base.so's rankHead / rankTail return.
+        """
+        for setting, count in zip(self.settings, counts):
+            if setting in self.ranks:
+                self.ranks[setting][side][int(count) + 1] += 1
+        if side == "r":
+            self.total += 1
+
+    def merge(self, other):
+        if other.type_constrain != self.type_constrain:
+            raise ValueError("Cannot merge constrained and unconstrained ranks")
+        for setting, sides in other.ranks.items():
+            for side, ranks in sides.items():
+                self.ranks[setting][side].update(ranks)
+        self.total += other.total
+        return self
+
+    def metrics(self, setting="filter"):
+        """(mrr, mr, hit10, hit3, hit1) of ``setting``, averaged over both sides."""
+        if setting not in self.ranks:
+            raise ValueError("No {} ranks were accumulated".format(setting))
+        sides = []
+        for side in ("l", "r"):
+            ranks = sorted(self.ranks[setting][side].items())
+            sides.append(
+                (
+                    math.fsum(count / rank for rank, count in ranks) / self.total,
+                    sum(count * rank for rank, count in ranks) / self.total,
+                    sum(count for rank, count in ranks if rank <= 10) / self.total,
+                    sum(count for rank, count in ranks if rank <= 3) / self.total,
+                    sum(count for rank, count in ranks if rank <= 1) / self.total,
+                )
+            )
+        return tuple((l + r) / 2 for l, r in zip(*sides))
+
+    def state_dict(self):
+        return {
+            "type_constrain": self.type_constrain,
+            "total": self.total,
+            "ranks": {
+                setting: {side: sorted(ranks.items()) for side, ranks in sides.items()}
+                for setting, sides in self.ranks.items()
+            },
+        }
+
+    @classmethod
+    def from_state_dict(cls, state):
+        accumulator = cls(state["type_constrain"])
+        accumulator.total = state["total"]
+        for setting, sides in state["ranks"].items():
+            for side, ranks in sides.items():
+                accumulator.ranks[setting][side] = Counter(
+                    {int(rank): count for rank, count in ranks}
+                )
+        return accumulator
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.state_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as f:
+            return cls.from_state_dict(json.load(f))
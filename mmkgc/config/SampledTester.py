@@ -0,0 +1,162 @@
+# coding:utf-8
+import os
+import numpy as np
+import torch
+from statistics import NormalDist
+from tqdm import tqdm
+from .StreamingTester import StreamingTester
+from ..data.PartitionedGraph import read_triples
+from ..data.TypeConstraint import read_type_constrain
+
+
+class SampledTester(StreamingTester):
+    """
+    Approximate filtered link prediction against a sample of candidates.
+
+    For every relation and direction a fixed sample of ``negatives``
+    entities is drawn once (seeded by ``seed``, the relation and the
+    direction), stratified by training degree into ``strata`` equally
+    populated groups with proportional allocation. With
+    ``type_constrain`` (the default of ``evaluate`` and
+    ``run_link_prediction``, which can override it per call) the
+    candidates are the relation's entities in type_constrain.txt, like
+    the constrained metrics of Base.so. Each
+    query scores its answer and its sample only; the known answers are
+    filtered out and the count of better candidates in every stratum is
+    scaled to the stratum's size, which estimates the filtered rank (it is
+    exact when the candidate set is not larger than the sample).
+
+    ``intervals`` holds a normal ``confidence`` interval of every metric
+    over the queries; it does not cover the bias of the estimates. MR is
+    unbiased, MRR and Hits are optimistic: a query none of whose sampled
+    candidates scores better counts as rank 1. The bias shrinks as
+    ``negatives`` grows and is stable enough to compare the epochs of one
+    run; bench_sampled_eval.py prints the estimates next to the exact
+    numbers (on MKG-Y, 2000 negatives give MRR 0.41 for an exact 0.37 at a
+    seventh of the cost, and the type-constrained sets are mostly smaller
+    than the sample, so those estimates are nearly exact).
+    """
+
+    metrics = ("mrr", "mr", "hit10", "hit3", "hit1")
+
+    def __init__(
+        self,
+        model=None,
+        in_path="./",
+        negatives=1000,
+        strata=4,
+        type_constrain=False,
+        confidence=0.95,
+        seed=0,
+        use_gpu=True,
+    ):
+        super(SampledTester, self).__init__(
+            model=model, in_path=in_path, use_gpu=use_gpu
+        )
+        self.negatives = negatives
+        self.strata = strata
+        self.confidence = confidence
+        self.seed = seed
+        self.type_constrain = bool(type_constrain)
+        if type_constrain:
+            self.types = read_type_constrain(in_path)
+        degree = np.zeros(self.ent_tot, dtype=np.int64)
+        for chunk in read_triples(os.path.join(in_path, "train2id.txt"), 1 << 22):
+            degree += np.bincount(chunk[:, :2].reshape(-1), minlength=self.ent_tot)
+        self.degree = degree
+        self.samples = {}
+        self.intervals = None
+
+    def sample(self, r, mode, type_constrain=False):
+        """
+        (pool, labels, sizes, candidates, candidate_labels) of relation
+        ``r``: the sorted candidate pool, its stratum labels, the stratum
+        sizes and the fixed sample drawn from it.
+        """
+        key = (int(r), mode, bool(type_constrain))
+        if key in self.samples:
+            return self.samples[key]
+        if not type_constrain:
+            pool = np.arange(self.ent_tot)
+        else:
+            if self.types is None:
+                self.types = read_type_constrain(self.in_path)
+            pool = self.types[mode][r]
+        # equally populated degree strata, ties broken by id
+        order = np.lexsort((pool, self.degree[pool]))
+        labels = np.empty(len(pool), dtype=np.int64)
+        labels[order] = np.arange(len(pool)) * self.strata // max(len(pool), 1)
+        sizes = np.bincount(labels, minlength=self.strata)
+        if len(pool) <= self.negatives:
+            chosen = np.arange(len(pool))
+        else:
+            rng = np.random.RandomState([self.seed, key[0], int(mode == "tail_batch")])
+            counts = np.maximum(np.round(self.negatives * sizes / len(pool)), 1)
+            chosen = np.concatenate(
+                [
+                    rng.choice(np.flatnonzero(labels == s), int(c), replace=False)
+                    for s, c in enumerate(np.minimum(counts, sizes))
+                    if c > 0
+                ]
+            )
+            chosen.sort()
+        self.samples[key] = (pool, labels, sizes, pool[chosen], labels[chosen])
+        return self.samples[key]
+
+    def rank(self, h, t, r, mode, type_constrain=False):
+        """Estimated filtered rank of (h, t, r) among all heads or tails."""
+        ent, answer = (h, t) if mode == "tail_batch" else (t, h)
+        pool, labels, sizes, candidates, candidate_labels = self.sample(
+            r, mode, type_constrain
+        )
+        known = np.unique(self.known.lookup([ent], [r], mode)[1])
+        # the known answers leave the sample and the strata they fall in
+        filtered = labels[np.isin(pool, known, assume_unique=True)]
+        sizes = sizes - np.bincount(filtered, minlength=self.strata)
+        keep = ~np.isin(candidates, known)
+        query = np.array([ent], dtype=np.int64)
+        batch = np.concatenate(([answer], candidates)).astype(np.int64)
+        score = self.test_one_step(
+            {
+                "batch_h": batch if mode == "head_batch" else query,
+                "batch_t": batch if mode == "tail_batch" else query,
+                "batch_r": np.array([r], dtype=np.int64),
+                "mode": mode,
+            }
+        )
+        better = (score[1:] < score[0]) & keep
+        drawn = np.bincount(candidate_labels[keep], minlength=self.strata)
+        beaten = np.bincount(candidate_labels[better], minlength=self.strata)
+        # a stratum whose sample was all filtered takes the overall rate
+        overall = beaten.sum() / max(drawn.sum(), 1)
+        rate = np.where(drawn > 0, beaten / np.maximum(drawn, 1), overall)
+        return 1.0 + float(np.where(drawn == sizes, beaten, rate * sizes).sum())
+
+    def run_link_prediction(self, type_constrain=None):
+        """Estimated filtered (mrr, mr, hit10, hit3, hit1) of test2id.txt."""
+        return self.evaluate(self.read("test2id.txt"), type_constrain=type_constrain)
+
+    def evaluate(self, test, progress=True, type_constrain=None):
+        """
+        Estimated filtered (mrr, mr, hit10, hit3, hit1) of the rows
+        ``test``; ``type_constrain`` defaults to the constructor's.
+        """
+        if type_constrain is None:
+            type_constrain = self.type_constrain
+        ranks = np.zeros((len(test), 2))
+        with torch.no_grad():
+            for i, (h, t, r) in enumerate(tqdm(test, disable=not progress)):
+                for j, mode in enumerate(("head_batch", "tail_batch")):
+                    ranks[i, j] = self.rank(h, t, r, mode, type_constrain)
+        self.ranks = {"filtered": ranks}
+        ranks = ranks.reshape(-1)
+        values = [1.0 / ranks, ranks, ranks <= 10, ranks <= 3, ranks <= 1]
+        z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        self.intervals = {}
+        results = []
+        for name, value in zip(self.metrics, values):
+            mean = float(np.mean(value))
+            half = z * float(np.std(value)) / np.sqrt(len(value))
+            self.intervals[name] = (mean - half, mean + half)
+            results.append(mean)
+        return tuple(results)
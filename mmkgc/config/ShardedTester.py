@@ -0,0 +1,134 @@
+# coding:utf-8
+import ctypes
+import queue
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from .Tester import Tester
+from .RankAccumulator import RankAccumulator
+
+
+def _worker(tester, shard, lef, rig, type_constrain, threads, results):
+    torch.set_num_threads(threads)
+    accumulator = tester.run_shard(lef, rig, type_constrain)
+    results.put((shard, accumulator.state_dict()))
+
+
+class ShardedTester(Tester):
+    """
+    Link prediction over ``workers`` forked processes.
+
+    testList is split into contiguous ranges; each process walks its range
+    with its own copy of the TestDataLoader, asks Base.so for the rank
+    counts of every query (rankHead / rankTail, which leave the global
+    accumulators alone) and returns a RankAccumulator. The merged
+    accumulator, kept in ``accumulator``, gives the same totals whatever
+    the number of workers. run_shard evaluates one range in this process,
+    for shards run as separate jobs and merged from their saved states.
+    """
+
+    def __init__(self, model=None, data_loader=None, use_gpu=False, workers=1):
+        if use_gpu and workers > 1:
+            raise ValueError("Sharded evaluation only forks on the CPU.")
+        super(ShardedTester, self).__init__(
+            model=model, data_loader=data_loader, use_gpu=use_gpu
+        )
+        self.lib.rankHead.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_void_p,
+        ]
+        self.lib.rankTail.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_void_p,
+        ]
+        self.workers = workers
+        self.accumulator = None
+
+    def run_shard(self, lef, rig, type_constrain=False):
+        """The RankAccumulator of testList[lef:rig]."""
+        accumulator = RankAccumulator(type_constrain)
+        counts = np.zeros(4, dtype=np.int64)
+        counts_addr = counts.__array_interface__["data"][0]
+        self.data_loader.set_sampling_mode("link")
+        self.data_loader.set_range(lef, rig)
+        try:
+            for index, [data_head, data_tail] in enumerate(self.data_loader, lef):
+                score = self.test_one_step(data_head)
+                self.lib.rankHead(
+                    score.__array_interface__["data"][0],
+                    index,
+                    type_constrain,
+                    counts_addr,
+                )
+                accumulator.add("l", counts)
+                score = self.test_one_step(data_tail)
+                self.lib.rankTail(
+                    score.__array_interface__["data"][0],
+                    index,
+                    type_constrain,
+                    counts_addr,
+                )
+                accumulator.add("r", counts)
+        finally:
+            self.data_loader.set_range()
+        return accumulator
+
+    def run_link_prediction(self, type_constrain=False):
+        type_constrain = bool(type_constrain)
+        total = self.data_loader.get_triple_tot()
+        bounds = np.linspace(0, total, self.workers + 1).astype(np.int64)
+        with torch.no_grad():
+            if self.workers == 1:
+                self.accumulator = self.run_shard(0, total, type_constrain)
+            else:
+                self.accumulator = self._run_workers(bounds, type_constrain)
+        setting = "filter_constrain" if type_constrain else "filter"
+        return self.accumulator.metrics(setting)
+
+    def _run_workers(self, bounds, type_constrain):
+        threads = max(1, torch.get_num_threads() // self.workers)
+        ctx = mp.get_context("fork")
+        results = ctx.Queue()
+        processes = [
+            ctx.Process(
+                target=_worker,
+                args=(
+                    self,
+                    shard,
+                    int(bounds[shard]),
+                    int(bounds[shard + 1]),
+                    type_constrain,
+                    threads,
+                    results,
+                ),
+            )
+            for shard in range(self.workers)
+        ]
+        for p in processes:
+            p.start()
+        states = {}
+        try:
+            while len(states) < self.workers:
+                try:
+                    shard, state = results.get(timeout=1)
+                except queue.Empty:
+                    failed = [p.exitcode for p in processes if p.exitcode]
+                    if failed:
+                        raise RuntimeError(
+                            "Evaluation worker exited with code {}".format(failed[0])
+                        )
+                    continue
+                states[shard] = state
+        finally:
+            for p in processes:
+                if len(states) < self.workers:
+                    p.terminate()
+                p.join()
+        accumulator = RankAccumulator(type_constrain)
+        for shard in range(self.workers):
+            accumulator.merge(RankAccumulator.from_state_dict(states[shard]))
+        return accumulator
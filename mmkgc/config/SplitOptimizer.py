@@ -0,0 +1,161 @@
+# coding:utf-8
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from ..module.model import ShardedEmbedding
+
+
+class RowAdagrad(optim.Optimizer):
+    """
+    Adagrad with one accumulator per embedding row, for sparse gradients.
+
+    Only the rows present in the gradient are touched, and the optimizer
+    state is O(rows) instead of O(rows * dim).
+    """
+
+    def __init__(self, params, lr=0.01, eps=1e-10):
+        super(RowAdagrad, self).__init__(params, dict(lr=lr, eps=eps))
+        for group in self.param_groups:
+            for p in group["params"]:
+                self.state[p]["sum"] = torch.zeros(
+                    p.shape[0], dtype=p.dtype, device=p.device
+                )
+
+    @torch.no_grad()
+    def step(self, closure=None):
+        loss = None
+        if closure is not None:
+            with torch.enable_grad():
+                loss = closure()
+        for group in self.param_groups:
+            for p in group["params"]:
+                if p.grad is None:
+                    continue
+                grad = p.grad
+                if grad.is_sparse:
+                    grad = grad.coalesce()
+                    rows, values = grad.indices()[0], grad.values()
+                else:
+                    rows = torch.arange(p.shape[0], device=p.device)
+                    values = grad
+                state = self.state[p]["sum"]
+                state.index_add_(0, rows, values.pow(2).mean(dim=1))
+                std = state[rows].sqrt_().add_(group["eps"]).unsqueeze(1)
+                p.index_add_(0, rows, values / std, alpha=-group["lr"])
+        return loss
+
+
+class SplitOptimizer(object):
+    """
+    Optimizes the sparse embedding tables of a model (nn.Embedding or
+    ShardedEmbedding with sparse=True) with a lazy row-wise optimizer and every other trainable
+    parameter with dense Adam.
+
+    sparse_method: "adam" (torch.optim.SparseAdam, a lazy Adam that only
+    updates the moments of the rows in the batch), "adagrad" or
+    "row_adagrad" (one accumulator per row).
+    """
+
+    # opt_method names accepted by the trainers -> sparse_method
+    methods = {
+        "SparseAdam": "adam",
+        "sparse_adam": "adam",
+        "SparseAdagrad": "adagrad",
+        "sparse_adagrad": "adagrad",
+        "RowAdagrad": "row_adagrad",
+        "row_adagrad": "row_adagrad",
+    }
+
+    def __init__(self, model, sparse_method="adam", lr=0.001, weight_decay=0):
+        sparse_params = []
+        for module in model.modules():
+            if isinstance(module, (nn.Embedding, ShardedEmbedding)) and module.sparse:
+                if module.weight.requires_grad:
+                    sparse_params.append(module.weight)
+        sparse_ids = set(id(p) for p in sparse_params)
+        dense_params = [
+            p for p in model.parameters() if p.requires_grad and id(p) not in sparse_ids
+        ]
+        if not sparse_params:
+            raise ValueError("The model has no sparse embedding tables.")
+        if sparse_method == "adam":
+            self.sparse_optimizer = optim.SparseAdam(sparse_params, lr=lr)
+        elif sparse_method == "adagrad":
+            self.sparse_optimizer = optim.Adagrad(sparse_params, lr=lr)
+        elif sparse_method == "row_adagrad":
+            self.sparse_optimizer = RowAdagrad(sparse_params, lr=lr)
+        else:
+            raise NotImplementedError
+        self.optimizers = [self.sparse_optimizer]
+        self.dense_optimizer = None
+        if dense_params:
+            self.dense_optimizer = optim.Adam(
+                dense_params, lr=lr, weight_decay=weight_decay
+            )
+            self.optimizers.append(self.dense_optimizer)
+
+    @classmethod
+    def for_trainer(cls, trainer):
+        """
+        The SplitOptimizer of ``trainer.model`` for the trainer's opt_method
+        (a key of ``methods``), learning rate and weight decay.
+        """
+        return cls(
+            trainer.model,
+            cls.methods[trainer.opt_method],
+            lr=trainer.alpha,
+            weight_decay=trainer.weight_decay,
+        )
+
+    @property
+    def param_groups(self):
+        return [group for opt in self.optimizers for group in opt.param_groups]
+
+    def zero_grad(self):
+        for optimizer in self.optimizers:
+            optimizer.zero_grad()
+
+    def step(self):
+        for optimizer in self.optimizers:
+            optimizer.step()
+
+    def state_dict(self):
+        state_dict = {"sparse": self.sparse_optimizer.state_dict()}
+        if self.dense_optimizer is not None:
+            state_dict["dense"] = self.dense_optimizer.state_dict()
+        return state_dict
+
+    def load_state_dict(self, state_dict):
+        self.sparse_optimizer.load_state_dict(state_dict["sparse"])
+        if self.dense_optimizer is not None:
+            self.dense_optimizer.load_state_dict(state_dict["dense"])
+
+
+def init_adversarial_optimizers(trainer):
+    """
+    The discriminator (``trainer.optimizer``) and generator
+    (``trainer.optimizer_g``) optimizers of the WCG trainers: Adam, or a
+    SplitOptimizer for the sparse opt_methods, where the MLPs stay dense.
+    """
+    if trainer.optimizer is not None:
+        return
+    if trainer.opt_method in SplitOptimizer.methods:
+        trainer.optimizer = SplitOptimizer.for_trainer(trainer)
+    elif trainer.opt_method in ("Adam", "adam"):
+        trainer.optimizer = optim.Adam(
+            trainer.model.parameters(),
+            lr=trainer.alpha,
+            weight_decay=trainer.weight_decay,
+        )
+    else:
+        raise NotImplementedError
+    trainer.optimizer_g = optim.Adam(
+        trainer.generator.parameters(),
+        lr=trainer.alpha_g,
+        weight_decay=trainer.weight_decay,
+    )
+    print(
+        "Learning Rate of D: {}\nLearning Rate of G: {}".format(
+            trainer.alpha, trainer.alpha_g
+        )
+    )
@@ -0,0 +1,174 @@
+# coding:utf-8
+import os
+import numpy as np
+import torch
+from tqdm import tqdm
+from .Tester import Tester
+from ..data.PartitionedGraph import read_triples
+from ..data.TypeConstraint import read_type_constrain
+from ..serve.BulkPredictor import KnownAnswers, merge_topk
+
+
+class StreamingTester(Tester):
+    """
+    Link prediction that walks the entity set in ``chunk_size`` blocks.
+
+    Every test query is scored through the model's own predict, one block
+    of candidates at a time, and the raw and filtered rank counts are
+    accumulated block by block with the same rules as Base.so's testHead /
+    testTail, so peak memory is bounded by the chunk size instead of the
+    entity count. With ``k`` set, a running top-k of the filtered
+    candidates is kept as well; queries with fewer than ``k`` candidates
+    (a relation with a small type_constrain.txt set) pad their rows with id
+    -1 at score inf.
+
+    With ``type_constrain`` only the relation's candidates in
+    type_constrain.txt are gathered and scored (plus the answer), which
+    gives Base.so's constrained ranks at a fraction of the scoring cost
+    for relations with small candidate sets; the unconstrained metrics
+    still score every entity.
+    """
+
+    def __init__(
+        self, model=None, in_path="./", chunk_size=65536, k=None, use_gpu=True
+    ):
+        super(StreamingTester, self).__init__(model=model, use_gpu=use_gpu)
+        self.in_path = in_path
+        self.chunk_size = chunk_size
+        self.k = k
+        self.ent_tot = model.ent_tot
+        self.known = KnownAnswers.from_path(in_path)
+        self.types = None
+        self.scored = 0
+        self.ranks = None
+        self.topk = None
+
+    def _chunks(self, first):
+        # the chunk of the true answer first, its score is the threshold
+        first = first - first % self.chunk_size
+        yield first
+        for lef in range(0, self.ent_tot, self.chunk_size):
+            if lef != first:
+                yield lef
+
+    def rank(self, h, t, r, mode):
+        """
+        Raw and filtered rank of (h, t, r) among all heads or tails, plus
+        the running top-k (ids, scores) of the filtered candidates.
+        """
+        ent, answer = (h, t) if mode == "tail_batch" else (t, h)
+        known = np.unique(self.known.lookup([ent], [r], mode)[1])
+        raw = filtered = 0
+        minimal = None
+        ids = torch.empty(1, 0, dtype=torch.long)
+        scores = torch.empty(1, 0)
+        for lef in self._chunks(answer):
+            candidates = np.arange(lef, min(lef + self.chunk_size, self.ent_tot))
+            query = np.array([ent], dtype=np.int64)
+            score = self.test_one_step(
+                {
+                    "batch_h": candidates if mode == "head_batch" else query,
+                    "batch_t": candidates if mode == "tail_batch" else query,
+                    "batch_r": np.array([r], dtype=np.int64),
+                    "mode": mode,
+                }
+            )
+            self.scored += len(candidates)
+            if minimal is None:
+                minimal = score[answer - lef]
+            better = score < minimal
+            if lef <= answer < lef + len(candidates):
+                better[answer - lef] = False
+            inside = known[(known >= lef) & (known < lef + len(candidates))] - lef
+            raw += int(better.sum())
+            filtered += int(better.sum() - better[inside].sum())
+            if self.k:
+                score = torch.from_numpy(np.asarray(score, dtype=np.float32)).clone()
+                score[inside[inside != answer - lef]] = float("inf")
+                ids, scores = merge_topk(
+                    ids,
+                    scores,
+                    torch.from_numpy(candidates)[None],
+                    score[None],
+                    self.k,
+                )
+        return raw + 1, filtered + 1, ids[0], scores[0]
+
+    def rank_constrained(self, h, t, r, mode):
+        """
+        rank for the candidates of ``r`` in type_constrain.txt only, like
+        the constrained counts of Base.so's testHead / testTail.
+        """
+        if self.types is None:
+            self.types = read_type_constrain(self.in_path)
+        ent, answer = (h, t) if mode == "tail_batch" else (t, h)
+        allowed = self.types[mode][r]
+        known = np.unique(self.known.lookup([ent], [r], mode)[1])
+        raw = filtered = 0
+        minimal = None
+        ids = torch.empty(1, 0, dtype=torch.long)
+        scores = torch.empty(1, 0)
+        for lef in range(0, max(len(allowed), 1), self.chunk_size):
+            candidates = allowed[lef : lef + self.chunk_size]
+            if minimal is None:
+                # the answer is scored with the first block, its score is the threshold
+                candidates = np.concatenate(([answer], candidates))
+            query = np.array([ent], dtype=np.int64)
+            score = self.test_one_step(
+                {
+                    "batch_h": candidates if mode == "head_batch" else query,
+                    "batch_t": candidates if mode == "tail_batch" else query,
+                    "batch_r": np.array([r], dtype=np.int64),
+                    "mode": mode,
+                }
+            )
+            self.scored += len(candidates)
+            if minimal is None:
+                minimal = score[0]
+                candidates, score = candidates[1:], score[1:]
+            better = (score < minimal) & (candidates != answer)
+            inside = np.isin(candidates, known)
+            raw += int(better.sum())
+            filtered += int((better & ~inside).sum())
+            if self.k:
+                score = torch.from_numpy(np.asarray(score, dtype=np.float32)).clone()
+                score[torch.from_numpy(inside & (candidates != answer))] = float("inf")
+                ids, scores = merge_topk(
+                    ids,
+                    scores,
+                    torch.from_numpy(candidates)[None],
+                    score[None],
+                    self.k,
+                )
+        return raw + 1, filtered + 1, ids[0], scores[0]
+
+    def run_link_prediction(self, type_constrain=False):
+        """Filtered (mrr, mr, hit10, hit3, hit1), as Tester.run_link_prediction."""
+        return self.evaluate(self.read("test2id.txt"), type_constrain=type_constrain)
+
+    def read(self, name):
+        path = os.path.join(self.in_path, name)
+        return np.concatenate(list(read_triples(path, 1 << 16)))
+
+    def evaluate(self, test, progress=True, type_constrain=False):
+        """Filtered (mrr, mr, hit10, hit3, hit1) of the (h, t, r) rows ``test``."""
+        rank = self.rank_constrained if type_constrain else self.rank
+        raw = np.zeros((len(test), 2), dtype=np.int64)
+        filtered = np.zeros((len(test), 2), dtype=np.int64)
+        if self.k:
+            top_ids = np.full((len(test), 2, self.k), -1, dtype=np.int64)
+            top_scores = np.full((len(test), 2, self.k), np.inf, dtype=np.float32)
+        with torch.no_grad():
+            for i, (h, t, r) in enumerate(tqdm(test, disable=not progress)):
+                for j, mode in enumerate(("head_batch", "tail_batch")):
+                    raw[i, j], filtered[i, j], ids, scores = rank(h, t, r, mode)
+                    if self.k:
+                        top_ids[i, j, : len(ids)] = ids.numpy()
+                        top_scores[i, j, : len(ids)] = scores.numpy()
+        self.ranks = {"raw": raw, "filtered": filtered}
+        if self.k:
+            self.topk = (top_ids, top_scores)
+        mrr = float(np.mean(1.0 / filtered))
+        mr = float(np.mean(filtered))
+        hit10, hit3, hit1 = (float(np.mean(filtered <= n)) for n in (10, 3, 1))
+        return mrr, mr, hit10, hit3, hit1
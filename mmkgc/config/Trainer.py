@@ -12,6 +12,18 @@ import json
 import numpy as np
 import copy
 from tqdm import tqdm
+from .Validator import validate
+from .TrainingState import capture_state, resume, save_state
+from .SplitOptimizer import SplitOptimizer
+from .Hogwild import run_hogwild
+from .Distributed import (
+    distribute,
+    unwrap_model,
+    is_main_process,
+    all_reduce_sum,
+    sync_gradients,
+)
+from ..module.model import full_state_dict
 
 
 class Trainer(object):
@@ -28,6 +40,14 @@ class Trainer(object):
         checkpoint_dir=None,
         train_mode="adp",
         beta=0.5,
+        workers=1,
+        seed=0,
+        distributed=False,
+        bucket_cap_mb=25,
+        checkpoint_writer=None,
+        state_path=None,
+        state_steps=1,
+        validator=None,
     ):
 
         self.work_threads = 8
@@ -44,9 +64,22 @@ class Trainer(object):
         self.use_gpu = use_gpu
         self.save_steps = save_steps
         self.checkpoint_dir = checkpoint_dir
+        # snapshot of the full training state to resume from, see TrainingState
+        self.state_path = state_path
+        self.state_steps = state_steps
+        # Validator for periodic validation and early stopping
+        self.validator = validator
 
         self.train_mode = train_mode
         self.beta = beta
+        # number of Hogwild processes, each with the sampler seed seed + rank
+        self.workers = workers
+        self.seed = seed
+        # DistributedDataParallel over gloo, launched e.g. with torchrun
+        self.distributed = distributed
+        self.bucket_cap_mb = bucket_cap_mb
+        # CheckpointWriter saving the checkpoints in the background
+        self.checkpoint_writer = checkpoint_writer
 
     def train_one_step(self, data):
         self.optimizer.zero_grad()
@@ -60,13 +93,12 @@ class Trainer(object):
             }
         )
         loss.backward()
+        if self.distributed:
+            sync_gradients(self.model)
         self.optimizer.step()
         return loss.item()
 
-    def run(self):
-        if self.use_gpu:
-            self.model.cuda()
-
+    def init_optimizer(self):
         if self.optimizer is not None:
             pass
         elif self.opt_method == "Adagrad" or self.opt_method == "adagrad":
@@ -88,31 +120,77 @@ class Trainer(object):
                 lr=self.alpha,
                 weight_decay=self.weight_decay,
             )
+        elif self.opt_method in SplitOptimizer.methods:
+            self.optimizer = SplitOptimizer.for_trainer(self)
         else:
             self.optimizer = optim.SGD(
                 self.model.parameters(),
                 lr=self.alpha,
                 weight_decay=self.weight_decay,
             )
+
+    def epoch_description(self, epoch, res):
+        return "Epoch %d | loss: %f" % (epoch, res)
+
+    def save_epoch(self, epoch):
+        if (
+            self.save_steps
+            and self.checkpoint_dir
+            and (epoch + 1) % self.save_steps == 0
+        ):
+            # sharded tables are gathered by all ranks, rank 0 writes them
+            state_dict = full_state_dict(unwrap_model(self.model))
+            if not is_main_process():
+                return
+            print("Epoch %d has finished, saving..." % (epoch))
+            path = os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt")
+            if self.checkpoint_writer is not None:
+                self.checkpoint_writer.snapshot(
+                    path, state_dict, self.train_state(epoch)
+                )
+                return
+            torch.save(state_dict, path)
+
+    def train_state(self, epoch):
+        return capture_state(self, epoch, model=False)
+
+    def run(self):
+        if self.use_gpu:
+            self.model.cuda()
+
+        if self.workers > 1:
+            run_hogwild(self)
+            self.wait_checkpoints()
+            return
+
+        if self.distributed:
+            self.model = distribute(self, self.bucket_cap_mb)
+
+        self.init_optimizer()
         print("Finish initializing...")
+        start = resume(self)
 
-        training_range = tqdm(range(self.train_times))
+        training_range = tqdm(
+            range(start, self.train_times), disable=not is_main_process()
+        )
         for epoch in training_range:
             res = 0.0
             for data in self.data_loader:
                 loss = self.train_one_step(data)
                 res += loss
-            training_range.set_description("Epoch %d | loss: %f" % (epoch, res))
-
-            if (
-                self.save_steps
-                and self.checkpoint_dir
-                and (epoch + 1) % self.save_steps == 0
-            ):
-                print("Epoch %d has finished, saving..." % (epoch))
-                self.model.save_checkpoint(
-                    os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt")
-                )
+            if self.distributed:
+                res = all_reduce_sum(res)
+            training_range.set_description(self.epoch_description(epoch, res))
+            self.save_epoch(epoch)
+            stop = validate(self, epoch)
+            save_state(self, epoch)
+            if stop:
+                break
+        self.wait_checkpoints()
+
+    def wait_checkpoints(self):
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.wait()
 
     def set_model(self, model):
         self.model = model
@@ -0,0 +1,105 @@
+# coding:utf-8
+import os
+import random
+import numpy as np
+import torch
+from .CheckpointWriter import CheckpointWriter
+
+
+def capture_state(trainer, epoch, model=True):
+    """
+    Everything a trainer needs to continue after ``epoch``: the model (with
+    ``model``), the optimizers, the generator, the torch / numpy / python
+    RNGs, the state of the Base.so sampler and of the validator.
+    """
+    state = {"epoch": epoch}
+    if model:
+        state["model"] = trainer.model.state_dict()
+    for name in ("optimizer", "optimizer_g"):
+        optimizer = getattr(trainer, name, None)
+        state[name] = optimizer.state_dict() if optimizer is not None else None
+    generator = getattr(trainer, "generator", None)
+    state["generator"] = generator.state_dict() if generator is not None else None
+    state["torch_rng"] = torch.get_rng_state()
+    if torch.cuda.is_available():
+        state["cuda_rng"] = torch.cuda.get_rng_state_all()
+    state["numpy_rng"] = np.random.get_state()
+    state["python_rng"] = random.getstate()
+    if hasattr(trainer.data_loader, "get_random_state"):
+        state["sampler"] = trainer.data_loader.get_random_state()
+    if getattr(trainer, "validator", None) is not None:
+        state["validator"] = trainer.validator.state_dict()
+    return state
+
+
+def restore_state(trainer, state):
+    """Load a capture_state snapshot into ``trainer``; returns the next epoch."""
+    if "model" in state:
+        trainer.model.load_state_dict(state["model"])
+    for name in ("optimizer", "optimizer_g"):
+        optimizer = getattr(trainer, name, None)
+        if optimizer is not None and state.get(name) is not None:
+            optimizer.load_state_dict(state[name])
+    generator = getattr(trainer, "generator", None)
+    if generator is not None and state.get("generator") is not None:
+        generator.load_state_dict(state["generator"])
+    torch.set_rng_state(state["torch_rng"])
+    if "cuda_rng" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda_rng"])
+    np.random.set_state(state["numpy_rng"])
+    random.setstate(state["python_rng"])
+    if "sampler" in state:
+        trainer.data_loader.set_random_state(state["sampler"])
+    validator = getattr(trainer, "validator", None)
+    if validator is not None and "validator" in state:
+        validator.load_state_dict(state["validator"])
+        if validator.stopped:
+            return trainer.train_times
+    return state["epoch"] + 1
+
+
+def resume(trainer):
+    """
+    The first epoch to train: 0, or the one after the snapshot in
+    ``trainer.state_path`` when there is one, which is then restored.
+    Call it once the optimizers exist.
+    """
+    path = getattr(trainer, "state_path", None)
+    if not path:
+        return 0
+    if getattr(trainer, "distributed", False):
+        raise ValueError("Training state snapshots need a single process")
+    if not os.path.exists(path):
+        return 0
+    epoch = restore_state(trainer, torch.load(path, weights_only=False))
+    print("Resuming from epoch %d of %s" % (epoch, path))
+    return epoch
+
+
+def save_state(trainer, epoch):
+    """Snapshot the training state to ``trainer.state_path`` every state_steps."""
+    path = getattr(trainer, "state_path", None)
+    if path and (epoch + 1) % trainer.state_steps == 0:
+        CheckpointWriter.save(capture_state(trainer, epoch), path)
+
+
+def write_checkpoint(trainer, epoch, path):
+    """
+    Save the model after ``epoch`` to ``path``: through the trainer's
+    checkpoint_writer, in the background and with the training state in
+    ``path + ".train"``, or else with save_checkpoint.
+    """
+    writer = getattr(trainer, "checkpoint_writer", None)
+    if writer is None:
+        trainer.model.save_checkpoint(path)
+        return
+    writer.snapshot(
+        path, trainer.model.state_dict(), capture_state(trainer, epoch, model=False)
+    )
+
+
+def wait_checkpoints(trainer):
+    """Block until the trainer's checkpoint_writer has written everything."""
+    writer = getattr(trainer, "checkpoint_writer", None)
+    if writer is not None:
+        writer.wait()
@@ -0,0 +1,137 @@
+# coding:utf-8
+import numpy as np
+from .StreamingTester import StreamingTester
+from .SampledTester import SampledTester
+from .CheckpointWriter import CheckpointWriter
+
+
+class Validator(object):
+    """
+    Periodic validation with early stopping for the trainers.
+
+    Every ``steps`` epochs the model is ranked on valid2id.txt (or a fixed
+    random ``subset`` of it) with filtered link prediction. An improvement
+    of ``metric`` ("mrr", "hit10", "hit3", "hit1" or "mr") is written to
+    ``best_path`` as a regular checkpoint; after ``patience`` validations
+    without one, ``step`` tells the trainer to stop. With ``negatives``
+    the ranks are estimated against that many sampled candidates by a
+    SampledTester instead, which is much cheaper.
+    """
+
+    metrics = ("mrr", "mr", "hit10", "hit3", "hit1")
+
+    def __init__(
+        self,
+        model,
+        in_path,
+        steps=1,
+        subset=None,
+        metric="mrr",
+        patience=None,
+        best_path=None,
+        chunk_size=65536,
+        negatives=None,
+        use_gpu=False,
+        seed=0,
+    ):
+        if metric not in self.metrics:
+            raise ValueError("Unknown validation metric: {}".format(metric))
+        self.model = model
+        if negatives:
+            self.tester = SampledTester(
+                model=model,
+                in_path=in_path,
+                negatives=negatives,
+                seed=seed,
+                use_gpu=use_gpu,
+            )
+        else:
+            self.tester = StreamingTester(
+                model=model, in_path=in_path, chunk_size=chunk_size, use_gpu=use_gpu
+            )
+        self.valid = self.tester.read("valid2id.txt")
+        if subset and subset < len(self.valid):
+            rows = np.random.RandomState(seed).choice(len(self.valid), subset, False)
+            self.valid = self.valid[np.sort(rows)]
+        self.steps = steps
+        self.metric = metric
+        self.patience = patience
+        self.best_path = best_path
+        self.best = None
+        self.best_epoch = None
+        self.bad = 0
+        self.stopped = False
+        self.history = []
+
+    def better(self, value):
+        if self.best is None:
+            return True
+        return value < self.best if self.metric == "mr" else value > self.best
+
+    def step(self, epoch):
+        """Validate after ``epoch`` when due; True once training should stop."""
+        if self.stopped or (epoch + 1) % self.steps != 0:
+            return self.stopped
+        training = self.model.training
+        results = dict(zip(self.metrics, self.tester.evaluate(self.valid, False)))
+        self.model.train(training)
+        self.history.append((epoch, results))
+        value = results[self.metric]
+        print(
+            "Epoch %d | valid MRR: %f, MR: %f, Hits@10: %f, Hits@3: %f, Hits@1: %f"
+            % ((epoch,) + tuple(results[m] for m in self.metrics))
+        )
+        if self.better(value):
+            self.best, self.best_epoch, self.bad = value, epoch, 0
+            if self.best_path:
+                CheckpointWriter.save(self.model.state_dict(), self.best_path)
+        else:
+            self.bad += 1
+            if self.patience is not None and self.bad >= self.patience:
+                print(
+                    "Early stopping: best valid %s %f at epoch %d"
+                    % (self.metric, self.best, self.best_epoch)
+                )
+                self.stopped = True
+        return self.stopped
+
+    def state_dict(self):
+        return {
+            "best": self.best,
+            "best_epoch": self.best_epoch,
+            "bad": self.bad,
+            "stopped": self.stopped,
+            "history": list(self.history),
+        }
+
+    def load_state_dict(self, state):
+        self.best = state["best"]
+        self.best_epoch = state["best_epoch"]
+        self.bad = state["bad"]
+        self.stopped = state["stopped"]
+        self.history = list(state["history"])
+
+
+def validate(trainer, epoch):
+    """
+    Run the trainer's validator, if any; True once training should stop.
+    The results are passed on to the trainer's checkpoint_writer as the
+    scores of the checkpoints of their epochs.
+    """
+    validator = getattr(trainer, "validator", None)
+    if validator is None:
+        return False
+    stop = validator.step(epoch)
+    writer = getattr(trainer, "checkpoint_writer", None)
+    if writer is not None and trainer.checkpoint_dir:
+        if writer.higher_better == (validator.metric == "mr"):
+            raise ValueError(
+                "The CheckpointWriter ranks scores the other way round from "
+                "the validation metric {}".format(validator.metric)
+            )
+        # an AsyncValidator reports epochs late, and also from state_dict
+        for done, metrics in validator.history[getattr(trainer, "scored", 0) :]:
+            path = trainer.checkpoint_dir + "-" + str(done) + ".ckpt"
+            writer.score(path, metrics[validator.metric])
+        trainer.scored = len(validator.history)
+    return stop
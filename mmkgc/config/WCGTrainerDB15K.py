@@ -14,6 +14,9 @@ import json
 import numpy as np
 import copy
 from tqdm import tqdm
+from .Validator import validate
+from .TrainingState import resume, save_state, write_checkpoint, wait_checkpoints
+from .SplitOptimizer import init_adversarial_optimizers
 
 
 class WCGTrainerDB15K(object):
@@ -31,6 +34,10 @@ class WCGTrainerDB15K(object):
         generator=None,
         lrg=None,
         mu=None,
+        state_path=None,
+        state_steps=1,
+        validator=None,
+        checkpoint_writer=None,
     ):
 
         self.work_threads = 8
@@ -50,6 +57,13 @@ class WCGTrainerDB15K(object):
         self.use_gpu = use_gpu
         self.save_steps = save_steps
         self.checkpoint_dir = checkpoint_dir
+        # snapshot of the full training state to resume from, see TrainingState
+        self.state_path = state_path
+        self.state_steps = state_steps
+        # Validator for periodic validation and early stopping
+        self.validator = validator
+        # CheckpointWriter saving the checkpoints in the background
+        self.checkpoint_writer = checkpoint_writer
 
         # the generator part
         assert generator is not None
@@ -144,29 +158,11 @@ class WCGTrainerDB15K(object):
         if self.use_gpu:
             self.model.cuda()
 
-        if self.optimizer is not None:
-            pass
-        elif self.opt_method == "Adam" or self.opt_method == "adam":
-            self.optimizer = optim.Adam(
-                self.model.parameters(),
-                lr=self.alpha,
-                weight_decay=self.weight_decay,
-            )
-            self.optimizer_g = optim.Adam(
-                self.generator.parameters(),
-                lr=self.alpha_g,
-                weight_decay=self.weight_decay,
-            )
-            print(
-                "Learning Rate of D: {}\nLearning Rate of G: {}".format(
-                    self.alpha, self.alpha_g
-                )
-            )
-        else:
-            raise NotImplementedError
+        init_adversarial_optimizers(self)
         print("Finish initializing...")
+        start = resume(self)
 
-        training_range = tqdm(range(self.train_times))
+        training_range = tqdm(range(start, self.train_times))
         for epoch in training_range:
             res = 0.0
             res_g = 0.0
@@ -184,9 +180,16 @@ class WCGTrainerDB15K(object):
                 and (epoch + 1) % self.save_steps == 0
             ):
                 print("Epoch %d has finished, saving..." % (epoch))
-                self.model.save_checkpoint(
-                    os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt")
+                write_checkpoint(
+                    self,
+                    epoch,
+                    os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt"),
                 )
+            stop = validate(self, epoch)
+            save_state(self, epoch)
+            if stop:
+                break
+        wait_checkpoints(self)
 
     def set_model(self, model):
         self.model = model
@@ -13,6 +13,10 @@ import json
 import numpy as np
 import copy
 from tqdm import tqdm
+from .Validator import validate
+from .TrainingState import capture_state, resume, save_state
+from .SplitOptimizer import init_adversarial_optimizers
+from .Hogwild import run_hogwild
 
 
 class WCGTrainerGP(object):
@@ -30,6 +34,12 @@ class WCGTrainerGP(object):
         generator=None,
         lrg=None,
         mu=None,
+        workers=1,
+        seed=0,
+        checkpoint_writer=None,
+        state_path=None,
+        state_steps=1,
+        validator=None,
     ):
 
         self.work_threads = 8
@@ -49,6 +59,11 @@ class WCGTrainerGP(object):
         self.use_gpu = use_gpu
         self.save_steps = save_steps
         self.checkpoint_dir = checkpoint_dir
+        # snapshot of the full training state to resume from, see TrainingState
+        self.state_path = state_path
+        self.state_steps = state_steps
+        # Validator for periodic validation and early stopping
+        self.validator = validator
 
         # the generator part
         assert generator is not None
@@ -56,9 +71,15 @@ class WCGTrainerGP(object):
         self.optimizer_g = None
         self.generator = generator
         self.batch_size = self.model.batch_size
-        self.generator.cuda()
+        if self.use_gpu:
+            self.generator.cuda()
         self.mu = mu
         self.beta = 0.1
+        # number of Hogwild processes, each with the sampler seed seed + rank
+        self.workers = workers
+        self.seed = seed
+        # CheckpointWriter saving the checkpoints in the background
+        self.checkpoint_writer = checkpoint_writer
 
     def train_one_step(self, data):
         ######################
@@ -142,7 +163,7 @@ class WCGTrainerGP(object):
 
     def calc_gradient_penalty(self, real_data, fake_data):
         batchsize = real_data[0].shape[0]
-        alpha = torch.rand(batchsize, 1).cuda()
+        alpha = torch.rand(batchsize, 1, device=real_data[0].device)
         inter_h = alpha * real_data[0].detach() + ((1 - alpha) * fake_data[0].detach())
         inter_r = alpha * real_data[1].detach() + ((1 - alpha) * fake_data[1].detach())
         inter_t = alpha * real_data[2].detach() + ((1 - alpha) * fake_data[2].detach())
@@ -155,7 +176,7 @@ class WCGTrainerGP(object):
         gradients = torch.autograd.grad(
             outputs=scores,
             inputs=inters,
-            grad_outputs=torch.ones(scores.size()).cuda(),
+            grad_outputs=torch.ones_like(scores),
             create_graph=True,
             retain_graph=True,
             only_inputs=True,
@@ -165,33 +186,44 @@ class WCGTrainerGP(object):
         ).mean() * self.beta  # opt.GP_LAMBDA
         return gradient_penalty
 
+    def init_optimizer(self):
+        init_adversarial_optimizers(self)
+
+    def epoch_description(self, epoch, res):
+        return "Epoch %d | D loss: %f, G loss %f" % (epoch, res[0], res[1])
+
+    def save_epoch(self, epoch):
+        if (
+            self.save_steps
+            and self.checkpoint_dir
+            and (epoch + 1) % self.save_steps == 0
+        ):
+            print("Epoch %d has finished, saving..." % (epoch))
+            path = os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt")
+            if self.checkpoint_writer is not None:
+                self.checkpoint_writer.snapshot(
+                    path, self.model.state_dict(), self.train_state(epoch)
+                )
+                return
+            self.model.save_checkpoint(path)
+
+    def train_state(self, epoch):
+        return capture_state(self, epoch, model=False)
+
     def run(self):
         if self.use_gpu:
             self.model.cuda()
 
-        if self.optimizer is not None:
-            pass
-        elif self.opt_method == "Adam" or self.opt_method == "adam":
-            self.optimizer = optim.Adam(
-                self.model.parameters(),
-                lr=self.alpha,
-                weight_decay=self.weight_decay,
-            )
-            self.optimizer_g = optim.Adam(
-                self.generator.parameters(),
-                lr=self.alpha_g,
-                weight_decay=self.weight_decay,
-            )
-            print(
-                "Learning Rate of D: {}\nLearning Rate of G: {}".format(
-                    self.alpha, self.alpha_g
-                )
-            )
-        else:
-            raise NotImplementedError
+        if self.workers > 1:
+            run_hogwild(self)
+            self.wait_checkpoints()
+            return
+
+        self.init_optimizer()
         print("Finish initializing...")
+        start = resume(self)
 
-        training_range = tqdm(range(self.train_times))
+        training_range = tqdm(range(start, self.train_times))
         for epoch in training_range:
             res = 0.0
             res_g = 0.0
@@ -199,19 +231,17 @@ class WCGTrainerGP(object):
                 loss, loss_g = self.train_one_step(data)
                 res += loss
                 res_g += loss_g
-            training_range.set_description(
-                "Epoch %d | D loss: %f, G loss %f" % (epoch, res, res_g)
-            )
-
-            if (
-                self.save_steps
-                and self.checkpoint_dir
-                and (epoch + 1) % self.save_steps == 0
-            ):
-                print("Epoch %d has finished, saving..." % (epoch))
-                self.model.save_checkpoint(
-                    os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt")
-                )
+            training_range.set_description(self.epoch_description(epoch, (res, res_g)))
+            self.save_epoch(epoch)
+            stop = validate(self, epoch)
+            save_state(self, epoch)
+            if stop:
+                break
+        self.wait_checkpoints()
+
+    def wait_checkpoints(self):
+        if self.checkpoint_writer is not None:
+            self.checkpoint_writer.wait()
 
     def set_model(self, model):
         self.model = model
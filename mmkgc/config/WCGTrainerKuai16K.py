@@ -14,6 +14,9 @@ import json
 import numpy as np
 import copy
 from tqdm import tqdm
+from .Validator import validate
+from .TrainingState import resume, save_state, write_checkpoint, wait_checkpoints
+from .SplitOptimizer import init_adversarial_optimizers
 
 
 class WCGTrainerKuai16K(object):
@@ -32,6 +35,10 @@ class WCGTrainerKuai16K(object):
         lrg=None,
         mu=None,
         tester=None,
+        state_path=None,
+        state_steps=1,
+        validator=None,
+        checkpoint_writer=None,
     ):
 
         self.work_threads = 8
@@ -51,6 +58,13 @@ class WCGTrainerKuai16K(object):
         self.use_gpu = use_gpu
         self.save_steps = 100
         self.checkpoint_dir = checkpoint_dir
+        # snapshot of the full training state to resume from, see TrainingState
+        self.state_path = state_path
+        self.state_steps = state_steps
+        # Validator for periodic validation and early stopping
+        self.validator = validator
+        # CheckpointWriter saving the checkpoints in the background
+        self.checkpoint_writer = checkpoint_writer
 
         # the generator part
         assert generator is not None
@@ -149,29 +163,11 @@ class WCGTrainerKuai16K(object):
         if self.use_gpu:
             self.model.cuda()
 
-        if self.optimizer is not None:
-            pass
-        elif self.opt_method == "Adam" or self.opt_method == "adam":
-            self.optimizer = optim.Adam(
-                self.model.parameters(),
-                lr=self.alpha,
-                weight_decay=self.weight_decay,
-            )
-            self.optimizer_g = optim.Adam(
-                self.generator.parameters(),
-                lr=self.alpha_g,
-                weight_decay=self.weight_decay,
-            )
-            print(
-                "Learning Rate of D: {}\nLearning Rate of G: {}".format(
-                    self.alpha, self.alpha_g
-                )
-            )
-        else:
-            raise NotImplementedError
+        init_adversarial_optimizers(self)
         print("Finish initializing...")
+        start = resume(self)
 
-        for epoch in range(self.train_times):
+        for epoch in range(start, self.train_times):
             res = 0.0
             res_g = 0.0
             for data in self.data_loader:
@@ -184,6 +180,17 @@ class WCGTrainerKuai16K(object):
                 print("Epoch %d has finished, validate..." % (epoch))
                 self.tester.run_link_prediction(type_constrain=False)
                 # self.model.save_checkpoint(os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt"))
+                if self.checkpoint_dir and self.checkpoint_writer is not None:
+                    write_checkpoint(
+                        self,
+                        epoch,
+                        os.path.join(self.checkpoint_dir + "-" + str(epoch) + ".ckpt"),
+                    )
+            stop = validate(self, epoch)
+            save_state(self, epoch)
+            if stop:
+                break
+        wait_checkpoints(self)
 
     def set_model(self, model):
         self.model = model
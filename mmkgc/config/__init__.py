@@ -3,6 +3,11 @@ from __future__ import division
 from __future__ import print_function
 from .Trainer import Trainer
 from .Tester import Tester
+from .StreamingTester import StreamingTester
+from .SampledTester import SampledTester
+from .ShardedTester import ShardedTester
+from .RankAccumulator import RankAccumulator
+from .CheckpointEvaluator import CheckpointEvaluator
 from .AdvTrainer import AdvTrainer
 from .AdvMixTrainer import AdvMixTrainer
 from .WAdvTrainer import WGANTrainer
@@ -16,10 +21,21 @@ from .WCGTrainerMLP import WCGTrainerMLP
 from .WCGTrainerDB15KGP import WCGTrainerDB15KGP
 from .WCGTrainerKuai16KGP import WCGTrainerKuai16KGP
 from .AblationTrainer import AblationTrainer
+from .SplitOptimizer import SplitOptimizer, RowAdagrad
+from .PartitionedTrainer import PartitionedTrainer
+from .CheckpointWriter import CheckpointWriter
+from .TrainingState import capture_state, restore_state
+from .Validator import Validator
+from .AsyncValidator import AsyncValidator
 
 __all__ = [
     "Trainer",
     "Tester",
+    "StreamingTester",
+    "SampledTester",
+    "ShardedTester",
+    "RankAccumulator",
+    "CheckpointEvaluator",
     "AdvTrainer",
     "AdvConTrainer",
     "RSMEAdvTrainer",
@@ -36,4 +52,12 @@ __all__ = [
     "WCGTrainerDB15KGP",
     "WCGTrainerKuai16KGP",
     "AblationTrainer",
+    "SplitOptimizer",
+    "RowAdagrad",
+    "PartitionedTrainer",
+    "CheckpointWriter",
+    "capture_state",
+    "restore_state",
+    "Validator",
+    "AsyncValidator",
 ]
@@ -0,0 +1,29 @@
+# coding:utf-8
+import numpy as np
+
+
+def read_ids(path):
+    """Names of an entity2id.txt / relation2id.txt file, indexed by id."""
+    with open(path, "r") as f:
+        total = int(f.readline().split()[0])
+        names = [None] * total
+        for line in f:
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            # names may contain spaces, the id is the last column
+            name, idx = line.rsplit(None, 1)
+            names[int(idx)] = name
+    return names
+
+
+def id_map(old_path, new_path):
+    """
+    Match the ids of two versions of an entity2id.txt / relation2id.txt by
+    name. Returns (new_ids, old_ids), the ids of the names found in both.
+    """
+    old = {name: i for i, name in enumerate(read_ids(old_path)) if name is not None}
+    new = read_ids(new_path)
+    pairs = [(i, old[name]) for i, name in enumerate(new) if name in old]
+    pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
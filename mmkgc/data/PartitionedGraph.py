@@ -0,0 +1,177 @@
+# coding:utf-8
+import os
+import json
+import warnings
+import numpy as np
+
+
+def read_count(path):
+    with open(path, "r") as f:
+        return int(f.readline().split()[0])
+
+
+def read_triples(path, chunk_rows=None):
+    """Yield the (h, t, r) rows of a train2id-style file, chunk by chunk."""
+    with open(path, "r") as f:
+        f.readline()
+        while True:
+            with warnings.catch_warnings():
+                # an empty read at the end of the file is expected
+                warnings.simplefilter("ignore", UserWarning)
+                chunk = np.loadtxt(f, dtype=np.int64, max_rows=chunk_rows, ndmin=2)
+            if len(chunk) == 0:
+                return
+            yield chunk
+            if chunk_rows is None or len(chunk) < chunk_rows:
+                return
+
+
+class PartitionedGraph(object):
+    """
+    A training graph split PyTorch-BigGraph style: entities are assigned to
+    ``partitions`` parts and the triples are bucketed by the parts of their
+    head and tail.
+
+    Every bucket (i, j) is an OpenKE-style directory whose ids are local to
+    the two parts, i's entities first, so Base.so samples it (and draws the
+    negatives from the two resident parts) like any other dataset. The
+    entity rows and their optimizer state live in one memory-mapped .npy
+    file per part.
+    """
+
+    def __init__(self, path):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        self.path = path
+        self.partitions = meta["partitions"]
+        self.ent_tot = meta["ent_tot"]
+        self.rel_tot = meta["rel_tot"]
+        self.sizes = meta["sizes"]
+        self.buckets = [tuple(b) for b in meta["buckets"]]
+        self.bucket_sizes = {tuple(b): n for b, n in meta["bucket_sizes"]}
+
+    @classmethod
+    def build(cls, in_path, path, partitions, seed=0, chunk_rows=1 << 22):
+        """Partition the OpenKE dataset in ``in_path`` into ``path``."""
+        ent_tot = read_count(os.path.join(in_path, "entity2id.txt"))
+        rel_tot = read_count(os.path.join(in_path, "relation2id.txt"))
+        os.makedirs(path, exist_ok=True)
+        # a directory without meta.json is not a graph until the build is done
+        if os.path.exists(os.path.join(path, "meta.json")):
+            os.remove(os.path.join(path, "meta.json"))
+        # random balanced assignment, entity perm[k] is row k // P of part k % P
+        perm = np.random.RandomState(seed).permutation(ent_tot)
+        part = np.empty(ent_tot, dtype=np.int64)
+        local = np.empty(ent_tot, dtype=np.int64)
+        part[perm] = np.arange(ent_tot) % partitions
+        local[perm] = np.arange(ent_tot) // partitions
+        sizes = np.bincount(part, minlength=partitions).tolist()
+        for p in range(partitions):
+            np.save(
+                os.path.join(path, "entities-{}.npy".format(p)), perm[p::partitions]
+            )
+
+        # bucket the triples chunk by chunk, the bodies are written first and
+        # the counts prepended at the end; a body is truncated when first
+        # opened, so rebuilding after an interrupted build starts afresh
+        counts = {}
+        for triples in read_triples(os.path.join(in_path, "train2id.txt"), chunk_rows):
+            h, t, r = triples[:, 0], triples[:, 1], triples[:, 2]
+            bucket = part[h] * partitions + part[t]
+            order = np.argsort(bucket, kind="stable")
+            keys, starts = np.unique(bucket[order], return_index=True)
+            ends = list(starts[1:]) + [len(order)]
+            for key, lef, rig in zip(keys.tolist(), starts, ends):
+                i, j = divmod(key, partitions)
+                rows = order[lef:rig]
+                offset = sizes[i] if i != j else 0
+                local_triples = np.stack(
+                    (local[h[rows]], local[t[rows]] + offset, r[rows]), axis=1
+                )
+                bucket_path = cls._bucket_path(path, i, j)
+                os.makedirs(bucket_path, exist_ok=True)
+                mode = "a" if (i, j) in counts else "w"
+                with open(os.path.join(bucket_path, "train2id.body"), mode) as f:
+                    np.savetxt(f, local_triples, fmt="%d")
+                counts[(i, j)] = counts.get((i, j), 0) + len(rows)
+
+        for (i, j), n in counts.items():
+            bucket_path = cls._bucket_path(path, i, j)
+            body = os.path.join(bucket_path, "train2id.body")
+            with open(os.path.join(bucket_path, "train2id.txt"), "w") as f:
+                f.write("{}\n".format(n))
+                with open(body, "r") as fin:
+                    for line in fin:
+                        f.write(line)
+            os.remove(body)
+            # Base.so only reads the totals of these two files
+            with open(os.path.join(bucket_path, "entity2id.txt"), "w") as f:
+                f.write("{}\n".format(sizes[i] + (sizes[j] if i != j else 0)))
+            with open(os.path.join(bucket_path, "relation2id.txt"), "w") as f:
+                f.write("{}\n".format(rel_tot))
+
+        buckets = sorted(counts)
+        meta = {
+            "partitions": partitions,
+            "ent_tot": ent_tot,
+            "rel_tot": rel_tot,
+            "sizes": sizes,
+            "seed": seed,
+            "buckets": buckets,
+            "bucket_sizes": [[b, counts[b]] for b in buckets],
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        return cls(path)
+
+    @staticmethod
+    def _bucket_path(path, i, j):
+        return os.path.join(path, "bucket-{}-{}".format(i, j))
+
+    def bucket_path(self, i, j):
+        # trailing separator, as TrainDataLoader appends the file names
+        return os.path.join(self._bucket_path(self.path, i, j), "")
+
+    def max_bucket_entities(self):
+        """Rows the resident entity table needs to hold any bucket."""
+        return max(
+            self.sizes[i] + (self.sizes[j] if i != j else 0) for i, j in self.buckets
+        )
+
+    def entities(self, p):
+        """Global ids of the rows of part ``p``."""
+        return np.load(os.path.join(self.path, "entities-{}.npy".format(p)))
+
+    def table_path(self, name, p):
+        return os.path.join(self.path, "{}-{}.npy".format(name, p))
+
+    def init_table(self, name, shape, low=0.0, high=0.0, seed=0):
+        """Create the per-part tables ``name`` filled from U(low, high)."""
+        rng = np.random.RandomState(seed)
+        for p in range(self.partitions):
+            table = np.lib.format.open_memmap(
+                self.table_path(name, p),
+                mode="w+",
+                dtype=np.float32,
+                shape=(self.sizes[p],) + tuple(shape),
+            )
+            table[:] = rng.uniform(low, high, size=table.shape)
+            table.flush()
+            del table
+
+    def open_table(self, name, p):
+        return np.load(self.table_path(name, p), mmap_mode="r+")
+
+    def export(self, name, out_path):
+        """Assemble the table ``name`` in global entity order."""
+        first = self.open_table(name, 0)
+        out = np.lib.format.open_memmap(
+            out_path,
+            mode="w+",
+            dtype=first.dtype,
+            shape=(self.ent_tot,) + first.shape[1:],
+        )
+        for p in range(self.partitions):
+            out[self.entities(p)] = self.open_table(name, p)
+        out.flush()
+        return out_path
@@ -42,6 +42,7 @@ class TestDataLoader(object):
             ctypes.c_void_p,
             ctypes.c_void_p,
         ]
+        self.lib.seekTest.argtypes = [ctypes.c_int64]
         """for triple classification"""
         self.lib.getTestBatch.argtypes = [
             ctypes.c_void_p,
@@ -55,6 +56,8 @@ class TestDataLoader(object):
         self.in_path = in_path
         self.sampling_mode = sampling_mode
         self.type_constrain = type_constrain
+        self.lef = 0
+        self.rig = None
         self.read()
 
     def read(self):
@@ -151,13 +154,20 @@ class TestDataLoader(object):
     def set_sampling_mode(self, sampling_mode):
         self.sampling_mode = sampling_mode
 
+    def set_range(self, lef=0, rig=None):
+        """Walk only testList[lef:rig] in link prediction."""
+        self.lef = lef
+        self.rig = rig
+
     def __len__(self):
         return self.testTotal
 
     def __iter__(self):
         if self.sampling_mode == "link":
             self.lib.initTest()
-            return TestDataSampler(self.testTotal, self.sampling_lp)
+            self.lib.seekTest(self.lef)
+            rig = self.testTotal if self.rig is None else self.rig
+            return TestDataSampler(rig - self.lef, self.sampling_lp)
         else:
             self.lib.initTest()
             return TestDataSampler(1, self.sampling_tc)
@@ -60,6 +60,18 @@ class TrainDataLoader(object):
             ctypes.c_int64,
             ctypes.c_int64,
         ]
+        self.lib.setRandomSeed.argtypes = [ctypes.c_int64]
+        self.lib.getRandomState.argtypes = [ctypes.c_void_p]
+        self.lib.setRandomState.argtypes = [ctypes.c_void_p]
+        self.lib.addTrainTriples.argtypes = [
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_void_p,
+            ctypes.c_int64,
+            ctypes.c_int64,
+            ctypes.c_int64,
+        ]
+        self.lib.addTrainTriples.restype = ctypes.c_int64
         self.in_path = in_path
         self.tri_file = tri_file
         self.ent_file = ent_file
@@ -229,6 +241,58 @@ class TrainDataLoader(object):
     def set_filter_flag(self, filter):
         self.filter = filter
 
+    def set_seed(self, seed):
+        self.lib.setRandomSeed(seed)
+
+    def get_random_state(self):
+        """The sampler state: the seeds of Base.so's threads and the cross flag."""
+        seeds = np.zeros(self.work_threads, dtype=np.uint64)
+        self.lib.getRandomState(seeds.__array_interface__["data"][0])
+        return {"seeds": seeds, "cross_sampling_flag": self.cross_sampling_flag}
+
+    def set_random_state(self, state):
+        seeds = np.ascontiguousarray(state["seeds"], dtype=np.uint64)
+        if len(seeds) != self.work_threads:
+            raise ValueError(
+                "Sampler state of {} threads, the loader has {}".format(
+                    len(seeds), self.work_threads
+                )
+            )
+        self.lib.setRandomState(seeds.__array_interface__["data"][0])
+        self.cross_sampling_flag = state["cross_sampling_flag"]
+
+    def add_triples(self, triples, ent_tot=None, rel_tot=None):
+        """
+        Add (h, t, r) training triples to the loaded graph without re-reading
+        train2id.txt. Ids beyond the current totals grow the entity and
+        relation sets, ``ent_tot`` / ``rel_tot`` may reserve more. Known
+        triples are skipped; the batch size is kept and the number of batches
+        follows the new training set. Returns the number of triples added.
+        """
+        triples = np.ascontiguousarray(triples, dtype=np.int64).reshape(-1, 3)
+        h = np.ascontiguousarray(triples[:, 0])
+        t = np.ascontiguousarray(triples[:, 1])
+        r = np.ascontiguousarray(triples[:, 2])
+        ent_tot = max(
+            self.entTotal,
+            ent_tot or 0,
+            int(max(h.max(initial=-1), t.max(initial=-1))) + 1,
+        )
+        rel_tot = max(self.relTotal, rel_tot or 0, int(r.max(initial=-1)) + 1)
+        added = self.lib.addTrainTriples(
+            h.__array_interface__["data"][0],
+            t.__array_interface__["data"][0],
+            r.__array_interface__["data"][0],
+            len(triples),
+            ent_tot,
+            rel_tot,
+        )
+        self.relTotal = self.lib.getRelationTotal()
+        self.entTotal = self.lib.getEntityTotal()
+        self.tripleTotal = self.lib.getTrainTotal()
+        self.nbatches = self.tripleTotal // self.batch_size
+        return added
+
     """interfaces to get essential parameters"""
 
     def get_batch_size(self):
@@ -0,0 +1,23 @@
+# coding:utf-8
+import os
+import numpy as np
+
+
+def read_type_constrain(in_path):
+    """
+    The candidate entities of every relation from ``type_constrain.txt``,
+    as Base.so's importTypeFiles reads them: {"head_batch": [...],
+    "tail_batch": [...]} with one sorted id array per relation.
+    """
+    with open(os.path.join(in_path, "type_constrain.txt"), "r") as f:
+        rel_tot = int(f.readline().split()[0])
+        types = {
+            "head_batch": [np.zeros(0, dtype=np.int64)] * rel_tot,
+            "tail_batch": [np.zeros(0, dtype=np.int64)] * rel_tot,
+        }
+        for _ in range(rel_tot):
+            for mode in ("head_batch", "tail_batch"):
+                row = np.array(f.readline().split(), dtype=np.int64)
+                rel, tot = row[0], row[1]
+                types[mode][rel] = np.unique(row[2 : 2 + tot])
+    return types
@@ -4,5 +4,15 @@ from __future__ import print_function
 
 from .TrainDataLoader import TrainDataLoader
 from .TestDataLoader import TestDataLoader
+from .PartitionedGraph import PartitionedGraph
+from .IdMap import read_ids, id_map
+from .TypeConstraint import read_type_constrain
 
-__all__ = ["TrainDataLoader", "TestDataLoader"]
+__all__ = [
+    "TrainDataLoader",
+    "TestDataLoader",
+    "PartitionedGraph",
+    "read_ids",
+    "id_map",
+    "read_type_constrain",
+]
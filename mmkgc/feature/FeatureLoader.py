@@ -0,0 +1,59 @@
+import os
+import numpy as np
+import torch
+from .ShardedFeatureStore import ShardedFeatureStore
+from .FeatureReduction import reduce_features
+
+
+def feature_cache_path(path):
+    return os.path.splitext(path)[0] + ".npy"
+
+
+def convert_features(path, cache_path=None):
+    """Write the tensor stored in ``path`` as a raw .npy file next to it."""
+    if cache_path is None:
+        cache_path = feature_cache_path(path)
+    emb = torch.load(path, map_location="cpu")
+    if emb.dtype == torch.bfloat16:
+        emb = emb.float()
+    array = np.ascontiguousarray(emb.detach().numpy())
+    # write under a private name first so that concurrent runs never see a
+    # partially written cache file
+    tmp_path = "{}.{}.tmp".format(cache_path, os.getpid())
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+def load_features(path, mmap=True, cache_bytes=None, reduce=None, reduce_dim=None):
+    """
+    Load a ./embeddings/*.pth feature table.
+
+    With ``mmap`` the table is converted once to an .npy file and then
+    mapped copy-on-write, so rows are read from the page cache on demand and
+    processes on the same host share one physical copy. With
+    ``cache_bytes`` a ShardedFeatureStore is returned instead, which keeps
+    only that many bytes of hot rows in memory. ``reduce`` ("pca" or
+    "random") replaces the table by its cached ``reduce_dim``-d reduction.
+    """
+    if reduce is not None:
+        path = reduce_features(path, reduce_dim, method=reduce)
+    if cache_bytes:
+        store_path = os.path.splitext(path)[0] + "-shards"
+        if ShardedFeatureStore.is_stale(store_path, path):
+            print("Sharding {} into {} ...".format(path, store_path))
+            ShardedFeatureStore.build(load_features(path), store_path, source=path)
+        return ShardedFeatureStore(store_path, cache_bytes=cache_bytes)
+    if path.endswith(".npy"):
+        cache_path = path
+    else:
+        if not mmap:
+            return torch.load(path)
+        cache_path = feature_cache_path(path)
+        if not os.path.exists(cache_path) or os.path.getmtime(
+            cache_path
+        ) < os.path.getmtime(path):
+            print("Converting {} to {} ...".format(path, cache_path))
+            convert_features(path, cache_path)
+    return torch.from_numpy(np.load(cache_path, mmap_mode="c" if mmap else None))
@@ -0,0 +1,121 @@
+import os
+import json
+import time
+import hashlib
+import numpy as np
+
+
+def file_hash(path, block_size=1 << 20):
+    sha = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def cached_file_hash(path, cache_dir):
+    """
+    ``file_hash`` of ``path``, remembered in ``cache_dir``/hashes.json for
+    as long as the file keeps its size and mtime.
+    """
+    stat = os.stat(path)
+    record = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    index_path = os.path.join(cache_dir, "hashes.json")
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+    key = os.path.abspath(path)
+    cached = index.get(key, {})
+    if all(cached.get(name) == value for name, value in record.items()):
+        return cached["sha1"]
+    record["sha1"] = file_hash(path)
+    index[key] = record
+    tmp_path = "{}.{}.tmp".format(index_path, os.getpid())
+    with open(tmp_path, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)
+    return record["sha1"]
+
+
+def fit_pca(features, dim, batch_rows=8192):
+    """Streaming PCA: one pass for the mean and covariance, then eigh."""
+    rows, in_dim = features.shape
+    mean = np.zeros(in_dim, dtype=np.float64)
+    cov = np.zeros((in_dim, in_dim), dtype=np.float64)
+    for lef in range(0, rows, batch_rows):
+        x = np.asarray(features[lef : lef + batch_rows], dtype=np.float64)
+        mean += x.sum(axis=0)
+        cov += x.T @ x
+    mean /= rows
+    cov = cov / rows - np.outer(mean, mean)
+    values, vectors = np.linalg.eigh(cov)
+    order = np.argsort(values)[::-1][:dim]
+    explained = float(values[order].sum() / max(values.sum(), 1e-12))
+    return mean.astype(np.float32), vectors[:, order].astype(np.float32), explained
+
+
+def fit_random_projection(in_dim, dim, seed=0):
+    rng = np.random.RandomState(seed)
+    matrix = rng.normal(0.0, 1.0 / np.sqrt(dim), size=(in_dim, dim))
+    return np.zeros(in_dim, dtype=np.float32), matrix.astype(np.float32), None
+
+
+def reduce_features(path, dim, method="pca", cache_dir=None, seed=0, batch_rows=8192):
+    """
+    Reduce the feature table in ``path`` to ``dim`` columns.
+
+    The result is cached as an .npy file plus a .json file with the fit
+    metadata, keyed by the hash of the input file, the method, ``dim`` and
+    ``seed``. The hash is only recomputed when the input's size or mtime
+    changes. Rows are streamed from the memory-mapped table, so the input
+    never has to fit in memory. Returns the path of the reduced table.
+    """
+    from .FeatureLoader import load_features
+
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(path), "reduced")
+    os.makedirs(cache_dir, exist_ok=True)
+    input_hash = cached_file_hash(path, cache_dir)
+    key = hashlib.sha1(
+        "{}-{}-{}-{}".format(input_hash, method, dim, seed).encode()
+    ).hexdigest()
+    stem = os.path.splitext(os.path.basename(path))[0]
+    out_path = os.path.join(
+        cache_dir, "{}-{}{}-{}.npy".format(stem, method, dim, key[:12])
+    )
+    if os.path.exists(out_path):
+        return out_path
+
+    features = load_features(path).numpy()
+    start = time.time()
+    if method == "pca":
+        mean, matrix, explained = fit_pca(features, dim, batch_rows)
+    elif method == "random":
+        mean, matrix, explained = fit_random_projection(features.shape[1], dim, seed)
+    else:
+        raise ValueError("Unknown reduction method: {}".format(method))
+    tmp_path = "{}.{}.tmp.npy".format(out_path[:-4], os.getpid())
+    out = np.lib.format.open_memmap(
+        tmp_path, mode="w+", dtype=np.float32, shape=(features.shape[0], dim)
+    )
+    for lef in range(0, features.shape[0], batch_rows):
+        x = np.asarray(features[lef : lef + batch_rows], dtype=np.float32)
+        out[lef : lef + batch_rows] = (x - mean) @ matrix
+    out.flush()
+    del out
+    meta = {
+        "input": path,
+        "input_hash": input_hash,
+        "method": method,
+        "input_dim": int(features.shape[1]),
+        "dim": dim,
+        "rows": int(features.shape[0]),
+        "seed": seed,
+        "explained_variance": explained,
+        "fit_seconds": time.time() - start,
+    }
+    with open(out_path[:-4] + ".json", "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, out_path)
+    return out_path
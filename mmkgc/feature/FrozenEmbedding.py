@@ -0,0 +1,87 @@
+import torch
+import torch.nn as nn
+
+
+class FrozenEmbedding(nn.Module):
+    """
+    Frozen lookup table for pretrained modality features.
+
+    The table is kept as a buffer in ``dtype`` ("fp32", "fp16", "bf16" or
+    "int8" with one scale per row) and only the gathered rows are converted
+    back to fp32 in ``forward``.
+    """
+
+    dtypes = {
+        "fp32": torch.float32,
+        "fp16": torch.float16,
+        "bf16": torch.bfloat16,
+        "int8": torch.int8,
+    }
+
+    def __init__(self, embeddings, dtype="fp32"):
+        super(FrozenEmbedding, self).__init__()
+        if dtype not in self.dtypes:
+            raise ValueError("Unknown feature dtype: {}".format(dtype))
+        self.dtype = dtype
+        self.num_embeddings, self.embedding_dim = embeddings.shape
+        weight, scale = self.quantize(embeddings, dtype)
+        self.register_buffer("weight", weight)
+        if scale is not None:
+            self.register_buffer("scale", scale)
+        else:
+            self.scale = None
+
+    @classmethod
+    def quantize(cls, embeddings, dtype):
+        embeddings = embeddings.detach()
+        if dtype != "int8":
+            return embeddings.to(cls.dtypes[dtype]), None
+        embeddings = embeddings.float()
+        scale = embeddings.abs().max(dim=1)[0].clamp(min=1e-12) / 127.0
+        weight = torch.round(embeddings / scale.unsqueeze(1)).clamp(-127, 127)
+        return weight.to(torch.int8), scale
+
+    def dequantize(self, rows, index):
+        rows = rows.float()
+        if self.scale is not None:
+            rows = rows * self.scale[index].unsqueeze(-1)
+        return rows
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # checkpoints written with another storage dtype are converted on load
+        key = prefix + "weight"
+        if key in state_dict and state_dict[key].dtype != self.weight.dtype:
+            weight = state_dict[key]
+            if weight.dtype == torch.int8:
+                weight = weight.float() * state_dict[prefix + "scale"].unsqueeze(1)
+            weight, scale = self.quantize(weight, self.dtype)
+            state_dict[key] = weight
+            if scale is not None:
+                state_dict[prefix + "scale"] = scale
+            else:
+                state_dict.pop(prefix + "scale", None)
+        super(FrozenEmbedding, self)._load_from_state_dict(
+            state_dict, prefix, *args, **kwargs
+        )
+
+    def extend(self, embeddings):
+        """Append the feature rows of new entities."""
+        weight, scale = self.quantize(embeddings.to(self.weight.device), self.dtype)
+        self.weight = torch.cat((self.weight, weight))
+        if scale is not None:
+            self.scale = torch.cat((self.scale, scale))
+        self.num_embeddings = self.weight.shape[0]
+
+    def forward(self, input):
+        return self.dequantize(self.weight[input], input)
+
+    def nbytes(self):
+        size = self.weight.numel() * self.weight.element_size()
+        if self.scale is not None:
+            size += self.scale.numel() * self.scale.element_size()
+        return size
+
+    def extra_repr(self):
+        return "{}, {}, dtype={}".format(
+            self.num_embeddings, self.embedding_dim, self.dtype
+        )
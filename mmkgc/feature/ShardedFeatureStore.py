@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import shutil
+import threading
+import collections
+import numpy as np
+import torch
+import torch.nn as nn
+from concurrent.futures import ThreadPoolExecutor
+from .FrozenEmbedding import FrozenEmbedding
+
+
+class ShardedFeatureStore(object):
+    """
+    Out-of-core modality feature table.
+
+    Rows live in memory-mapped .npy shards under ``path`` and are served
+    through an LRU cache of at most ``cache_bytes``. ``prefetch`` loads
+    rows on a background thread so that they are resident when the
+    matching ``gather`` call arrives; ``pin`` keeps the rows of the batch in
+    flight from being evicted by the prefetch of the next one (the cache only
+    outgrows ``cache_bytes`` if the pinned rows alone do).
+    """
+
+    def __init__(self, path, cache_bytes=256 << 20):
+        with open(os.path.join(path, "meta.json"), "r") as f:
+            meta = json.load(f)
+        self.path = path
+        self.shape = tuple(meta["shape"])
+        self.dtype = np.dtype(meta["dtype"])
+        self.rows_per_shard = meta["rows_per_shard"]
+        self.shards = [
+            np.load(os.path.join(path, name), mmap_mode="r") for name in meta["shards"]
+        ]
+        self.row_bytes = self.shape[1] * self.dtype.itemsize
+        self.cache_rows = max(1, cache_bytes // self.row_bytes)
+        self.cache = collections.OrderedDict()
+        self.pinned = set()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.reset_stats()
+
+    @classmethod
+    def build(cls, features, path, rows_per_shard=65536, source=None):
+        """
+        Split ``features`` (tensor or array) into shards under ``path``. The
+        shards are written to a temporary directory that replaces ``path``
+        once complete; with ``source``, the size and mtime of the file the
+        features were read from are recorded for ``is_stale``.
+        """
+        if isinstance(features, torch.Tensor):
+            features = features.detach().float().numpy()
+        path = os.path.normpath(path)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        shards = []
+        for i, lef in enumerate(range(0, features.shape[0], rows_per_shard)):
+            name = "shard-{:05d}.npy".format(i)
+            np.save(
+                os.path.join(tmp_path, name),
+                np.ascontiguousarray(features[lef : lef + rows_per_shard]),
+            )
+            shards.append(name)
+        meta = {
+            "shape": list(features.shape),
+            "dtype": np.dtype(features.dtype).str,
+            "rows_per_shard": rows_per_shard,
+            "shards": shards,
+        }
+        if source is not None:
+            meta["source"] = cls.source_stat(source)
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        # a directory cannot be replaced in one step, move the old one aside
+        old_path = "{}.{}.old".format(path, os.getpid())
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+        return path
+
+    @staticmethod
+    def source_stat(source):
+        stat = os.stat(source)
+        return {
+            "path": os.path.abspath(source),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    @classmethod
+    def is_stale(cls, path, source):
+        """Whether the store in ``path`` is missing or older than ``source``."""
+        meta_path = os.path.join(path, "meta.json")
+        if not os.path.exists(meta_path):
+            return True
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        return meta.get("source") != cls.source_stat(source)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.fetch_time = 0.0
+        self.prefetched = 0
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "fetches": self.fetches,
+            "fetch_latency": self.fetch_time / self.fetches if self.fetches else 0.0,
+            "prefetched_rows": self.prefetched,
+            "cached_rows": len(self.cache),
+            "cache_bytes": len(self.cache) * self.row_bytes,
+        }
+
+    def _read(self, ids):
+        # ids are sorted, so rows of one shard are read in a single pass
+        start = time.perf_counter()
+        rows = np.empty((len(ids), self.shape[1]), dtype=self.dtype)
+        shard_ids = ids // self.rows_per_shard
+        for shard in np.unique(shard_ids):
+            mask = shard_ids == shard
+            rows[mask] = self.shards[shard][ids[mask] - shard * self.rows_per_shard]
+        with self.lock:
+            self.fetches += 1
+            self.fetch_time += time.perf_counter() - start
+        return rows
+
+    def _insert(self, ids, rows):
+        for i, row in zip(ids.tolist(), rows):
+            self.cache[i] = row
+            self.cache.move_to_end(i)
+        # least recently used first, the pinned rows are skipped
+        excess = len(self.cache) - self.cache_rows
+        if excess > 0:
+            victims = []
+            for i in self.cache:
+                if i not in self.pinned:
+                    victims.append(i)
+                    if len(victims) == excess:
+                        break
+            for i in victims:
+                del self.cache[i]
+
+    def _missing(self, ids):
+        return np.array(
+            [i for i in ids.tolist() if i not in self.cache], dtype=np.int64
+        )
+
+    def _prefetch(self, ids):
+        with self.lock:
+            missing = self._missing(ids)
+            # the cached rows are about to be used too, keep them recent
+            for i in ids.tolist():
+                if i in self.cache:
+                    self.cache.move_to_end(i)
+        if len(missing) == 0:
+            return
+        rows = self._read(missing)
+        with self.lock:
+            self._insert(missing, rows)
+            self.prefetched += len(missing)
+
+    def pin(self, index):
+        """Keep the rows of ``index`` cached until the next ``pin`` call."""
+        with self.lock:
+            self.pinned = set(np.asarray(index, dtype=np.int64).ravel().tolist())
+
+    def prefetch(self, index):
+        ids = np.unique(np.asarray(index, dtype=np.int64))
+        return self.executor.submit(self._prefetch, ids)
+
+    def gather(self, index):
+        index = np.asarray(index, dtype=np.int64)
+        ids, inverse = np.unique(index, return_inverse=True)
+        out = np.empty((len(ids), self.shape[1]), dtype=self.dtype)
+        with self.lock:
+            missing = []
+            for pos, i in enumerate(ids.tolist()):
+                row = self.cache.get(i)
+                if row is None:
+                    missing.append(pos)
+                else:
+                    self.cache.move_to_end(i)
+                    out[pos] = row
+            self.hits += len(ids) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            missing = np.array(missing, dtype=np.int64)
+            rows = self._read(ids[missing])
+            out[missing] = rows
+            with self.lock:
+                self._insert(ids[missing], rows)
+        return out[inverse.reshape(-1)].reshape(index.shape + (self.shape[1],))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+class StoreEmbedding(nn.Module):
+    """Frozen embedding layer that gathers its rows from a ShardedFeatureStore."""
+
+    def __init__(self, store):
+        super(StoreEmbedding, self).__init__()
+        self.store = store
+        self.num_embeddings, self.embedding_dim = store.shape
+
+    def _load_from_state_dict(
+        self,
+        state_dict,
+        prefix,
+        local_metadata,
+        strict,
+        missing_keys,
+        unexpected_keys,
+        error_msgs,
+    ):
+        # the table stays on disk: a copy of it stored by a FrozenEmbedding
+        # is skipped if it has the store's shape, other keys are reported
+        for key, value in state_dict.items():
+            if not key.startswith(prefix):
+                continue
+            name = key[len(prefix) :]
+            if name == "weight" and tuple(value.shape) != self.store.shape:
+                error_msgs.append(
+                    "size mismatch for {}: copying a param with shape {} from "
+                    "checkpoint, the feature store has shape {}.".format(
+                        key, tuple(value.shape), self.store.shape
+                    )
+                )
+            elif name not in ("weight", "scale") and strict:
+                unexpected_keys.append(key)
+
+    def forward(self, input):
+        rows = self.store.gather(input.detach().cpu().numpy())
+        return torch.from_numpy(rows).float().to(input.device)
+
+    def extra_repr(self):
+        return "{}, {}, path={}".format(
+            self.num_embeddings, self.embedding_dim, self.store.path
+        )
+
+
+class FeaturePrefetcher(object):
+    """
+    Wraps a TrainDataLoader and samples one batch ahead, asking the stores
+    to prefetch the entities of the next batch while the current one trains.
+    The entities of the current batch stay pinned until it is consumed.
+    """
+
+    def __init__(self, data_loader, stores):
+        self.data_loader = data_loader
+        self.stores = stores
+
+    def __getattr__(self, name):
+        return getattr(self.data_loader, name)
+
+    def _next(self, iterator):
+        try:
+            data = next(iterator)
+        except StopIteration:
+            return None
+        # the sampler reuses its buffers, so keep our own copy
+        data = {
+            k: v.copy() if isinstance(v, np.ndarray) else v for k, v in data.items()
+        }
+        for store in self.stores:
+            store.prefetch(self._ids(data))
+        return data
+
+    @staticmethod
+    def _ids(data):
+        return np.concatenate((data["batch_h"], data["batch_t"]))
+
+    def __iter__(self):
+        iterator = iter(self.data_loader)
+        data = self._next(iterator)
+        try:
+            while data is not None:
+                for store in self.stores:
+                    store.pin(self._ids(data))
+                next_data = self._next(iterator)
+                yield data
+                data = next_data
+        finally:
+            for store in self.stores:
+                store.pin(())
+
+    def __len__(self):
+        return len(self.data_loader)
+
+
+def feature_embedding(features, dtype="fp32"):
+    if isinstance(features, ShardedFeatureStore):
+        return StoreEmbedding(features)
+    return FrozenEmbedding(features, dtype=dtype)
@@ -0,0 +1,24 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from .FrozenEmbedding import FrozenEmbedding
+from .FeatureLoader import load_features, convert_features
+from .FeatureReduction import reduce_features
+from .ShardedFeatureStore import (
+    ShardedFeatureStore,
+    StoreEmbedding,
+    FeaturePrefetcher,
+    feature_embedding,
+)
+
+__all__ = [
+    "FrozenEmbedding",
+    "load_features",
+    "convert_features",
+    "reduce_features",
+    "ShardedFeatureStore",
+    "StoreEmbedding",
+    "FeaturePrefetcher",
+    "feature_embedding",
+]
@@ -0,0 +1,351 @@
+# coding:utf-8
+import json
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+
+def export_embeddings(model, batch_size=4096):
+    """
+    Final entity and relation vectors of a trained model for retrieval.
+
+    Returns a dict with the entity table ``ent``, the relation table
+    ``rel`` and the scoring ``kind``: "transe" (h + r - t under the
+    p-norm) or "rotate" (h o r - t, summed moduli of the complex parts).
+    For the multimodal AdvRelRotatE family ``ent`` is the relation-free
+    attention fusion of get_attention, which the index clusters; the model
+    scores with a fusion per relation (the rel_gate temperature), so the
+    dict also holds the stacked structural, image and text vectors
+    ``stack``, their attention ``logits`` and the per-relation ``gate``
+    that relation_vectors combines.
+    """
+    extra = {}
+    with torch.no_grad():
+        rel = model.rel_embeddings.weight.detach().float().cpu()
+        if hasattr(model, "get_batch_ent_multimodal_embs"):
+            stacks, logits = [], []
+            for lef in range(0, model.ent_tot, batch_size):
+                batch = torch.arange(lef, min(lef + batch_size, model.ent_tot))
+                embs = model.get_batch_ent_multimodal_embs(
+                    batch.to(model.ent_embedding_range.device)
+                )
+                stack = torch.stack(embs[:3], dim=1)
+                stacks.append(stack.float().cpu())
+                logits.append(
+                    model.ent_attn(torch.tanh(stack)).squeeze(-1).float().cpu()
+                )
+            stack, logits = torch.cat(stacks), torch.cat(logits)
+            weights = torch.softmax(logits, dim=-1)
+            ent = torch.sum(weights.unsqueeze(-1) * stack, dim=1)
+            extra = {
+                "stack": stack.numpy(),
+                "logits": logits.numpy(),
+                "gate": torch.sigmoid(model.rel_gate.weight.detach().float())
+                .cpu()
+                .numpy()[:, 0],
+            }
+        else:
+            ent = model.ent_embeddings.weight.detach().float().cpu()
+        if hasattr(model, "rel_embedding_range"):
+            # relations are phases, stored as unit complex numbers
+            phase = rel / (model.rel_embedding_range.item() / np.pi)
+            return dict(
+                extra,
+                ent=ent.numpy(),
+                rel=torch.cat((torch.cos(phase), torch.sin(phase)), -1).numpy(),
+                kind="rotate",
+                p_norm=2,
+            )
+        if getattr(model, "norm_flag", False):
+            ent = F.normalize(ent, 2, -1)
+            rel = F.normalize(rel, 2, -1)
+        return {
+            "ent": ent.numpy(),
+            "rel": rel.numpy(),
+            "kind": "transe",
+            "p_norm": model.p_norm,
+        }
+
+
+def relation_vectors(embeddings, ent, rel):
+    """
+    Vectors of the entities ``ent`` as the model scores them under the
+    relations ``rel`` (one, or one per entity): the per-relation fusion of
+    the AdvRelRotatE family, the entity table otherwise.
+    """
+    if "stack" not in embeddings:
+        return embeddings["ent"][ent]
+    logits = embeddings["logits"][ent] / np.atleast_1d(embeddings["gate"][rel])[:, None]
+    weights = np.exp(logits - logits.max(-1, keepdims=True))
+    weights /= weights.sum(-1, keepdims=True)
+    return np.sum(weights[..., None] * embeddings["stack"][ent], axis=-2)
+
+
+def query_vectors(embeddings, ent, rel, mode="tail_batch"):
+    """
+    Targets of (ent, rel, ?) queries (``mode`` "tail_batch") or (?, rel, ent)
+    queries ("head_batch"): the entity vector closest to the target is the
+    best answer. For RotatE, |h o r - t| = |h - t o conj(r)| as |r| = 1.
+    """
+    e = relation_vectors(embeddings, ent, rel)
+    r = embeddings["rel"][rel]
+    if embeddings["kind"] == "transe":
+        return e + r if mode == "tail_batch" else e - r
+    re_e, im_e = np.split(e, 2, axis=-1)
+    re_r, im_r = np.split(r, 2, axis=-1)
+    if mode != "tail_batch":
+        im_r = -im_r
+    return np.concatenate((re_e * re_r - im_e * im_r, re_e * im_r + im_e * re_r), -1)
+
+
+def vector_norms(kind, p_norm, diff):
+    """Distance of every row of ``diff`` (query - answer) under the model."""
+    if kind == "rotate":
+        re, im = torch.chunk(diff, 2, dim=-1)
+        return torch.sqrt(re * re + im * im).sum(-1)
+    return torch.norm(diff, p_norm, -1)
+
+
+def pairwise_distances(kind, p_norm, queries, vectors, budget=1 << 20):
+    """
+    Distances of every query to every vector as a (Q, N) tensor. RotatE
+    distances are taken over chunks of vectors whose (Q, chunk, d)
+    difference holds about ``budget`` floats, small enough to stay in cache.
+    """
+    if kind != "rotate":
+        return torch.cdist(queries, vectors, p=p_norm)
+    out = torch.empty(len(queries), len(vectors))
+    chunk = max(1, budget // (len(queries) * vectors.shape[1]))
+    for lef in range(0, len(vectors), chunk):
+        out[:, lef : lef + chunk] = vector_norms(
+            kind, p_norm, queries[:, None, :] - vectors[None, lef : lef + chunk, :]
+        )
+    return out
+
+
+def distances(kind, p_norm, queries, vectors):
+    """pairwise_distances of numpy arrays."""
+    return pairwise_distances(
+        kind,
+        p_norm,
+        torch.from_numpy(np.ascontiguousarray(queries)),
+        torch.from_numpy(np.ascontiguousarray(vectors)),
+    ).numpy()
+
+
+def kmeans(x, k, iters=20, seed=0, sample=65536):
+    """Lloyd's k-means on a sample of the rows of ``x``, L2."""
+    rng = np.random.RandomState(seed)
+    if len(x) > sample:
+        x = x[rng.choice(len(x), sample, replace=False)]
+    k = min(k, len(x))
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    for _ in range(iters):
+        assign = nearest_centroid(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        sums = torch.zeros(centroids.shape, dtype=torch.float64)
+        sums.index_add_(0, torch.from_numpy(assign), torch.from_numpy(x).double())
+        sums = sums.numpy()
+        full = counts > 0
+        centroids[full] = sums[full] / counts[full, None]
+        # restart the empty clusters at random points
+        centroids[~full] = x[rng.randint(len(x), size=(~full).sum())]
+    return centroids
+
+
+def nearest_centroid(x, centroids, batch_size=65536):
+    assign = np.empty(len(x), dtype=np.int64)
+    norms = (centroids**2).sum(1)
+    for lef in range(0, len(x), batch_size):
+        rows = x[lef : lef + batch_size]
+        assign[lef : lef + batch_size] = np.argmin(norms - 2 * rows @ centroids.T, 1)
+    return assign
+
+
+class EntityIndex(object):
+    """
+    Top-k retrieval of the answers to (h, r, ?) and (?, r, t) queries
+    without scanning all entities.
+
+    The entity vectors are split into ``nlist`` inverted lists by k-means
+    (IVF). A query visits the ``nprobe`` lists with the closest centroids
+    and re-ranks their members exactly under the model's distance; for
+    the multimodal models the lists hold the relation-free fusion and the
+    re-ranking, given the queries' relations, the model's per-relation
+    one (see export_embeddings). With
+    ``pq_m`` the lists store product-quantized codes (``pq_m`` sub-vectors
+    of 256 centroids each) instead: the members are ranked by their
+    approximate L2 distance from per-query lookup tables and only the best
+    ``rerank`` of them are re-ranked on the full vectors.
+    """
+
+    def __init__(self, embeddings, nlist=None, pq_m=None, seed=0):
+        self.embeddings = embeddings
+        self.kind = embeddings["kind"]
+        self.p_norm = embeddings["p_norm"]
+        self.vectors = np.ascontiguousarray(embeddings["ent"], dtype=np.float32)
+        # at most one list per entity
+        self.nlist = max(
+            1, min(nlist or int(np.sqrt(len(self.vectors))), len(self.vectors))
+        )
+        self.pq_m = pq_m
+        self.seed = seed
+        self.codes = None
+        self.codebooks = None
+
+    def build(self):
+        self.centroids = kmeans(self.vectors, self.nlist, seed=self.seed)
+        self.nlist = len(self.centroids)
+        assign = nearest_centroid(self.vectors, self.centroids)
+        # inverted lists as one id array sorted by list plus offsets
+        self.ids = np.argsort(assign, kind="stable")
+        self.offsets = np.searchsorted(assign[self.ids], np.arange(self.nlist + 1))
+        if self.pq_m:
+            self._train_pq()
+        return self
+
+    def _train_pq(self):
+        dim = self.vectors.shape[1]
+        assert dim % self.pq_m == 0, "pq_m must divide the dimension"
+        ksub = min(256, len(self.vectors))
+        # sub-vectors of the rows in inverted-list order
+        parts = np.split(self.vectors[self.ids], self.pq_m, axis=1)
+        parts = [np.ascontiguousarray(part) for part in parts]
+        self.codebooks = np.stack(
+            [kmeans(part, ksub, iters=10, seed=self.seed) for part in parts]
+        )
+        self.codes = np.stack(
+            [nearest_centroid(part, c) for part, c in zip(parts, self.codebooks)],
+            axis=1,
+        ).astype(np.uint8)
+
+    def _probe(self, queries, nprobe):
+        # the nprobe closest lists of every query, by L2 to the centroids
+        d = (self.centroids**2).sum(1) - 2 * queries @ self.centroids.T
+        nprobe = min(nprobe, self.nlist)
+        if nprobe == self.nlist:
+            return np.tile(np.arange(self.nlist), (len(queries), 1))
+        return np.argpartition(d, nprobe, axis=1)[:, :nprobe]
+
+    def search(self, queries, k=10, nprobe=8, rerank=None, rels=None):
+        """
+        Ids and distances of the ``k`` entities closest to each query,
+        re-ranked with the entity vectors of the queries' relations ``rels``.
+        """
+        queries = np.atleast_2d(queries).astype(np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        dist = np.full((len(queries), k), np.inf, dtype=np.float32)
+        for i, lists in enumerate(self._probe(queries, nprobe)):
+            slots = np.concatenate(
+                [np.arange(self.offsets[c], self.offsets[c + 1]) for c in lists]
+            )
+            if self.codes is not None:
+                slots = self._shortlist(queries[i], slots, rerank or 8 * k)
+            candidates = self.ids[slots]
+            d = distances(
+                self.kind,
+                self.p_norm,
+                queries[i : i + 1],
+                self.candidate_vectors(candidates, rels, i),
+            )[0]
+            top = np.argsort(d)[:k]
+            ids[i, : len(top)] = candidates[top]
+            dist[i, : len(top)] = d[top]
+        return ids, dist
+
+    def _shortlist(self, query, slots, n):
+        sub = self.vectors.shape[1] // self.pq_m
+        # squared L2 from every sub-vector of the query to every code
+        tables = np.stack(
+            [
+                ((self.codebooks[m] - query[m * sub : (m + 1) * sub]) ** 2).sum(1)
+                for m in range(self.pq_m)
+            ]
+        )
+        approx = tables[np.arange(self.pq_m), self.codes[slots]].sum(1)
+        if len(slots) <= n:
+            return slots
+        return slots[np.argpartition(approx, n)[:n]]
+
+    def candidate_vectors(self, candidates, rels, i):
+        # the vectors the model scores query i against
+        if rels is None or "stack" not in self.embeddings:
+            return self.vectors[candidates]
+        return relation_vectors(self.embeddings, candidates, rels[i])
+
+    def search_exact(self, queries, k=10, batch_size=8, rels=None):
+        """
+        Brute-force top-k, the reference for recall: the model's own
+        ranking when the queries' relations ``rels`` are given.
+        """
+        queries = np.atleast_2d(queries).astype(np.float32)
+        k = min(k, len(self.vectors))
+        ids = np.empty((len(queries), k), dtype=np.int64)
+        dist = np.empty((len(queries), k), dtype=np.float32)
+        if rels is None or "stack" not in self.embeddings:
+            groups = [(None, np.arange(len(queries)))]
+        else:
+            rels = np.asarray(rels)
+            groups = [(r, np.flatnonzero(rels == r)) for r in np.unique(rels)]
+        everyone = np.arange(len(self.vectors))
+        for rel, rows in groups:
+            # one table per relation, shared by its queries
+            vectors = self.candidate_vectors(everyone, [rel], 0)
+            for lef in range(0, len(rows), batch_size):
+                batch = rows[lef : lef + batch_size]
+                d = distances(self.kind, self.p_norm, queries[batch], vectors)
+                top = np.argpartition(d, k - 1, axis=1)[:, :k]
+                order = np.argsort(np.take_along_axis(d, top, 1), axis=1)
+                ids[batch] = np.take_along_axis(top, order, 1)
+                dist[batch] = np.take_along_axis(d, ids[batch], 1)
+        return ids, dist
+
+    def query(self, ent, rel, mode="tail_batch", k=10, nprobe=8, rerank=None):
+        """Answer (ent, rel, ?) or (?, rel, ent) queries, batched."""
+        ent, rel = np.atleast_1d(ent), np.atleast_1d(rel)
+        queries = query_vectors(self.embeddings, ent, rel, mode)
+        return self.search(queries, k, nprobe, rerank, rels=rel)
+
+    def save(self, path):
+        arrays = {
+            "ent": self.vectors,
+            "rel": self.embeddings["rel"],
+            "centroids": self.centroids,
+            "ids": self.ids,
+            "offsets": self.offsets,
+        }
+        if self.codes is not None:
+            arrays["codes"] = self.codes
+            arrays["codebooks"] = self.codebooks
+        for name in ("stack", "logits", "gate"):
+            if name in self.embeddings:
+                arrays[name] = self.embeddings[name]
+        meta = {
+            "kind": self.kind,
+            "p_norm": self.p_norm,
+            "nlist": self.nlist,
+            "pq_m": self.pq_m,
+        }
+        np.savez(path, meta=json.dumps(meta), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        meta = json.loads(str(data["meta"]))
+        embeddings = {
+            "ent": data["ent"],
+            "rel": data["rel"],
+            "kind": meta["kind"],
+            "p_norm": meta["p_norm"],
+        }
+        for name in ("stack", "logits", "gate"):
+            if name in data:
+                embeddings[name] = data[name]
+        index = cls(embeddings, nlist=meta["nlist"], pq_m=meta["pq_m"])
+        index.centroids = data["centroids"]
+        index.ids = data["ids"]
+        index.offsets = data["offsets"]
+        if "codes" in data:
+            index.codes = data["codes"]
+            index.codebooks = data["codebooks"]
+        return index
@@ -0,0 +1,21 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from .EntityIndex import (
+    EntityIndex,
+    export_embeddings,
+    query_vectors,
+    relation_vectors,
+    pairwise_distances,
+    vector_norms,
+)
+
+__all__ = [
+    "EntityIndex",
+    "export_embeddings",
+    "query_vectors",
+    "relation_vectors",
+    "pairwise_distances",
+    "vector_norms",
+]
@@ -3,6 +3,7 @@ import torch.nn as nn
 import os
 import json
 import numpy as np
+from .SlimCheckpoint import save_slim, load_slim
 
 
 class BaseModule(nn.Module):
@@ -21,6 +22,22 @@ class BaseModule(nn.Module):
     def save_checkpoint(self, path):
         torch.save(self.state_dict(), path)
 
+    def load_slim_checkpoint(
+        self, path, mmap=True, verify=True, frozen_dir=None, verify_hash=False
+    ):
+        load_slim(
+            self,
+            path,
+            mmap=mmap,
+            verify=verify,
+            frozen_dir=frozen_dir,
+            verify_hash=verify_hash,
+        )
+        self.eval()
+
+    def save_slim_checkpoint(self, path, frozen_dir=None):
+        save_slim(self, path, frozen_dir=frozen_dir)
+
     def load_parameters(self, path):
         f = open(path, "r")
         parameters = json.loads(f.read())
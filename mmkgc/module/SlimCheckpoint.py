@@ -0,0 +1,169 @@
+# coding:utf-8
+import os
+import json
+import struct
+import hashlib
+import weakref
+import numpy as np
+import torch
+
+MAGIC = b"MMKGSLIM"
+ALIGN = 64
+
+# id(tensor) -> (weakref, _version, sha256) so unchanged tables hash once
+_hashes = {}
+
+
+def tensor_hash(tensor):
+    """sha256 of the bytes of ``tensor``, cached until it is modified in place."""
+    cached = _hashes.get(id(tensor))
+    if cached is not None and cached[0]() is tensor and cached[1] == tensor._version:
+        return cached[2]
+    data = tensor.detach().cpu().contiguous().view(-1).view(torch.uint8).numpy()
+    digest = hashlib.sha256(data).hexdigest()
+    key = id(tensor)
+    ref = weakref.ref(tensor, lambda _: _hashes.pop(key, None))
+    _hashes[key] = (ref, tensor._version, digest)
+    return digest
+
+
+def _frozen(module, frozen_bytes):
+    # buffers and requires_grad=False parameters big enough to be worth a hash
+    trainable = {n for n, p in module.named_parameters() if p.requires_grad}
+    return {
+        name
+        for name, tensor in module.state_dict(keep_vars=True).items()
+        if name not in trainable
+        and tensor.numel() * tensor.element_size() >= frozen_bytes
+    }
+
+
+def _dtype_name(dtype):
+    return str(dtype).replace("torch.", "")
+
+
+def _write(path, header, tensors):
+    # MAGIC, header length, json header, then every tensor at an ALIGN offset
+    offset = 0
+    for entry, tensor in zip(header["tensors"].values(), tensors):
+        offset += -offset % ALIGN
+        entry["offset"] = offset
+        offset += tensor.numel() * tensor.element_size()
+    meta = json.dumps(header).encode()
+    start = len(MAGIC) + 8 + len(meta)
+    start += -start % ALIGN
+    with open(path + ".tmp", "wb") as f:
+        f.write(MAGIC + struct.pack("<Q", start - len(MAGIC) - 8) + meta)
+        for entry, tensor in zip(header["tensors"].values(), tensors):
+            f.write(b"\0" * (start + entry["offset"] - f.tell()))
+            data = tensor.detach().cpu().contiguous().view(-1).view(torch.uint8)
+            f.write(memoryview(data.numpy()))
+    os.replace(path + ".tmp", path)
+
+
+def _read(path, mmap=True):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a slim checkpoint".format(path))
+        (size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(size).rstrip(b"\0"))
+        start = len(MAGIC) + 8 + size
+    if mmap:
+        # copy-on-write pages: nothing is read until a tensor is touched
+        buffer = np.memmap(path, dtype=np.uint8, mode="c")
+    else:
+        buffer = np.fromfile(path, dtype=np.uint8)
+    tensors = {}
+    for name, entry in header["tensors"].items():
+        dtype = getattr(torch, entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        tensor = torch.frombuffer(
+            buffer, dtype=dtype, count=count, offset=start + entry["offset"]
+        )
+        tensors[name] = tensor.view(entry["shape"])
+    return header, tensors
+
+
+def save_slim(module, path, frozen_dir=None, frozen_bytes=1 << 20):
+    """
+    Write the state of ``module`` to ``path`` as a slim checkpoint.
+
+    Frozen tables (buffers and requires_grad=False parameters of at least
+    ``frozen_bytes``, e.g. the modality features) are not written but
+    referenced by the sha256 of their contents; with ``frozen_dir`` each
+    is also stored there once, as <sha256>.bin, for processes that do not
+    build them. Everything else goes to one flat file with every tensor
+    at a 64-byte aligned offset, replaced atomically.
+    """
+    state = module.state_dict(keep_vars=True)
+    frozen = _frozen(module, frozen_bytes)
+    header = {"tensors": {}, "frozen": {}}
+    tensors = []
+    for name, tensor in state.items():
+        entry = {"dtype": _dtype_name(tensor.dtype), "shape": list(tensor.shape)}
+        if name in frozen:
+            entry["sha256"] = tensor_hash(tensor)
+            header["frozen"][name] = entry
+            if frozen_dir is not None:
+                table = os.path.join(frozen_dir, entry["sha256"] + ".bin")
+                if not os.path.exists(table):
+                    os.makedirs(frozen_dir, exist_ok=True)
+                    _write(table, {"tensors": {name: dict(entry)}}, [tensor])
+        else:
+            header["tensors"][name] = entry
+            tensors.append(tensor)
+    _write(path, header, tensors)
+    return header
+
+
+def load_slim(module, path, mmap=True, verify=True, frozen_dir=None, verify_hash=False):
+    """
+    Load a slim checkpoint into ``module``.
+
+    With ``mmap`` the parameters are assigned as views of the mapped file
+    (on the CPU), so loading costs no copy and pages are read on first
+    use; otherwise they are copied into the module's tensors. With
+    ``verify`` the shape and dtype of every frozen table of the module are
+    compared to the checkpoint header, and with ``verify_hash`` its
+    contents are hashed and compared as well (a full read of the table);
+    a mismatching table is taken from ``frozen_dir`` when it holds that
+    content, and is an error otherwise.
+    """
+    header, tensors = _read(path, mmap)
+    state = module.state_dict(keep_vars=True)
+    for name, entry in header["frozen"].items():
+        if name not in state:
+            raise ValueError(
+                "{} has no frozen table {}".format(type(module).__name__, name)
+            )
+        tensor = state[name]
+        if verify and (
+            list(tensor.shape) != entry["shape"]
+            or _dtype_name(tensor.dtype) != entry["dtype"]
+        ):
+            reason = "{} {} instead of {} {}".format(
+                _dtype_name(tensor.dtype),
+                list(tensor.shape),
+                entry["dtype"],
+                entry["shape"],
+            )
+        elif verify_hash and tensor_hash(tensor) != entry["sha256"]:
+            reason = "other contents"
+        else:
+            continue
+        table = os.path.join(frozen_dir or "", entry["sha256"] + ".bin")
+        if frozen_dir is None or not os.path.exists(table):
+            raise ValueError(
+                "{} differs from the table the checkpoint was trained with "
+                "({}): {}".format(name, entry["sha256"], reason)
+            )
+        tensors[name] = next(iter(_read(table, mmap)[1].values()))
+    missing, unexpected = module.load_state_dict(tensors, strict=False, assign=mmap)
+    missing = [name for name in missing if name not in header["frozen"]]
+    if missing or unexpected:
+        raise RuntimeError(
+            "Error(s) in loading {}: missing {}, unexpected {}".format(
+                path, missing, unexpected
+            )
+        )
+    return header
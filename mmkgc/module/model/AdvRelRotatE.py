@@ -2,10 +2,16 @@ import torch
 import torch.autograd as autograd
 import torch.nn as nn
 from .Model import Model
+from .ShardedEmbedding import ShardedEmbedding
+from ...feature import feature_embedding
 
 
 class AdvRelRotatE(Model):
 
+    # the discriminator head of WCGTrainerMLP, forward never calls it
+    unused_in_forward = ("adv_scores",)
+    relation_tables = ("rel_embeddings", "rel_gate")
+
     def __init__(
         self,
         ent_tot,
@@ -15,6 +21,9 @@ class AdvRelRotatE(Model):
         epsilon=2.0,
         img_emb=None,
         text_emb=None,
+        feature_dtype="fp32",
+        sparse=False,
+        sharded=False,
     ):
 
         super(AdvRelRotatE, self).__init__(ent_tot, rel_tot)
@@ -24,20 +33,21 @@ class AdvRelRotatE(Model):
         self.epsilon = epsilon
         self.dim_e = dim * 2
         self.dim_r = dim
-        self.ent_embeddings = nn.Embedding(self.ent_tot, self.dim_e)
-        self.rel_embeddings = nn.Embedding(self.rel_tot, self.dim_r)
+        if sharded:
+            self.ent_embeddings = ShardedEmbedding(
+                self.ent_tot, self.dim_e, sparse=sparse
+            )
+        else:
+            self.ent_embeddings = nn.Embedding(self.ent_tot, self.dim_e, sparse=sparse)
+        self.rel_embeddings = nn.Embedding(self.rel_tot, self.dim_r, sparse=sparse)
         self.ent_embedding_range = nn.Parameter(
             torch.Tensor([(self.margin + self.epsilon) / self.dim_e]),
             requires_grad=False,
         )
         self.img_dim = img_emb.shape[1]
         self.text_dim = text_emb.shape[1]
-        self.img_embeddings = nn.Embedding.from_pretrained(img_emb).requires_grad_(
-            False
-        )
-        self.text_embeddings = nn.Embedding.from_pretrained(text_emb).requires_grad_(
-            False
-        )
+        self.img_embeddings = feature_embedding(img_emb, dtype=feature_dtype)
+        self.text_embeddings = feature_embedding(text_emb, dtype=feature_dtype)
         # self.img_proj = nn.Linear(self.img_dim, self.dim_e)
         # self.text_proj = nn.Linear(self.text_dim, self.dim_e)
         self.img_proj = nn.Sequential(
@@ -80,6 +90,8 @@ class AdvRelRotatE(Model):
         self.adv_scores = nn.Sequential(
             nn.Linear(self.dim_e, self.dim_e), nn.ReLU(), nn.Linear(self.dim_e, 1)
         )
+        # fitted by fit_structure_map for inductive_entities
+        self.structure_map = None
 
     def gated_fusion(self, emb, rel):
         # emb: batch_size x dim
@@ -197,6 +209,119 @@ class AdvRelRotatE(Model):
             self.text_proj(self.text_embeddings(data)),
         )
 
+    def project_features(self, img, text, batch_size=4096):
+        """Map raw modality features of entities to dim_e, chunk by chunk."""
+        img_rows, text_rows = [], []
+        device = self.ent_embedding_range.device
+        for lef in range(0, len(img), batch_size):
+            img_rows.append(
+                self.img_proj(img[lef : lef + batch_size].float().to(device))
+            )
+            text_rows.append(
+                self.text_proj(text[lef : lef + batch_size].float().to(device))
+            )
+        return torch.cat(img_rows), torch.cat(text_rows)
+
+    def fit_structure_map(self, ridge=1.0, batch_size=4096):
+        """
+        Ridge regression from the projected modality features of the trained
+        entities to their structural vectors, the feature-only estimate of
+        the structural vector of an unseen entity.
+        """
+        device = self.ent_embedding_range.device
+        gram, moment = None, None
+        with torch.no_grad():
+            for lef in range(0, self.ent_tot, batch_size):
+                batch = torch.arange(
+                    lef, min(lef + batch_size, self.ent_tot), device=device
+                )
+                es, ev, et = self.get_batch_ent_multimodal_embs(batch)
+                x = torch.cat((ev, et, torch.ones_like(ev[:, :1])), dim=1).double()
+                if gram is None:
+                    gram = torch.zeros(
+                        x.shape[1], x.shape[1], dtype=x.dtype, device=device
+                    )
+                    moment = torch.zeros(
+                        x.shape[1], es.shape[1], dtype=x.dtype, device=device
+                    )
+                gram += x.t() @ x
+                moment += x.t() @ es.double()
+            gram += ridge * torch.eye(gram.shape[0], dtype=gram.dtype, device=device)
+            self.structure_map = torch.linalg.solve(gram, moment).float()
+        return self.structure_map
+
+    def inductive_entities(
+        self, img, text, neighbours=None, steps=100, lr=0.01, prior=1.0, batch_size=4096
+    ):
+        """
+        Embed entities that are not in ``ent_embeddings`` from their raw
+        image and text features, without resizing the model. The structural
+        vector is the fit_structure_map estimate; with ``neighbours``, (h, t,
+        r) triples where new entity i has id ent_tot + i and the other end is
+        a known entity, it is refined by a local solve that pulls the new
+        vectors towards their triples, all new entities at once, with an L2
+        prior towards the estimate. Returns the dict used by lookup.
+        """
+        with torch.no_grad():
+            ev, et = self.project_features(img, text, batch_size)
+            if self.structure_map is None:
+                self.fit_structure_map(batch_size=batch_size)
+            x = torch.cat((ev, et, torch.ones_like(ev[:, :1])), dim=1)
+            es = x @ self.structure_map
+        new = {"ent": es, "img": ev, "text": et}
+        if neighbours is None or len(neighbours) == 0:
+            return new
+        neighbours = torch.as_tensor(neighbours, dtype=torch.long, device=es.device)
+        estimate = es
+        es = es.clone().requires_grad_(True)
+        optimizer = torch.optim.Adam([es], lr=lr)
+        for _ in range(steps):
+            new["ent"] = es
+            score = self.forward_inductive(
+                {
+                    "batch_h": neighbours[:, 0],
+                    "batch_t": neighbours[:, 1],
+                    "batch_r": neighbours[:, 2],
+                    "mode": "normal",
+                },
+                new,
+            )
+            loss = -score.sum() + prior * ((es - estimate) ** 2).sum()
+            # only the new vectors are solved for, the model gets no gradients
+            (es.grad,) = autograd.grad(loss, [es])
+            optimizer.step()
+        new["ent"] = es.detach()
+        return new
+
+    def lookup(self, batch, new=None):
+        """
+        Structural, image and text vectors of ``batch``; ids from ent_tot on
+        are the entities of ``new`` (see inductive_entities).
+        """
+        if new is None:
+            return self.get_batch_ent_multimodal_embs(batch)
+        known = (batch < self.ent_tot).unsqueeze(-1)
+        embs = self.get_batch_ent_multimodal_embs(batch.clamp(max=self.ent_tot - 1))
+        index = (batch - self.ent_tot).clamp(min=0)
+        return tuple(
+            torch.where(known, emb, new[key][index])
+            for emb, key in zip(embs, ("ent", "img", "text"))
+        )
+
+    def forward_inductive(self, data, new):
+        batch_r = data["batch_r"]
+        h, h_img_emb, h_text_emb = self.lookup(data["batch_h"], new)
+        t, t_img_emb, t_text_emb = self.lookup(data["batch_t"], new)
+        r = self.rel_embeddings(batch_r)
+        rg = self.rel_gate(batch_r)
+        h_joint = self.get_joint_embeddings(h, h_img_emb, h_text_emb, rg)
+        t_joint = self.get_joint_embeddings(t, t_img_emb, t_text_emb, rg)
+        return self.margin - self._calc(h_joint, t_joint, r, data["mode"])
+
+    def predict_inductive(self, data, new):
+        score = -self.forward_inductive(data, new)
+        return score.cpu().data.numpy()
+
     def get_fake_score(
         self,
         batch_h,
@@ -2,10 +2,13 @@ import torch
 import torch.autograd as autograd
 import torch.nn as nn
 from .Model import Model
+from ...feature import FrozenEmbedding
 
 
 class AdvRelRotatEDB15K(Model):
 
+    relation_tables = ("rel_embeddings", "rel_gate")
+
     def __init__(
         self,
         ent_tot,
@@ -16,6 +19,8 @@ class AdvRelRotatEDB15K(Model):
         img_emb=None,
         text_emb=None,
         numeric_emb=None,
+        feature_dtype="fp32",
+        sparse=False,
     ):
 
         super(AdvRelRotatEDB15K, self).__init__(ent_tot, rel_tot)
@@ -25,8 +30,8 @@ class AdvRelRotatEDB15K(Model):
         self.epsilon = epsilon
         self.dim_e = dim * 2
         self.dim_r = dim
-        self.ent_embeddings = nn.Embedding(self.ent_tot, self.dim_e)
-        self.rel_embeddings = nn.Embedding(self.rel_tot, self.dim_r)
+        self.ent_embeddings = nn.Embedding(self.ent_tot, self.dim_e, sparse=sparse)
+        self.rel_embeddings = nn.Embedding(self.rel_tot, self.dim_r, sparse=sparse)
         self.ent_embedding_range = nn.Parameter(
             torch.Tensor([(self.margin + self.epsilon) / self.dim_e]),
             requires_grad=False,
@@ -47,15 +52,11 @@ class AdvRelRotatEDB15K(Model):
         numeric_emb = txt_pool(numeric_emb.view(-1, 12, 64))
         numeric_emb = numeric_emb.view(numeric_emb.size(0), -1)
 
-        self.img_embeddings = nn.Embedding.from_pretrained(img_emb).requires_grad_(
-            False
-        )
+        self.img_embeddings = FrozenEmbedding(img_emb, dtype=feature_dtype)
         self.text_embeddings = nn.Embedding.from_pretrained(text_emb).requires_grad_(
             True
         )
-        self.numeric_embeddings = nn.Embedding.from_pretrained(
-            numeric_emb
-        ).requires_grad_(False)
+        self.numeric_embeddings = FrozenEmbedding(numeric_emb, dtype=feature_dtype)
 
         # Old setting: 1-layer fc
         # self.img_proj = nn.Linear(self.img_dim, self.dim_e)
@@ -2,10 +2,13 @@ import torch
 import torch.autograd as autograd
 import torch.nn as nn
 from .Model import Model
+from ...feature import feature_embedding
 
 
 class AdvRelRotatEKuai16K(Model):
 
+    relation_tables = ("rel_embeddings", "rel_gate")
+
     def __init__(
         self,
         ent_tot,
@@ -17,6 +20,8 @@ class AdvRelRotatEKuai16K(Model):
         text_emb=None,
         audio_emb=None,
         video_emb=None,
+        feature_dtype="fp32",
+        sparse=False,
     ):
 
         super(AdvRelRotatEKuai16K, self).__init__(ent_tot, rel_tot)
@@ -26,8 +31,8 @@ class AdvRelRotatEKuai16K(Model):
         self.epsilon = epsilon
         self.dim_e = dim * 2
         self.dim_r = dim
-        self.ent_embeddings = nn.Embedding(self.ent_tot, self.dim_e)
-        self.rel_embeddings = nn.Embedding(self.rel_tot, self.dim_r)
+        self.ent_embeddings = nn.Embedding(self.ent_tot, self.dim_e, sparse=sparse)
+        self.rel_embeddings = nn.Embedding(self.rel_tot, self.dim_r, sparse=sparse)
         self.ent_embedding_range = nn.Parameter(
             torch.Tensor([(self.margin + self.epsilon) / self.dim_e]),
             requires_grad=False,
@@ -35,18 +40,10 @@ class AdvRelRotatEKuai16K(Model):
         self.img_dim = img_emb.shape[1]
         self.text_dim = text_emb.shape[1]
 
-        self.img_embeddings = nn.Embedding.from_pretrained(img_emb).requires_grad_(
-            False
-        )
-        self.text_embeddings = nn.Embedding.from_pretrained(text_emb).requires_grad_(
-            False
-        )
-        self.audio_embeddings = nn.Embedding.from_pretrained(audio_emb).requires_grad_(
-            False
-        )
-        self.video_embeddings = nn.Embedding.from_pretrained(video_emb).requires_grad_(
-            False
-        )
+        self.img_embeddings = feature_embedding(img_emb, dtype=feature_dtype)
+        self.text_embeddings = feature_embedding(text_emb, dtype=feature_dtype)
+        self.audio_embeddings = feature_embedding(audio_emb, dtype=feature_dtype)
+        self.video_embeddings = feature_embedding(video_emb, dtype=feature_dtype)
 
         # self.img_proj = nn.Linear(self.img_dim, self.dim_e)
         # self.text_proj = nn.Linear(self.text_dim, self.dim_e)
@@ -1,10 +1,18 @@
+import os
 import torch
 import torch.nn as nn
 from ..BaseModule import BaseModule
+from ...feature import FrozenEmbedding
+from ...data import id_map, read_ids
 
 
 class Model(BaseModule):
 
+	# tables indexed by relation id, the others are indexed by entity id
+	relation_tables = ("rel_embeddings",)
+	# trainable entity tables; the other entity tables hold modality features
+	entity_tables = ("ent_embeddings",)
+
 	def __init__(self, ent_tot, rel_tot):
 		super(Model, self).__init__()
 		self.ent_tot = ent_tot
@@ -15,3 +23,140 @@ class Model(BaseModule):
 	
 	def predict(self):
 		raise NotImplementedError
+
+	def _init_bound(self, name, weight):
+		# the range the table was initialized from, else its current extent
+		for attr in (name.split("_")[0] + "_embedding_range", "embedding_range"):
+			if name.endswith("_embeddings") and hasattr(self, attr):
+				return getattr(self, attr).item()
+		return weight.abs().max().item()
+
+	def _id_kinds(self):
+		# {module name: "rel" or "ent"} of every lookup table
+		return {
+			name: "rel" if name in self.relation_tables else "ent"
+			for name, module in self.named_modules()
+			if hasattr(module, "num_embeddings") and module is not self
+		}
+
+	def grow(self, ent_tot=None, rel_tot=None, features=None):
+		"""
+		Extend every table indexed by entity or relation id to ``ent_tot`` /
+		``rel_tot`` rows for incrementally added triples, keeping the trained
+		rows. The new rows of the trainable entity_tables and relation_tables
+		are drawn from the table's init range, modality tables (frozen or
+		trainable) take them from ``features`` ({module name: rows}). The
+		optimizer has to be rebuilt afterwards.
+		"""
+		ent_tot = ent_tot or self.ent_tot
+		rel_tot = rel_tot or self.rel_tot
+		features = features or {}
+		# new rows of every table, checked before anything is replaced
+		grown = []
+		modules = dict(self.named_modules())
+		for name, kind in self._id_kinds().items():
+			module = modules[name]
+			num = module.num_embeddings
+			total = rel_tot if kind == "rel" else ent_tot
+			# a table of another size (a resident partition) is not grown
+			if num != (self.rel_tot if kind == "rel" else self.ent_tot) or total <= num:
+				continue
+			if not isinstance(module, (nn.Embedding, FrozenEmbedding)):
+				raise ValueError("{} cannot grow".format(name))
+			if name in features:
+				rows = torch.as_tensor(features[name], dtype=torch.float32)
+				if rows.shape != (total - num, module.embedding_dim):
+					raise ValueError("Expected {} new rows of dim {} for {}".format(total - num, module.embedding_dim, name))
+			elif name in self.entity_tables + self.relation_tables and module.weight.requires_grad:
+				bound = self._init_bound(name, module.weight.data)
+				rows = torch.empty(total - num, module.embedding_dim).uniform_(-bound, bound)
+			else:
+				raise ValueError("No features given for the new rows of {}".format(name))
+			grown.append((name, module, rows))
+		for name, module, rows in grown:
+			if isinstance(module, FrozenEmbedding):
+				module.extend(rows)
+				continue
+			weight = module.weight.data
+			table = nn.Embedding(weight.shape[0] + len(rows), module.embedding_dim, sparse=module.sparse)
+			table.weight.data = torch.cat((weight, rows.to(weight)))
+			table.weight.requires_grad_(module.weight.requires_grad)
+			parent = self
+			path = name.split(".")
+			for attr in path[:-1]:
+				parent = getattr(parent, attr)
+			setattr(parent, path[-1], table)
+		self.ent_tot = ent_tot
+		self.rel_tot = rel_tot
+
+	def warm_start(self, path, old_path, new_path, triples=None):
+		"""
+		Initialize from a checkpoint trained on another version of the dataset.
+		``old_path`` / ``new_path`` hold the entity2id.txt and relation2id.txt
+		of the two versions, the rows of every entity and relation table
+		(structural, rel_gate, modality) are copied by name, the other
+		parameters as they are. Unseen ids keep the fresh init; with the new
+		training ``triples`` (h, t, r), an unseen entity linked to known ones
+		starts from the mean of their rows instead.
+		"""
+		maps = {
+			"ent": id_map(os.path.join(old_path, "entity2id.txt"), os.path.join(new_path, "entity2id.txt")),
+			"rel": id_map(os.path.join(old_path, "relation2id.txt"), os.path.join(new_path, "relation2id.txt")),
+		}
+		old_ent_tot = len(read_ids(os.path.join(old_path, "entity2id.txt")))
+		old_rel_tot = len(read_ids(os.path.join(old_path, "relation2id.txt")))
+		old_tot = {"ent": old_ent_tot, "rel": old_rel_tot}
+		new_tot = {"ent": self.ent_tot, "rel": self.rel_tot}
+		checkpoint = torch.load(path, map_location="cpu")
+		state = self.state_dict()
+		if not all(key in checkpoint for key in state):
+			# save_steps checkpoints hold the strategy: model.* and loss.*
+			checkpoint = {
+				key[len("model."):]: tensor
+				for key, tensor in checkpoint.items()
+				if key.startswith("model.")
+			}
+		kinds = self._id_kinds()
+		skipped = []
+		with torch.no_grad():
+			for key, value in state.items():
+				old = checkpoint.get(key)
+				if old is None or old.dtype != value.dtype or old.dim() != value.dim():
+					skipped.append(key)
+					continue
+				kind = kinds.get(key.rsplit(".", 1)[0])
+				if kind is not None and value.dim() > 0 and value.shape[0] == new_tot[kind] and old.shape[0] == old_tot[kind] and old.shape[1:] == value.shape[1:]:
+					new_ids, old_ids = maps[kind]
+					value[torch.from_numpy(new_ids).to(value.device)] = old[torch.from_numpy(old_ids)].to(value.device)
+				elif old.shape == value.shape:
+					value.copy_(old)
+				else:
+					skipped.append(key)
+			if len(skipped) == len(state):
+				raise ValueError("No tensor of {} matches the model".format(path))
+			if triples is not None:
+				self._init_from_neighbours(maps["ent"][0], triples)
+		return {
+			"entities": len(maps["ent"][0]),
+			"relations": len(maps["rel"][0]),
+			"skipped": skipped,
+		}
+
+	def _init_from_neighbours(self, known, triples):
+		triples = torch.as_tensor(triples, dtype=torch.long).reshape(-1, 3)
+		seen = torch.zeros(self.ent_tot, dtype=torch.bool)
+		seen[torch.as_tensor(known, dtype=torch.long)] = True
+		h, t = triples[:, 0], triples[:, 1]
+		# every unseen endpoint of a triple whose other endpoint is known
+		target = torch.cat((h[~seen[h] & seen[t]], t[seen[h] & ~seen[t]]))
+		source = torch.cat((t[~seen[h] & seen[t]], h[seen[h] & ~seen[t]]))
+		count = torch.bincount(target, minlength=self.ent_tot)
+		rows = count > 0
+		kinds = self._id_kinds()
+		for name, param in self.named_parameters():
+			if not param.requires_grad or param.dim() != 2 or param.shape[0] != self.ent_tot or kinds.get(name.rsplit(".", 1)[0]) != "ent":
+				continue
+			device = param.device
+			total = torch.zeros_like(param)
+			total.index_add_(0, target.to(device), param[source.to(device)])
+			param[rows.to(device)] = total[rows.to(device)] / count[rows].unsqueeze(1).to(param)
@@ -8,6 +8,8 @@ import torch.nn.functional as F
 
 class QEB(Model):
 
+    relation_tables = ("rel_embeddings", "rel_embeddings_mm")
+
     def __init__(
         self,
         ent_tot,
@@ -4,6 +4,10 @@ import torch.nn.functional as F
 from .Model import Model
 
 class RSME(Model):
+
+    relation_tables = ("rel_re_embeddings", "rel_im_embeddings")
+    entity_tables = ("ent_re_embeddings", "ent_im_embeddings")
+
     def __init__(self, ent_tot, rel_tot, dim=128, img_dim=768, img_emb=None):
         super(RSME, self).__init__(ent_tot, rel_tot)
 
@@ -2,10 +2,11 @@ import torch
 import torch.autograd as autograd
 import torch.nn as nn
 from .Model import Model
+from .ShardedEmbedding import ShardedEmbedding
 
 class RotatE(Model):
 
-	def __init__(self, ent_tot, rel_tot, dim = 100, margin = 6.0, epsilon = 2.0):
+	def __init__(self, ent_tot, rel_tot, dim = 100, margin = 6.0, epsilon = 2.0, sparse = False, sharded = False):
 		super(RotatE, self).__init__(ent_tot, rel_tot)
 
 		self.margin = margin
@@ -14,8 +15,11 @@ class RotatE(Model):
 		self.dim_e = dim * 2
 		self.dim_r = dim
 
-		self.ent_embeddings = nn.Embedding(self.ent_tot, self.dim_e)
-		self.rel_embeddings = nn.Embedding(self.rel_tot, self.dim_r)
+		if sharded:
+			self.ent_embeddings = ShardedEmbedding(self.ent_tot, self.dim_e, sparse = sparse)
+		else:
+			self.ent_embeddings = nn.Embedding(self.ent_tot, self.dim_e, sparse = sparse)
+		self.rel_embeddings = nn.Embedding(self.rel_tot, self.dim_r, sparse = sparse)
 
 		self.ent_embedding_range = nn.Parameter(
 			torch.Tensor([(self.margin + self.epsilon) / self.dim_e]), 
@@ -0,0 +1,133 @@
+import torch
+import torch.nn as nn
+import torch.distributed as dist
+
+
+def _exchange(tensor, send_counts, recv_counts):
+    out = tensor.new_empty((sum(recv_counts),) + tuple(tensor.shape[1:]))
+    dist.all_to_all_single(out, tensor.contiguous(), recv_counts, send_counts)
+    return out
+
+
+class ShardedLookup(torch.autograd.Function):
+    """
+    Embedding lookup over a table whose row i lives on rank i % world_size.
+
+    The forward pass sends the unique ids to their owners and receives the
+    rows back; the backward pass returns the row gradients to the owners.
+    Both are all-to-all exchanges of only the rows in the batch.
+    """
+
+    @staticmethod
+    def forward(ctx, weight, index, world_size, sparse):
+        ids, inverse = torch.unique(index.reshape(-1), return_inverse=True)
+        owner = ids % world_size
+        order = torch.argsort(owner, stable=True)
+        send_counts = torch.bincount(owner, minlength=world_size)
+        recv_counts = torch.empty_like(send_counts)
+        dist.all_to_all_single(recv_counts, send_counts)
+        send_counts, recv_counts = send_counts.tolist(), recv_counts.tolist()
+
+        requested = _exchange(ids[order], send_counts, recv_counts)
+        local = torch.div(requested, world_size, rounding_mode="floor")
+        rows = _exchange(weight[local], recv_counts, send_counts)
+        out = torch.empty_like(rows)
+        out[order] = rows
+
+        ctx.save_for_backward(local, order, inverse)
+        ctx.counts = (send_counts, recv_counts)
+        ctx.world_size = world_size
+        ctx.sparse = sparse
+        ctx.weight_shape = weight.shape
+        return out[inverse].view(index.shape + (weight.shape[1],))
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        local, order, inverse = ctx.saved_tensors
+        send_counts, recv_counts = ctx.counts
+        dim = ctx.weight_shape[1]
+        grad = grad_output.new_zeros((len(order), dim))
+        grad.index_add_(0, inverse, grad_output.reshape(-1, dim))
+        grad = _exchange(grad[order], send_counts, recv_counts)
+        # every rank trains its own batch, so average like DDP does
+        grad = grad / ctx.world_size
+        if ctx.sparse:
+            grad_weight = torch.sparse_coo_tensor(
+                local.unsqueeze(0), grad, ctx.weight_shape
+            )
+        else:
+            grad_weight = grad.new_zeros(ctx.weight_shape)
+            grad_weight.index_add_(0, local, grad)
+        return grad_weight, None, None, None
+
+
+class ShardedEmbedding(nn.Module):
+    """
+    Model-parallel replacement for nn.Embedding: each of the world_size
+    processes stores (and optimizes) only the rows i with
+    i % world_size == rank. Every rank has to call forward the same number
+    of times, as each call is a collective.
+
+    The process group must be initialized before the layer is built.
+    """
+
+    def __init__(self, num_embeddings, embedding_dim, sparse=False):
+        super(ShardedEmbedding, self).__init__()
+        if dist.is_available() and dist.is_initialized():
+            self.rank, self.world_size = dist.get_rank(), dist.get_world_size()
+        else:
+            self.rank, self.world_size = 0, 1
+        self.num_embeddings = num_embeddings
+        self.embedding_dim = embedding_dim
+        self.sparse = sparse
+        rows = (num_embeddings - self.rank + self.world_size - 1) // self.world_size
+        self.weight = nn.Parameter(torch.empty(rows, embedding_dim))
+        nn.init.normal_(self.weight)
+
+    def forward(self, input):
+        if self.world_size == 1:
+            return nn.functional.embedding(input, self.weight, sparse=self.sparse)
+        return ShardedLookup.apply(self.weight, input, self.world_size, self.sparse)
+
+    def _load_from_state_dict(self, state_dict, prefix, *args, **kwargs):
+        # checkpoints of the full table keep only the rows of this rank
+        key = prefix + "weight"
+        if key in state_dict and state_dict[key].shape[0] == self.num_embeddings:
+            state_dict[key] = state_dict[key][self.rank :: self.world_size]
+        super(ShardedEmbedding, self)._load_from_state_dict(
+            state_dict, prefix, *args, **kwargs
+        )
+
+    def full_weight(self):
+        """Gather the whole table on every rank (a collective)."""
+        if self.world_size == 1:
+            return self.weight.detach().clone()
+        # all_gather needs equal sizes, rank 0 always has the most rows
+        rows = (self.num_embeddings + self.world_size - 1) // self.world_size
+        shard = self.weight.detach().new_zeros((rows, self.embedding_dim))
+        shard[: self.weight.shape[0]] = self.weight.detach()
+        shards = [torch.empty_like(shard) for _ in range(self.world_size)]
+        dist.all_gather(shards, shard)
+        full = shard.new_empty((self.num_embeddings, self.embedding_dim))
+        for rank, shard in enumerate(shards):
+            local = full[rank :: self.world_size]
+            local.copy_(shard[: local.shape[0]])
+        return full
+
+    def extra_repr(self):
+        return "{}, {}, rank={}/{}".format(
+            self.num_embeddings, self.embedding_dim, self.rank, self.world_size
+        )
+
+
+def full_state_dict(model):
+    """
+    state_dict of ``model`` with every ShardedEmbedding replaced by the
+    full table, loadable into the unsharded model (a collective).
+    """
+    state_dict = model.state_dict()
+    for name, module in model.named_modules():
+        if isinstance(module, ShardedEmbedding):
+            prefix = name + "." if name else ""
+            state_dict[prefix + "weight"] = module.full_weight()
+    return state_dict
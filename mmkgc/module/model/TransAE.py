@@ -3,6 +3,7 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from .Model import Model
+from ...feature import load_features
 
 class IMG_Encoder(nn.Module):
     def __init__(self, embedding_dim = 4096, dim = 200, margin = None, epsilon = None, dataset=None):
@@ -19,7 +20,7 @@ class IMG_Encoder(nn.Module):
         self.embedding_dim = embedding_dim
         self.criterion = nn.MSELoss(reduction='mean') 
         self.raw_embedding = nn.Embedding(self.entity_count, self.dim)
-        visual_embs = torch.load("./embeddings/{}-visual.pth".format(dataset))
+        visual_embs = load_features("./embeddings/{}-visual.pth".format(dataset))
         self.visual_embedding = nn.Embedding.from_pretrained(visual_embs)
 
         self.encoder = nn.Sequential(
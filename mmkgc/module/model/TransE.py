@@ -1,12 +1,14 @@
+import math
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from .Model import Model
+from .ShardedEmbedding import ShardedEmbedding
 
 
 class TransE(Model):
 
-    def __init__(self, ent_tot, rel_tot, dim=100, p_norm=1, norm_flag=True, margin=None, epsilon=None):
+    def __init__(self, ent_tot, rel_tot, dim=100, p_norm=1, norm_flag=True, margin=None, epsilon=None, sparse=False, sharded=False):
         super(TransE, self).__init__(ent_tot, rel_tot)
 
         self.dim = dim
@@ -15,11 +17,19 @@ class TransE(Model):
         self.norm_flag = norm_flag
         self.p_norm = p_norm
 
-        self.ent_embeddings = nn.Embedding(self.ent_tot, self.dim)
-        self.rel_embeddings = nn.Embedding(self.rel_tot, self.dim)
+        if sharded:
+            self.ent_embeddings = ShardedEmbedding(self.ent_tot, self.dim, sparse=sparse)
+        else:
+            self.ent_embeddings = nn.Embedding(self.ent_tot, self.dim, sparse=sparse)
+        self.rel_embeddings = nn.Embedding(self.rel_tot, self.dim, sparse=sparse)
 
         if margin == None or epsilon is None:
-            nn.init.xavier_uniform_(self.ent_embeddings.weight.data)
+            if sharded:
+                # xavier bound of the full table, the shard holds only some rows
+                bound = math.sqrt(6.0 / (self.ent_tot + self.dim))
+                nn.init.uniform_(self.ent_embeddings.weight.data, -bound, bound)
+            else:
+                nn.init.xavier_uniform_(self.ent_embeddings.weight.data)
             nn.init.xavier_uniform_(self.rel_embeddings.weight.data)
         else:
             self.embedding_range = nn.Parameter(
@@ -3,6 +3,7 @@ from __future__ import division
 from __future__ import print_function
 
 from .Model import Model
+from .ShardedEmbedding import ShardedEmbedding, full_state_dict
 from .TransE import TransE
 from .RotatE import RotatE
 from .IKRL import IKRL
@@ -18,6 +19,8 @@ from .QEB import QEB
 
 __all__ = [
     "Model",
+    "ShardedEmbedding",
+    "full_state_dict",
     "TransE",
     "RotatE",
     "IKRL",
@@ -0,0 +1,171 @@
+# coding:utf-8
+import os
+import json
+import numpy as np
+import torch
+from ..data.PartitionedGraph import read_count, read_triples
+
+
+def merge_topk(ids, dist, block_ids, block_dist, k):
+    """Fold a block of candidates into a running (B, k) top-k."""
+    ids = torch.cat((ids, block_ids), dim=1)
+    dist = torch.cat((dist, block_dist), dim=1)
+    top = torch.topk(dist, min(k, dist.shape[1]), dim=1, largest=False)
+    return torch.gather(ids, 1, top.indices), top.values
+
+
+class KnownAnswers(object):
+    """
+    The known answers of (ent, rel) queries, from (h, t, r) triples, kept as
+    one sorted key array per direction so a whole block of queries is
+    looked up with two searchsorted calls.
+    """
+
+    def __init__(self, triples, rel_tot):
+        triples = np.asarray(triples, dtype=np.int64)
+        self.rel_tot = rel_tot
+        self.keys, self.answers = {}, {}
+        for mode, ent, answer in (("tail_batch", 0, 1), ("head_batch", 1, 0)):
+            keys = triples[:, ent] * rel_tot + triples[:, 2]
+            order = np.lexsort((triples[:, answer], keys))
+            self.keys[mode] = keys[order]
+            self.answers[mode] = triples[order, answer]
+
+    @classmethod
+    def from_path(cls, in_path, files=("train2id.txt", "valid2id.txt", "test2id.txt")):
+        """The triples of the OpenKE dataset in ``in_path``, like Base.so's _find."""
+        triples = [
+            chunk
+            for name in files
+            if os.path.exists(os.path.join(in_path, name))
+            for chunk in read_triples(os.path.join(in_path, name), 1 << 22)
+        ]
+        return cls(
+            np.concatenate(triples),
+            read_count(os.path.join(in_path, "relation2id.txt")),
+        )
+
+    def lookup(self, ents, rels, mode):
+        """(rows, answers) of every known answer of the queries."""
+        keys = np.asarray(ents, dtype=np.int64) * self.rel_tot + rels
+        lef = np.searchsorted(self.keys[mode], keys, side="left")
+        rig = np.searchsorted(self.keys[mode], keys, side="right")
+        counts = rig - lef
+        rows = np.repeat(np.arange(len(keys)), counts)
+        # positions lef[i] .. rig[i] - 1 for every query i, flattened
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        return rows, self.answers[mode][np.repeat(lef, counts) + offsets]
+
+
+def read_queries(path, shard_size):
+    """
+    Yield the queries of ``path`` shard by shard: an (n, 2) .npy of (ent,
+    rel) rows, read through a memory map, or a train2id-style text file
+    with (ent, rel) or (h, t, r) rows, streamed.
+    """
+    if path.endswith(".npy"):
+        queries = np.load(path, mmap_mode="r")
+        for lef in range(0, len(queries), shard_size):
+            yield np.asarray(queries[lef : lef + shard_size], dtype=np.int64)
+        return
+    for chunk in read_triples(path, shard_size):
+        yield chunk
+
+
+class BulkPredictor(object):
+    """
+    Offline top-k answers of many (ent, rel, ?) or (?, rel, ent) queries.
+
+    The queries are scored ``batch_size`` at a time against blocks of
+    ``chunk_size`` entities, keeping a running top-k, so neither the (Q, E)
+    nor the (batch_size, E) distance matrix is ever built. Known answers
+    (e.g. the train/valid/test triples) can be filtered out. Every shard of
+    ``shard_size`` queries is written to out_dir as shard-NNNNN.ids.npy and
+    shard-NNNNN.distances.npy, then marked with shard-NNNNN.done, so a
+    killed job picks up at the first shard without a marker.
+    """
+
+    def __init__(self, scorer, k=10, batch_size=256, chunk_size=65536, known=None):
+        self.scorer = scorer
+        self.k = min(k, scorer.ent_tot)
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.known = known
+
+    def predict(self, ents, rels, mode="tail_batch"):
+        """
+        Top-k (ids, distances) of one batch of queries, (B, k). The queries
+        are scored one relation group at a time, so a multimodal scorer fuses
+        each relation's entity table once per batch rather than per block.
+        """
+        ents, rels = np.asarray(ents), np.asarray(rels)
+        ids = torch.empty(len(ents), self.k, dtype=torch.long)
+        dist = torch.empty(len(ents), self.k)
+        for _, rows in self.scorer.relation_groups(rels):
+            rows = torch.from_numpy(rows)
+            ids[rows], dist[rows] = self._predict(ents[rows], rels[rows], mode)
+        return ids, dist
+
+    def _predict(self, ents, rels, mode):
+        ids = torch.empty(len(ents), 0, dtype=torch.long)
+        dist = torch.empty(len(ents), 0)
+        if self.known is not None:
+            rows, answers = self.known.lookup(ents, rels, mode)
+        for lef in range(0, self.scorer.ent_tot, self.chunk_size):
+            block = self.scorer.distances(ents, rels, mode, lef, lef + self.chunk_size)
+            if self.known is not None:
+                inside = (answers >= lef) & (answers < lef + block.shape[1])
+                block[rows[inside], answers[inside] - lef] = float("inf")
+            block_ids = torch.arange(lef, lef + block.shape[1]).expand_as(block)
+            ids, dist = merge_topk(ids, dist, block_ids, block, self.k)
+        return ids, dist
+
+    def _check_meta(self, out_dir, meta):
+        path = os.path.join(out_dir, "meta.json")
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                old = json.load(f)
+            if old != meta:
+                raise ValueError(
+                    "{} holds a different job: {} != {}".format(out_dir, old, meta)
+                )
+            return
+        with open(path + ".tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(path + ".tmp", path)
+
+    def run(self, queries_path, out_dir, mode="tail_batch", shard_size=1 << 16):
+        """Predict every query of ``queries_path``; returns the shards written."""
+        os.makedirs(out_dir, exist_ok=True)
+        meta = {
+            "queries": os.path.abspath(queries_path),
+            "mode": mode,
+            "k": self.k,
+            "shard_size": shard_size,
+            "filtered": self.known is not None,
+        }
+        self._check_meta(out_dir, meta)
+        written = 0
+        for shard, queries in enumerate(read_queries(queries_path, shard_size)):
+            name = os.path.join(out_dir, "shard-{:05d}".format(shard))
+            if os.path.exists(name + ".done"):
+                continue
+            # (ent, rel) rows, or the h or t and r of (h, t, r) rows
+            ent = 1 if queries.shape[1] == 3 and mode == "head_batch" else 0
+            ents, rels = queries[:, ent], queries[:, -1]
+            ids = np.empty((len(queries), self.k), dtype=np.int64)
+            dist = np.empty((len(queries), self.k), dtype=np.float32)
+            for lef in range(0, len(queries), self.batch_size):
+                rig = lef + self.batch_size
+                top_ids, top_dist = self.predict(ents[lef:rig], rels[lef:rig], mode)
+                ids[lef:rig] = top_ids.numpy()
+                dist[lef:rig] = top_dist.numpy()
+            for suffix, array in ((".ids.npy", ids), (".distances.npy", dist)):
+                with open(name + suffix + ".tmp", "wb") as f:
+                    np.save(f, array)
+                os.replace(name + suffix + ".tmp", name + suffix)
+            open(name + ".done", "w").close()
+            written += 1
+        return written
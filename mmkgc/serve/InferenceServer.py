@@ -0,0 +1,379 @@
+# coding:utf-8
+import json
+import asyncio
+from collections import OrderedDict
+import numpy as np
+import torch
+from ..index import export_embeddings, pairwise_distances, vector_norms
+
+
+class EntityScorer(object):
+    """
+    Batched link-prediction scoring against resident entity representations.
+
+    The entity vectors are computed once from the model: the structural
+    table for TransE/RotatE, and for the multimodal AdvRelRotatE family the
+    stacked structural, image and text vectors with their attention logits,
+    which are fused per relation (the rel_gate temperature) on demand and
+    kept for the ``cache_relations`` most recent relations.
+
+    With ``types`` (read_type_constrain of the dataset) topk only gathers
+    and scores the relation's candidates from type_constrain.txt.
+    """
+
+    def __init__(self, model, batch_size=4096, cache_relations=8, types=None):
+        model.eval()
+        self.model = model
+        self.types = types
+        embeddings = export_embeddings(model, batch_size)
+        self.kind = embeddings["kind"]
+        self.p_norm = embeddings["p_norm"]
+        self.rel = torch.from_numpy(embeddings["rel"])
+        self.ent = torch.from_numpy(embeddings["ent"])
+        self.ent_tot = len(self.ent)
+        self.rel_tot = len(self.rel)
+        self.multimodal = "stack" in embeddings
+        self.cache_relations = cache_relations
+        self.joint = OrderedDict()
+        if self.multimodal:
+            self.stack = torch.from_numpy(embeddings["stack"])
+            self.logits = torch.from_numpy(embeddings["logits"])
+            self.gate = torch.from_numpy(embeddings["gate"])
+
+    def entities(self, rel):
+        """Entity vectors as scored under relation ``rel``."""
+        if not self.multimodal:
+            return self.ent
+        if rel in self.joint:
+            self.joint.move_to_end(rel)
+            return self.joint[rel]
+        weights = torch.softmax(self.logits / self.gate[rel], dim=-1)
+        joint = torch.sum(weights.unsqueeze(-1) * self.stack, dim=1)
+        self.joint[rel] = joint
+        if len(self.joint) > self.cache_relations:
+            self.joint.popitem(last=False)
+        return joint
+
+    def query_vectors(self, ent, rel, mode):
+        """Targets of (ent, rel, ?) or (?, rel, ent) queries, see query_vectors."""
+        e = ent
+        r = self.rel[rel]
+        if self.kind == "transe":
+            return e + r if mode == "tail_batch" else e - r
+        re_e, im_e = torch.chunk(e, 2, dim=-1)
+        re_r, im_r = torch.chunk(r, 2, dim=-1)
+        if mode != "tail_batch":
+            im_r = -im_r
+        return torch.cat((re_e * re_r - im_e * im_r, re_e * im_r + im_e * re_r), dim=-1)
+
+    def relation_groups(self, rels):
+        """
+        (rel, rows) of the queries that share an entity table: one group for
+        single-table models, one per relation for the multimodal ones.
+        """
+        if not self.multimodal:
+            return [(None, np.arange(len(rels)))]
+        rels = np.asarray(rels)
+        return [(r, np.flatnonzero(rels == r)) for r in np.unique(rels)]
+
+    def distances(self, ents, rels, mode="tail_batch", lef=0, rig=None):
+        """Distances of a batch of queries to the entities lef..rig, (B, rig - lef)."""
+        rig = self.ent_tot if rig is None else min(rig, self.ent_tot)
+        out = torch.empty(len(ents), rig - lef)
+        with torch.no_grad():
+            for rel, rows in self.relation_groups(rels):
+                table = self.entities(rel if rel is not None else 0)
+                index = torch.from_numpy(np.asarray(ents)[rows])
+                queries = self.query_vectors(
+                    table[index], torch.from_numpy(np.asarray(rels)[rows]), mode
+                )
+                out[rows] = pairwise_distances(
+                    self.kind, self.p_norm, queries, table[lef:rig]
+                )
+        return out
+
+    def topk(self, ents, rels, mode="tail_batch", k=10):
+        """Top-k answers of a batch of queries: (ids, distances), (B, k)."""
+        if self.types is not None:
+            return self.topk_constrained(ents, rels, mode, k)
+        top = torch.topk(
+            self.distances(ents, rels, mode), min(k, self.ent_tot), largest=False
+        )
+        return top.indices, top.values
+
+    def topk_constrained(self, ents, rels, mode="tail_batch", k=10):
+        """
+        topk among the type-allowed candidates of each relation; a relation
+        with fewer than k of them pads its rows with id -1 at distance inf.
+        """
+        k = min(k, self.ent_tot)
+        ids = torch.full((len(ents), k), -1, dtype=torch.long)
+        dist = torch.full((len(ents), k), float("inf"))
+        ents, rels = np.asarray(ents), np.asarray(rels)
+        with torch.no_grad():
+            for rel in np.unique(rels):
+                rows = np.flatnonzero(rels == rel)
+                candidates = torch.from_numpy(self.types[mode][rel])
+                table = self.entities(rel)
+                queries = self.query_vectors(
+                    table[torch.from_numpy(ents[rows])],
+                    torch.from_numpy(rels[rows]),
+                    mode,
+                )
+                top = torch.topk(
+                    pairwise_distances(
+                        self.kind, self.p_norm, queries, table[candidates]
+                    ),
+                    min(k, len(candidates)),
+                    largest=False,
+                )
+                rows = torch.from_numpy(rows)[:, None]
+                width = torch.arange(top.indices.shape[1])
+                ids[rows, width] = candidates[top.indices]
+                dist[rows, width] = top.values
+        return ids, dist
+
+    def score(self, heads, rels, tails):
+        """Distances of (h, r, t) triples, lower is more plausible."""
+        out = torch.empty(len(heads))
+        with torch.no_grad():
+            for rel, rows in self.relation_groups(rels):
+                table = self.entities(rel if rel is not None else 0)
+                h = table[torch.from_numpy(np.asarray(heads)[rows])]
+                t = table[torch.from_numpy(np.asarray(tails)[rows])]
+                queries = self.query_vectors(
+                    h, torch.from_numpy(np.asarray(rels)[rows]), "tail_batch"
+                )
+                out[rows] = vector_norms(self.kind, self.p_norm, queries - t)
+        return out
+
+
+class InferenceServer(object):
+    """
+    Asyncio front of an EntityScorer that coalesces concurrent requests.
+
+    Requests wait in a queue until ``max_batch`` of them are pending or the
+    oldest has waited ``max_latency`` seconds; the batch is then scored in
+    one call per request kind in a worker thread, so the event loop keeps
+    accepting requests meanwhile. Malformed requests are rejected before
+    they are queued, and should a batch still fail its requests are
+    retried one by one, so that only the failing ones get the error.
+    """
+
+    def __init__(self, scorer, max_batch=256, max_latency=0.005):
+        self.scorer = scorer
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.queue = None
+        self.task = None
+        self.batches = 0
+        self.requests = 0
+
+    async def start(self):
+        self.queue = asyncio.Queue()
+        self.task = asyncio.ensure_future(self._batcher())
+
+    async def stop(self):
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+
+    async def submit(self, request):
+        """
+        Answer one request: {"h", "r"} for tails, {"r", "t"} for heads, both
+        with an optional "k", or {"h", "r", "t"} for the triple's distance.
+        """
+        self.check(request)
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((request, future))
+        return await future
+
+    def check(self, request):
+        """Raise ValueError unless ``request`` is one submit can answer."""
+        if not isinstance(request, dict):
+            raise ValueError("A request is a JSON object")
+        if "r" not in request or not ("h" in request or "t" in request):
+            raise ValueError('A request needs "r" and "h", "t" or both')
+        totals = {
+            "h": self.scorer.ent_tot,
+            "r": self.scorer.rel_tot,
+            "t": self.scorer.ent_tot,
+        }
+        for key, total in totals.items():
+            value = request.get(key, 0)
+            # bool is an int too, negative ids would index from the end
+            if type(value) is not int or not 0 <= value < total:
+                raise ValueError('"{}" must be an id in [0, {})'.format(key, total))
+        k = request.get("k", 10)
+        if type(k) is not int or k < 1:
+            raise ValueError('"k" must be a positive integer')
+
+    async def _batcher(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                results = await loop.run_in_executor(None, self._run, batch)
+            except Exception:
+                results = await loop.run_in_executor(None, self._run_each, batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def _run_each(self, batch):
+        # a failed batch, request by request: the error stays with its request
+        results = []
+        for item in batch:
+            try:
+                results.append(self._run([item])[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _run(self, batch):
+        results = [None] * len(batch)
+        kinds = {"tail_batch": [], "head_batch": [], "score": []}
+        for i, (request, _) in enumerate(batch):
+            if "h" in request and "t" in request:
+                kinds["score"].append(i)
+            elif "h" in request:
+                kinds["tail_batch"].append(i)
+            else:
+                kinds["head_batch"].append(i)
+        rows = kinds["score"]
+        if rows:
+            scores = self.scorer.score(
+                [batch[i][0]["h"] for i in rows],
+                [batch[i][0]["r"] for i in rows],
+                [batch[i][0]["t"] for i in rows],
+            )
+            for i, score in zip(rows, scores.tolist()):
+                results[i] = {"distance": score}
+        for mode, key in (("tail_batch", "h"), ("head_batch", "t")):
+            rows = kinds[mode]
+            if not rows:
+                continue
+            k = max(batch[i][0].get("k", 10) for i in rows)
+            ids, dist = self.scorer.topk(
+                [batch[i][0][key] for i in rows],
+                [batch[i][0]["r"] for i in rows],
+                mode,
+                k,
+            )
+            for i, row_ids, row_dist in zip(rows, ids.tolist(), dist.tolist()):
+                n = batch[i][0].get("k", 10)
+                results[i] = {"ids": row_ids[:n], "distances": row_dist[:n]}
+        return results
+
+
+async def _handle(server, reader, writer):
+    # minimal HTTP/1.1: POST /predict with a JSON request, one per connection
+    # or several with keep-alive
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            method, _, target = line.decode("latin-1").partition(" ")
+            target = target.partition(" ")[0]
+            length = 0
+            keep_alive = True
+            while True:
+                header = await reader.readline()
+                if header in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = header.decode("latin-1").partition(":")
+                name = name.strip().lower()
+                if name == "content-length":
+                    length = int(value)
+                elif name == "connection":
+                    keep_alive = value.strip().lower() != "close"
+            payload = await reader.readexactly(length)
+            headers = b""
+            if target.split("?")[0] != "/predict":
+                body = json.dumps({"error": "Not found"}).encode()
+                status = b"404 Not Found"
+            elif method != "POST":
+                body = json.dumps({"error": "Method not allowed"}).encode()
+                status = b"405 Method Not Allowed"
+                headers = b"Allow: POST\r\n"
+            else:
+                try:
+                    request = json.loads(payload)
+                    body = json.dumps(await server.submit(request)).encode()
+                    status = b"200 OK"
+                except Exception as e:
+                    body = json.dumps({"error": str(e)}).encode()
+                    status = b"400 Bad Request"
+            writer.write(
+                b"HTTP/1.1 "
+                + status
+                + b"\r\nContent-Type: application/json\r\n"
+                + headers
+                + b"Content-Length: "
+                + str(len(body)).encode()
+                + b"\r\n\r\n"
+                + body
+            )
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def serve_http(server, host="127.0.0.1", port=8000, path=None):
+    """Serve ``server`` over HTTP on host:port, or on the unix socket ``path``."""
+    await server.start()
+    handler = lambda reader, writer: _handle(server, reader, writer)
+    if path is not None:
+        return await asyncio.start_unix_server(handler, path=path)
+    return await asyncio.start_server(handler, host, port)
+
+
+async def http_request(
+    request, host="127.0.0.1", port=8000, path=None, connection=None
+):
+    """
+    Send one request to serve_http and return the decoded answer. Pass a
+    (reader, writer) ``connection`` to reuse it (keep-alive).
+    """
+    if connection is None:
+        if path is not None:
+            connection = await asyncio.open_unix_connection(path)
+        else:
+            connection = await asyncio.open_connection(host, port)
+    reader, writer = connection
+    body = json.dumps(request).encode()
+    writer.write(
+        b"POST /predict HTTP/1.1\r\nContent-Type: application/json\r\n"
+        b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+    )
+    await writer.drain()
+    await reader.readline()
+    length = 0
+    while True:
+        header = await reader.readline()
+        if header in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = header.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    return json.loads(await reader.readexactly(length)), connection
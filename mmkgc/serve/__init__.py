@@ -0,0 +1,17 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from .InferenceServer import EntityScorer, InferenceServer, serve_http, http_request
+from .BulkPredictor import BulkPredictor, KnownAnswers, merge_topk, read_queries
+
+__all__ = [
+    "EntityScorer",
+    "InferenceServer",
+    "serve_http",
+    "http_request",
+    "BulkPredictor",
+    "KnownAnswers",
+    "merge_topk",
+    "read_queries",
+]
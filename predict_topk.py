@@ -0,0 +1,36 @@
+import argparse
+from build_index import load_model
+from mmkgc.serve import BulkPredictor, EntityScorer, KnownAnswers
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-W")
+    arg.add_argument("-model", type=str, default="adv_rotate")
+    arg.add_argument("-checkpoint", type=str, required=True)
+    arg.add_argument("-dim", type=int, default=128)
+    arg.add_argument("-margin", type=float, default=6.0)
+    arg.add_argument("-queries", type=str, required=True)
+    arg.add_argument("-mode", type=str, default="tail_batch")
+    arg.add_argument("-out", type=str, required=True)
+    arg.add_argument("-k", type=int, default=10)
+    arg.add_argument("-filter_flag", type=int, default=1)
+    arg.add_argument("-batch_size", type=int, default=256)
+    arg.add_argument("-chunk_size", type=int, default=65536)
+    arg.add_argument("-shard_size", type=int, default=65536)
+    return arg.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    in_path = "./benchmarks/" + args.dataset + "/"
+    predictor = BulkPredictor(
+        EntityScorer(load_model(args)),
+        k=args.k,
+        batch_size=args.batch_size,
+        chunk_size=args.chunk_size,
+        known=KnownAnswers.from_path(in_path) if args.filter_flag else None,
+    )
+    written = predictor.run(args.queries, args.out, args.mode, args.shard_size)
+    print("{} shards written to {}".format(written, args.out))
@@ -0,0 +1,34 @@
+import json
+import argparse
+from mmkgc.feature import reduce_features
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-W")
+    arg.add_argument("-modalities", type=str, default="visual,textual")
+    arg.add_argument("-method", type=str, default="pca")
+    arg.add_argument("-dims", type=str, default="1024,512,256,128")
+    arg.add_argument("-seed", type=int, default=0)
+    return arg.parse_args()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    for modality in args.modalities.split(","):
+        path = "./embeddings/" + args.dataset + "-" + modality + ".pth"
+        for dim in [int(d) for d in args.dims.split(",")]:
+            out_path = reduce_features(path, dim, method=args.method, seed=args.seed)
+            with open(out_path[:-4] + ".json", "r") as f:
+                meta = json.load(f)
+            print(
+                "{}\t{}\t{} -> {}\texplained variance {}\t{}".format(
+                    args.dataset,
+                    modality,
+                    meta["input_dim"],
+                    dim,
+                    meta["explained_variance"],
+                    out_path,
+                )
+            )
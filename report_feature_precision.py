@@ -0,0 +1,118 @@
+import os
+import argparse
+import torch
+from mmkgc.config import Tester
+from mmkgc.data import TestDataLoader
+from mmkgc.feature import FrozenEmbedding, load_features
+from mmkgc.module.model import AdvRelRotatE, AdvRelRotatEDB15K, AdvRelRotatEKuai16K
+
+# dataset -> (model, [(feature file suffix, model keyword)])
+SETTINGS = {
+    "MKG-W": (AdvRelRotatE, [("visual", "img_emb"), ("textual", "text_emb")]),
+    "MKG-Y": (AdvRelRotatE, [("visual", "img_emb"), ("textual", "text_emb")]),
+    "DB15K": (
+        AdvRelRotatEDB15K,
+        [("visual", "img_emb"), ("textual", "text_emb"), ("numeric", "numeric_emb")],
+    ),
+    "Kuai16K": (
+        AdvRelRotatEKuai16K,
+        [
+            ("visual", "img_emb"),
+            ("textual", "text_emb"),
+            ("audio", "audio_emb"),
+            ("video", "video_emb"),
+        ],
+    ),
+    "TIVA": (
+        AdvRelRotatEKuai16K,
+        [
+            ("visual", "img_emb"),
+            ("textual", "text_emb"),
+            ("audio", "audio_emb"),
+            ("video", "video_emb"),
+        ],
+    ),
+}
+DTYPES = ["fp32", "fp16", "bf16", "int8"]
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-datasets", type=str, default=",".join(SETTINGS))
+    arg.add_argument("-ckpt", type=str, default=None)
+    arg.add_argument("-dim", type=int, default=250)
+    arg.add_argument("-margin", type=float, default=12.0)
+    arg.add_argument("-use_gpu", type=int, default=1)
+    return arg.parse_args()
+
+
+def load_dataset_features(dataset):
+    features = {}
+    for suffix, key in SETTINGS[dataset][1]:
+        path = "./embeddings/{}-{}.pth".format(dataset, suffix)
+        if not os.path.exists(path):
+            return None
+        features[key] = load_features(path)
+    return features
+
+
+def memory_report(dataset, features):
+    for key, emb in features.items():
+        emb = emb.float()
+        base = FrozenEmbedding(emb, "fp32").nbytes()
+        for dtype in DTYPES:
+            table = FrozenEmbedding(emb, dtype)
+            rows = table(torch.arange(emb.shape[0]))
+            err = (rows - emb).norm(dim=1) / emb.norm(dim=1).clamp(min=1e-12)
+            cos = torch.cosine_similarity(rows, emb, dim=1)
+            print(
+                "{}\t{}\t{}\t{:.1f} MB\tsaved {:.1f}%\trel err {:.2e}\tcos {:.6f}".format(
+                    dataset,
+                    key,
+                    dtype,
+                    table.nbytes() / 2**20,
+                    100.0 * (1 - table.nbytes() / base),
+                    err.mean().item(),
+                    cos.mean().item(),
+                )
+            )
+
+
+def accuracy_report(dataset, features, args):
+    model_class = SETTINGS[dataset][0]
+    in_path = "./benchmarks/" + dataset + "/"
+    test_dataloader = TestDataLoader(in_path, "link")
+    for dtype in DTYPES:
+        kge_score = model_class(
+            ent_tot=test_dataloader.get_ent_tot(),
+            rel_tot=test_dataloader.get_rel_tot(),
+            dim=args.dim,
+            margin=args.margin,
+            epsilon=2.0,
+            feature_dtype=dtype,
+            **features
+        )
+        kge_score.load_checkpoint(args.ckpt.format(dataset=dataset))
+        tester = Tester(
+            model=kge_score, data_loader=test_dataloader, use_gpu=bool(args.use_gpu)
+        )
+        mrr, mr, hit10, hit3, hit1 = tester.run_link_prediction(type_constrain=False)
+        print(
+            "{}\t{}\tMRR {:.4f}\tMR {:.1f}\tHit@10 {:.4f}\tHit@3 {:.4f}\tHit@1 {:.4f}".format(
+                dataset, dtype, mrr, mr, hit10, hit3, hit1
+            )
+        )
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    for dataset in args.datasets.split(","):
+        features = load_dataset_features(dataset)
+        if features is None:
+            print("{}: missing ./embeddings files, skipped".format(dataset))
+            continue
+        memory_report(dataset, features)
+        # -ckpt may contain {dataset}, e.g. -ckpt=./checkpoint/{dataset}.ckpt
+        if args.ckpt is not None:
+            accuracy_report(dataset, features, args)
@@ -1,9 +1,10 @@
 import torch
-from mmkgc.config import Tester, WCGTrainerGP
+from mmkgc.config import Tester, WCGTrainerGP, Validator, AsyncValidator
 from mmkgc.module.model import AdvRelRotatE
 from mmkgc.module.loss import SigmoidLoss
 from mmkgc.module.strategy import NegativeSamplingGP
 from mmkgc.data import TrainDataLoader, TestDataLoader
+from mmkgc.feature import load_features, FeaturePrefetcher
 from mmkgc.adv.modules import CombinedGenerator
 from args import get_args
 
@@ -27,8 +28,20 @@ if __name__ == "__main__":
     )
 
     test_dataloader = TestDataLoader("./benchmarks/" + args.dataset + "/", "link")
-    img_emb = torch.load("./embeddings/" + args.dataset + "-visual.pth")
-    text_emb = torch.load("./embeddings/" + args.dataset + "-textual.pth")
+    img_emb = load_features(
+        "./embeddings/" + args.dataset + "-visual.pth",
+        mmap=args.feature_mmap,
+        cache_bytes=args.feature_cache_mb << 20,
+        reduce=args.feature_reduce,
+        reduce_dim=args.feature_reduce_dim,
+    )
+    text_emb = load_features(
+        "./embeddings/" + args.dataset + "-textual.pth",
+        mmap=args.feature_mmap,
+        cache_bytes=args.feature_cache_mb << 20,
+        reduce=args.feature_reduce,
+        reduce_dim=args.feature_reduce_dim,
+    )
     
     # define the model
     kge_score = AdvRelRotatE(
@@ -39,8 +52,13 @@ if __name__ == "__main__":
         epsilon=2.0,
         img_emb=img_emb,
         text_emb=text_emb,
+        feature_dtype=args.feature_dtype,
+        sparse=args.sparse_optim is not None,
     )
     print(kge_score)
+    if args.feature_cache_mb > 0:
+        # sample one batch ahead so its feature rows are fetched in background
+        train_dataloader = FeaturePrefetcher(train_dataloader, [img_emb, text_emb])
     
     # define the loss function
     model = NegativeSamplingGP(
@@ -50,6 +68,21 @@ if __name__ == "__main__":
         regul_rate=0.00001,
     )
 
+    # periodic validation on valid2id.txt with early stopping
+    validator = None
+    if args.valid_steps:
+        # -valid_async validates in a forked worker while training goes on
+        validator = (AsyncValidator if args.valid_async else Validator)(
+            kge_score,
+            "./benchmarks/" + args.dataset + "/",
+            steps=args.valid_steps,
+            subset=args.valid_subset,
+            patience=args.patience,
+            best_path=args.best_save,
+            negatives=args.valid_negatives,
+            use_gpu=True,
+        )
+
     adv_generator = CombinedGenerator(
         noise_dim=64, structure_dim=2 * args.dim, img_dim=2 * args.dim
     )
@@ -61,13 +94,18 @@ if __name__ == "__main__":
         train_times=args.epoch,
         alpha=args.learning_rate,
         use_gpu=True,
-        opt_method="Adam",
+        opt_method=args.sparse_optim or "Adam",
         generator=adv_generator,
         lrg=args.lrg,
         mu=args.mu,
+        state_path=args.state_path,
+        state_steps=args.state_steps,
+        validator=validator,
     )
 
     trainer.run()
+    if args.valid_async and validator is not None:
+        validator.close()
     kge_score.save_checkpoint(args.save)
 
     # test the model
@@ -1,15 +1,21 @@
 import torch
-from mmkgc.config import Tester, WCGTrainerDB15KGP
+from mmkgc.config import Tester, WCGTrainerDB15KGP, Validator, AsyncValidator
 from mmkgc.module.model import AdvRelRotatEDB15K
 from mmkgc.module.loss import SigmoidLoss
 from mmkgc.module.strategy import NegativeSamplingGP
 from mmkgc.data import TrainDataLoader, TestDataLoader
+from mmkgc.feature import load_features
 from mmkgc.adv.modules import CombinedGenerator3
-from args import get_args
+from args import get_parser
 
 if __name__ == "__main__":
-    args = get_args()
+    parser = get_parser()
+    args = parser.parse_args()
     print(args)
+    # the 3-modal models take the full feature tables only
+    for flag in ("feature_cache_mb", "feature_reduce", "feature_reduce_dim"):
+        if getattr(args, flag) != parser.get_default(flag):
+            parser.error("-{} is not supported by the 3-modal models".format(flag))
 
     # set the seed
     torch.manual_seed(args.seed)
@@ -27,9 +33,15 @@ if __name__ == "__main__":
     )
 
     test_dataloader = TestDataLoader("./benchmarks/" + args.dataset + "/", "link")
-    img_emb = torch.load("./embeddings/" + args.dataset + "-visual.pth")
-    text_emb = torch.load("./embeddings/" + args.dataset + "-textual.pth")
-    num_emb = torch.load("./embeddings/" + args.dataset + "-numeric.pth")
+    img_emb = load_features(
+        "./embeddings/" + args.dataset + "-visual.pth", mmap=args.feature_mmap
+    )
+    text_emb = load_features(
+        "./embeddings/" + args.dataset + "-textual.pth", mmap=args.feature_mmap
+    )
+    num_emb = load_features(
+        "./embeddings/" + args.dataset + "-numeric.pth", mmap=args.feature_mmap
+    )
 
     # define the model
     kge_score = AdvRelRotatEDB15K(
@@ -41,6 +53,8 @@ if __name__ == "__main__":
         img_emb=img_emb,
         text_emb=text_emb,
         numeric_emb=num_emb,
+        feature_dtype=args.feature_dtype,
+        sparse=args.sparse_optim is not None,
     )
     print(kge_score)
 
@@ -55,6 +69,21 @@ if __name__ == "__main__":
         noise_dim=64, structure_dim=2 * args.dim, img_dim=3 * args.dim
     )
 
+    # periodic validation on valid2id.txt with early stopping
+    validator = None
+    if args.valid_steps:
+        # -valid_async validates in a forked worker while training goes on
+        validator = (AsyncValidator if args.valid_async else Validator)(
+            kge_score,
+            "./benchmarks/" + args.dataset + "/",
+            steps=args.valid_steps,
+            subset=args.valid_subset,
+            patience=args.patience,
+            best_path=args.best_save,
+            negatives=args.valid_negatives,
+            use_gpu=True,
+        )
+
     # train the model
     trainer = WCGTrainerDB15KGP(
         model=model,
@@ -62,13 +91,18 @@ if __name__ == "__main__":
         train_times=args.epoch,
         alpha=args.learning_rate,
         use_gpu=True,
-        opt_method="Adam",
+        opt_method=args.sparse_optim or "Adam",
         generator=adv_generator,
         lrg=args.lrg,
         mu=args.mu,
+        state_path=args.state_path,
+        state_steps=args.state_steps,
+        validator=validator,
     )
 
     trainer.run()
+    if args.valid_async and validator is not None:
+        validator.close()
     kge_score.save_checkpoint(args.save)
 
     # test the model
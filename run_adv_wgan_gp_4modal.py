@@ -1,9 +1,10 @@
 import torch
-from mmkgc.config import Tester, WCGTrainerKuai16KGP
+from mmkgc.config import Tester, WCGTrainerKuai16KGP, Validator, AsyncValidator
 from mmkgc.module.model import AdvRelRotatEKuai16K
 from mmkgc.module.loss import SigmoidLoss
 from mmkgc.module.strategy import NegativeSamplingGP
 from mmkgc.data import TrainDataLoader, TestDataLoader
+from mmkgc.feature import load_features, FeaturePrefetcher
 from mmkgc.adv.modules import CombinedGenerator2
 from args import get_args
 
@@ -27,10 +28,34 @@ if __name__ == "__main__":
     )
 
     test_dataloader = TestDataLoader("./benchmarks/" + args.dataset + "/", "link")
-    img_emb = torch.load("./embeddings/" + args.dataset + "-visual.pth")
-    text_emb = torch.load("./embeddings/" + args.dataset + "-textual.pth")
-    audio_emb = torch.load("./embeddings/" + args.dataset + "-audio.pth")
-    video_emb = torch.load("./embeddings/" + args.dataset + "-video.pth")
+    img_emb = load_features(
+        "./embeddings/" + args.dataset + "-visual.pth",
+        mmap=args.feature_mmap,
+        cache_bytes=args.feature_cache_mb << 20,
+        reduce=args.feature_reduce,
+        reduce_dim=args.feature_reduce_dim,
+    )
+    text_emb = load_features(
+        "./embeddings/" + args.dataset + "-textual.pth",
+        mmap=args.feature_mmap,
+        cache_bytes=args.feature_cache_mb << 20,
+        reduce=args.feature_reduce,
+        reduce_dim=args.feature_reduce_dim,
+    )
+    audio_emb = load_features(
+        "./embeddings/" + args.dataset + "-audio.pth",
+        mmap=args.feature_mmap,
+        cache_bytes=args.feature_cache_mb << 20,
+        reduce=args.feature_reduce,
+        reduce_dim=args.feature_reduce_dim,
+    )
+    video_emb = load_features(
+        "./embeddings/" + args.dataset + "-video.pth",
+        mmap=args.feature_mmap,
+        cache_bytes=args.feature_cache_mb << 20,
+        reduce=args.feature_reduce,
+        reduce_dim=args.feature_reduce_dim,
+    )
     
     # define the model
     kge_score = AdvRelRotatEKuai16K(
@@ -43,8 +68,15 @@ if __name__ == "__main__":
         text_emb=text_emb,
         audio_emb=audio_emb,
         video_emb=video_emb,
+        feature_dtype=args.feature_dtype,
+        sparse=args.sparse_optim is not None,
     )
     print(kge_score)
+    if args.feature_cache_mb > 0:
+        # sample one batch ahead so its feature rows are fetched in background
+        train_dataloader = FeaturePrefetcher(
+            train_dataloader, [img_emb, text_emb, audio_emb, video_emb]
+        )
     
     # define the loss function
     model = NegativeSamplingGP(
@@ -58,6 +90,21 @@ if __name__ == "__main__":
         noise_dim=64, structure_dim=2 * args.dim, img_dim=4 * args.dim
     )
 
+    # periodic validation on valid2id.txt with early stopping
+    validator = None
+    if args.valid_steps:
+        # -valid_async validates in a forked worker while training goes on
+        validator = (AsyncValidator if args.valid_async else Validator)(
+            kge_score,
+            "./benchmarks/" + args.dataset + "/",
+            steps=args.valid_steps,
+            subset=args.valid_subset,
+            patience=args.patience,
+            best_path=args.best_save,
+            negatives=args.valid_negatives,
+            use_gpu=True,
+        )
+
     tester = Tester(model=kge_score, data_loader=test_dataloader, use_gpu=True)
     
     # train the model
@@ -67,14 +114,19 @@ if __name__ == "__main__":
         train_times=args.epoch,
         alpha=args.learning_rate,
         use_gpu=True,
-        opt_method="Adam",
+        opt_method=args.sparse_optim or "Adam",
         generator=adv_generator,
         lrg=args.lrg,
         mu=args.mu,
         tester=tester,
+        state_path=args.state_path,
+        state_steps=args.state_steps,
+        validator=validator,
     )
 
     trainer.run()
+    if args.valid_async and validator is not None:
+        validator.close()
     kge_score.save_checkpoint(args.save)
 
     # test the model
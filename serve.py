@@ -0,0 +1,43 @@
+import asyncio
+import argparse
+from build_index import load_model
+from mmkgc.data import read_type_constrain
+from mmkgc.serve import EntityScorer, InferenceServer, serve_http
+
+
+def get_args():
+    arg = argparse.ArgumentParser()
+    arg.add_argument("-dataset", type=str, default="MKG-W")
+    arg.add_argument("-model", type=str, default="adv_rotate")
+    arg.add_argument("-checkpoint", type=str, required=True)
+    arg.add_argument("-dim", type=int, default=128)
+    arg.add_argument("-margin", type=float, default=6.0)
+    arg.add_argument("-max_batch", type=int, default=256)
+    arg.add_argument("-max_latency", type=float, default=0.005)
+    arg.add_argument("-host", type=str, default="127.0.0.1")
+    arg.add_argument("-port", type=int, default=8000)
+    arg.add_argument("-uds", type=str, default=None)
+    arg.add_argument("-type_constrain", type=int, default=0)
+    return arg.parse_args()
+
+
+async def main(args):
+    types = None
+    if args.type_constrain:
+        # top-k answers only among each relation's type_constrain.txt entities
+        types = read_type_constrain("./benchmarks/" + args.dataset + "/")
+    server = InferenceServer(
+        EntityScorer(load_model(args), types=types),
+        max_batch=args.max_batch,
+        max_latency=args.max_latency,
+    )
+    listener = await serve_http(server, args.host, args.port, args.uds)
+    print("serving on {}".format(args.uds or "{}:{}".format(args.host, args.port)))
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    args = get_args()
+    print(args)
+    asyncio.run(main(args))